@@ -1,4 +1,7 @@
+from typing import Optional
+
 from nomad.config.models.plugins import ParserEntryPoint
+from pydantic import Field
 
 
 class ElabftwEntryPoint(ParserEntryPoint):
@@ -20,18 +23,71 @@ elabftw_parser_entry_point = ElabftwEntryPoint(
 
 
 class ChemotionEntryPoint(ParserEntryPoint):
+    columnar: bool = Field(
+        True,
+        description='Also store the numeric and timestamp columns of samples and '
+        'molecules as float64 arrays.',
+    )
+    verify_files: bool = Field(
+        True,
+        description='Check that all referenced attachments and images exist and '
+        'verify the attachment checksums.',
+    )
+    checksum_workers: int = Field(
+        4, description='The number of attachments that are hashed concurrently.'
+    )
+    store_molfiles: bool = Field(
+        False,
+        description='Store molfiles deduplicated in a section of the entry and '
+        'only keep their keys in the samples and molecules.',
+    )
+    incremental: bool = Field(
+        False,
+        description='Compare the rows by updated_at with the previously parsed '
+        'archive of the same export and reuse the columns, trees, networks, '
+        'results and checksums that only depend on unchanged tables.',
+    )
+
+    molecule_store: Optional[str] = Field(
+        None,
+        description='Path of a SQLite file that indexes molecules by InChIKey within '
+        'each upload. Molecules that another entry of the upload already holds '
+        'only keep a reference to its full record.',
+    )
+    molecule_store_timeout: float = Field(
+        30.0,
+        description='The seconds to wait for other processes that write the '
+        'molecule store.',
+    )
+    collections: Optional[list[str]] = Field(
+        None,
+        description='Only import these collections, given by uuid or label, with '
+        'their samples, reactions, etc. and all related rows.',
+    )
+    tables: Optional[list[str]] = Field(
+        None,
+        description='Only import these tables of the export, e.g. Sample and Molecule.',
+    )
+
     def load(self):
-        from nomad_eln_external_integrations.parsers.chemotion import ChemotionParser
+        from nomad_eln_external_integrations.parsers.chemotion import (
+            ChemotionOptions,
+            ChemotionParser,
+        )
 
-        return ChemotionParser(**self.dict())
+        kwargs = self.dict()
+        options = ChemotionOptions(
+            **{name: kwargs.pop(name) for name in ChemotionOptions._fields}
+        )
+        return ChemotionParser(options=options, **kwargs)
 
 
-chemotion_parser_entry_point = ElabftwEntryPoint(
+chemotion_parser_entry_point = ChemotionEntryPoint(
     name='parsers/chemotion',
     aliases=['parsers/chemotion'],
     code_name='chemotion',
     code_homepage='https://chemotion.net/',
     description='NOMAD parser for chemotion data.',
     mainfile_mime_re=r'application/json|text/plain',
-    mainfile_name_re=r'^.*export.json$',
+    mainfile_name_re=r'^(.*/)?export\.json$',
 )
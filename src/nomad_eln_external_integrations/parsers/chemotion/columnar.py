@@ -0,0 +1,203 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Column-wise decoding of Chemotion export tables.
+
+Chemotion exports every value as a string (``'0.0'``, ``'None'``,
+``'-Infinity...Infinity'``). Instead of coercing these one row at a time, the
+functions here gather a whole column and convert it with a single NumPy/pandas
+call.
+"""
+
+import numpy as np
+import pandas as pd
+
+_RANGE_SEPARATOR = '...'
+
+
+def _column_values(rows: list[dict], key: str) -> list:
+    return [row.get(key) for row in rows]
+
+
+def _to_float64(values) -> np.ndarray:
+    series = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+    array = series.to_numpy(dtype=np.float64, copy=True)
+    array[~np.isfinite(array)] = np.nan
+    return array
+
+
+def numeric_column(rows: list[dict], key: str) -> np.ndarray:
+    """
+    Decodes the column `key` into a float64 array. Missing, non-numeric and
+    infinite values become NaN.
+    """
+    return _to_float64(_column_values(rows, key))
+
+
+def _numbers(strings: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Decodes strings into float64 values, NaN for infinite ones, and returns
+    which strings are numbers.
+    """
+    numbers = pd.to_numeric(strings, errors='coerce').to_numpy(np.float64, copy=True)
+    is_number = ~np.isnan(numbers) | (strings.str.strip().str.lower() == 'nan')
+    numbers[~np.isfinite(numbers)] = np.nan
+    return numbers, np.asarray(is_number, dtype=bool)
+
+
+def range_bounds(values) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Decodes numbers and Chemotion ranges (``'lower...upper'``), which are also
+    written as strings, into float64 bounds of shape (n, 2). Plain numbers are
+    read as a range of zero width, open or unknown bounds become NaN. Returns the
+    bounds and which values are numbers or ranges.
+    """
+    values = pd.Series(values, dtype=object).reset_index(drop=True)
+    if values.empty:
+        return np.empty((0, 2), dtype=np.float64), np.zeros(0, dtype=bool)
+    types = values.map(type)
+    is_string = types.eq(str).to_numpy()
+    is_number = types.isin([int, float]).to_numpy()
+    parts = values.where(is_string, '').str.partition(_RANGE_SEPARATOR)
+    is_range = (parts[1] != '').to_numpy()
+    lower, lower_valid = _numbers(parts[0])
+    upper, upper_valid = _numbers(parts[2].where(is_range, parts[0]))
+    numbers = pd.to_numeric(values.where(is_number), errors='coerce')
+    numbers = numbers.to_numpy(np.float64)
+    bounds = np.stack(
+        [np.where(is_number, numbers, lower), np.where(is_number, numbers, upper)],
+        axis=1,
+    )
+    bounds[~np.isfinite(bounds)] = np.nan
+    return bounds, is_number | (is_string & lower_valid & upper_valid)
+
+
+def range_column(rows: list[dict], key: str) -> np.ndarray:
+    """
+    Decodes a column of numbers and Chemotion ranges into float64 bounds of
+    shape (n, 2), see `range_bounds`.
+    """
+    bounds, _ = range_bounds(_column_values(rows, key))
+    return bounds
+
+
+def datetime_column(rows: list[dict], key: str) -> np.ndarray:
+    """
+    Decodes the ISO 8601 timestamps of column `key` into a datetime64[ms] array
+    in UTC. Values that cannot be parsed become NaT.
+    """
+    timestamps = pd.to_datetime(
+        pd.Series(_column_values(rows, key), dtype=object),
+        utc=True,
+        errors='coerce',
+        format='ISO8601',
+    )
+    return timestamps.dt.tz_convert(None).to_numpy(dtype='datetime64[ms]')
+
+
+def epoch_seconds(datetimes: np.ndarray) -> np.ndarray:
+    """Converts a datetime64 array into float64 seconds since the Unix epoch."""
+    seconds = datetimes.astype('datetime64[ms]').astype(np.int64) / 1e3
+    return np.where(np.isnat(datetimes), np.nan, seconds)
+
+
+def _grid_codes(values: pd.Series, cells: tuple, shape: tuple):
+    codes, labels = pd.factorize(values.replace('', None))
+    grid = np.full(shape, -1, dtype=np.int32)
+    grid[cells] = codes
+    return [str(label) for label in labels], grid
+
+
+def _is_scalar(value) -> bool:
+    return type(value) in (str, int, float)
+
+
+def _well_positions(values: pd.Series) -> pd.Series:
+    """Decodes well positions, NaN for those that are not integers >= 1."""
+    numbers = pd.to_numeric(values.where(values.map(_is_scalar)), errors='coerce')
+    return numbers.where((numbers >= 1) & (numbers % 1 == 0))
+
+
+def well_grids(
+    wells: list[dict],
+) -> tuple[dict[str, dict], dict[str, list[str]], list[str]]:
+    """
+    Decodes the wells of all wellplates into dense grids of shape
+    (max position_y, max position_x); the well at ``position_x``,
+    ``position_y`` is at ``[position_y - 1, position_x - 1]``.
+
+    The string columns are dictionary encoded: a list of the distinct values
+    and a grid of int32 indices into it, -1 for empty cells. Returns the grids
+    by wellplate id, the ids of the wells that are ignored, because an earlier
+    well of their plate has the same position, by wellplate id, and the ids of
+    the wells that are ignored, because they have no wellplate, a position that
+    is not an integer >= 1, or a sample, readout or additive that is not a
+    single value.
+    """
+    table = pd.DataFrame(
+        wells,
+        columns=[
+            'id',
+            'wellplate_id',
+            'position_x',
+            'position_y',
+            'sample_id',
+            'readout',
+            'additive',
+        ],
+        dtype=object,
+    )
+    x = _well_positions(table['position_x'])
+    y = _well_positions(table['position_y'])
+    wellplate_ids = table['wellplate_id']
+    valid = (
+        x.notna() & y.notna() & wellplate_ids.notna() & wellplate_ids.map(_is_scalar)
+    )
+    for name in ('sample_id', 'readout', 'additive'):
+        valid &= table[name].isna() | table[name].map(_is_scalar)
+    invalid = table.loc[~valid, 'id'].tolist()
+    table = table[valid].assign(
+        x=x[valid].astype(np.int64) - 1, y=y[valid].astype(np.int64) - 1
+    )
+
+    grids, duplicates = {}, {}
+    for wellplate_id, wellplate in table.groupby('wellplate_id', sort=False):
+        duplicated = wellplate.duplicated(['y', 'x'])
+        plate = wellplate[~duplicated]
+        if duplicated.any():
+            duplicates[wellplate_id] = wellplate.loc[duplicated, 'id'].tolist()
+        cells = (plate['y'].to_numpy(np.int64), plate['x'].to_numpy(np.int64))
+        shape = (cells[0].max() + 1, cells[1].max() + 1)
+        well_ids, well_index = _grid_codes(plate['id'], cells, shape)
+        sample_ids, sample_index = _grid_codes(plate['sample_id'], cells, shape)
+        readouts, readout_index = _grid_codes(plate['readout'], cells, shape)
+        additives, additive_index = _grid_codes(plate['additive'], cells, shape)
+        readout_values = np.full(shape, np.nan)
+        readout_values[cells] = _to_float64(plate['readout'].to_numpy())
+        grids[wellplate_id] = dict(
+            well_ids=well_ids,
+            well_index=well_index,
+            sample_ids=sample_ids,
+            sample_index=sample_index,
+            readouts=readouts,
+            readout_index=readout_index,
+            readout_values=readout_values,
+            additives=additives,
+            additive_index=additive_index,
+        )
+    return grids, duplicates, invalid
@@ -0,0 +1,107 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+A manifest of the files that come with a Chemotion export.
+
+The export directory is scanned once; afterwards every path referenced by the
+export can be looked up in constant time and the attachment checksums can be
+verified concurrently.
+"""
+
+import hashlib
+import os
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+_CHUNK_SIZE = 1 << 20
+
+# Chemotion does not name the hash function, it is recognised by the digest size
+_checksum_algorithms = {32: 'md5', 40: 'sha1', 64: 'sha256'}
+
+
+def _scan(root: str) -> Iterable[str]:
+    directories = ['']
+    while directories:
+        directory = directories.pop()
+        with os.scandir(os.path.join(root, directory)) as it:
+            for entry in it:
+                path = os.path.join(directory, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(path)
+                elif entry.is_file():
+                    yield path
+
+
+def file_checksum(path: str, algorithm: str) -> str:
+    """Computes the hex digest of a file, reading it in fixed-size chunks."""
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb') as f:
+        while size := f.readinto(buffer):
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+class ExportManifest:
+    """
+    All regular files below the root directory of a Chemotion export. Paths are
+    relative to the root.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.files = set(_scan(root))
+
+    def __contains__(self, path: str) -> bool:
+        return os.path.normpath(path) in self.files
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def orphans(self, referenced: Iterable[str], directories: Iterable[str]):
+        """
+        Returns the files within `directories` that are not in `referenced`.
+        """
+        prefixes = tuple(os.path.join(directory, '') for directory in directories)
+        referenced = {os.path.normpath(path) for path in referenced}
+        return sorted(
+            path
+            for path in self.files
+            if path.startswith(prefixes) and path not in referenced
+        )
+
+    def _checksum_matches(self, path: str, checksum: str) -> bool:
+        algorithm = _checksum_algorithms.get(len(checksum))
+        if algorithm is None:
+            return True
+        actual = file_checksum(os.path.join(self.root, path), algorithm)
+        return actual == checksum.lower()
+
+    def verify_checksums(self, checksums: dict[str, str], max_workers: int = 4):
+        """
+        Verifies the files against the given path to checksum mapping, hashing
+        up to `max_workers` files at a time. Returns the paths of the files that
+        do not match. Paths that are not in the manifest are skipped.
+        """
+        paths = [path for path in checksums if path in self]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            matches = executor.map(
+                self._checksum_matches, paths, [checksums[path] for path in paths]
+            )
+            return sorted(path for path, match in zip(paths, matches) if not match)
@@ -0,0 +1,131 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+A molecule index shared by the Chemotion exports of an upload.
+
+Molecules are identified by their InChIKey or, if there is none, by their
+canonical SMILES. Within an upload, the first entry that claims a key keeps the
+full molecule record and all other entries of the upload only reference it.
+Molecules are never shared across uploads, so references cannot point into
+uploads that other users cannot see, or that are deleted independently.
+
+The index is a SQLite file, so that the processes that parse the entries of an
+upload in parallel agree on the owner of every key. All claims of an entry are
+made in one write transaction, and concurrent writers wait up to `timeout`
+seconds for each other instead of failing.
+
+Invalidation: an entry replaces its own claims whenever it is parsed again, so
+removed molecules are released. Claims of entries whose mainfile is gone are
+released when another entry finds them, and ``release`` drops the claims of
+deleted entries or whole uploads.
+"""
+
+import sqlite3
+from collections.abc import Iterable
+from typing import NamedTuple, Optional
+
+
+def molecule_key(row: dict) -> Optional[str]:
+    """Returns the store key of a Chemotion molecule row, or None if it has none."""
+    inchikey = row.get('inchikey')
+    if inchikey:
+        return f'inchikey:{inchikey}'
+    cano_smiles = row.get('cano_smiles')
+    if cano_smiles:
+        return f'smiles:{cano_smiles}'
+    return None
+
+
+class MoleculeOwner(NamedTuple):
+    """The entry with the full record of a molecule and its index in Molecule."""
+
+    entry_id: str
+    mainfile: str
+    index: int
+
+
+class MoleculeStore:
+    """A persistent index from molecule keys to their owners in each upload."""
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        # transactions are started explicitly
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._connection.execute(f'PRAGMA busy_timeout = {int(timeout * 1000)}')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS upload_molecules ('
+            'upload_id TEXT NOT NULL, key TEXT NOT NULL, entry_id TEXT NOT NULL, '
+            'mainfile TEXT NOT NULL, idx INTEGER NOT NULL, '
+            'PRIMARY KEY (upload_id, key))'
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS upload_molecules_entry '
+            'ON upload_molecules (upload_id, entry_id)'
+        )
+
+    def claim(
+        self, upload_id: str, entry_id: str, mainfile: str, molecules: dict[str, int]
+    ) -> dict[str, MoleculeOwner]:
+        """
+        Claims the molecules of an entry, given as keys and their index, and
+        replaces its previous claims. Returns the owner of every key: the entry
+        itself, unless another entry of the upload claimed the key first.
+        """
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'DELETE FROM upload_molecules WHERE upload_id = ? AND entry_id = ?',
+                (upload_id, entry_id),
+            )
+            connection.executemany(
+                'INSERT OR IGNORE INTO upload_molecules '
+                '(upload_id, key, entry_id, mainfile, idx) VALUES (?, ?, ?, ?, ?)',
+                [
+                    (upload_id, key, entry_id, mainfile, index)
+                    for key, index in molecules.items()
+                ],
+            )
+            owners = {}
+            for key in molecules:
+                row = connection.execute(
+                    'SELECT entry_id, mainfile, idx FROM upload_molecules '
+                    'WHERE upload_id = ? AND key = ?',
+                    (upload_id, key),
+                ).fetchone()
+                owners[key] = MoleculeOwner(*row)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return owners
+
+    def release(self, upload_id: str, entry_ids: Optional[Iterable[str]] = None):
+        """Drops the claims of the given entries or, if None, of the whole upload."""
+        if entry_ids is None:
+            self._connection.execute(
+                'DELETE FROM upload_molecules WHERE upload_id = ?', (upload_id,)
+            )
+            return
+        self._connection.executemany(
+            'DELETE FROM upload_molecules WHERE upload_id = ? AND entry_id = ?',
+            [(upload_id, entry_id) for entry_id in entry_ids],
+        )
+
+    def close(self):
+        self._connection.close()
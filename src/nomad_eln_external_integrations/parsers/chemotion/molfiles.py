@@ -0,0 +1,55 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Deduplicated storage for Chemotion molfiles.
+
+Each molfile is stored once in the ``Molfiles`` section of the entry, under the
+sha256 digest of its text, and the sample and molecule sections only keep the
+digest. The molfiles are part of the archive and not a raw file of the upload,
+so that reprocessing an export or parsing another export cannot overwrite them,
+and the entry stays self-contained. Archives are read section by section, so
+reading the samples or molecules of an entry does not load the molfiles; they
+are only read when a molfile is resolved.
+"""
+
+import hashlib
+
+
+def molfile_key(molfile: str) -> str:
+    return hashlib.sha256(molfile.encode('utf-8')).hexdigest()
+
+
+class MolfileStore:
+    """Collects deduplicated molfiles."""
+
+    def __init__(self):
+        self._molfiles: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._molfiles)
+
+    def add(self, molfile: str) -> str:
+        """Adds a molfile to the store and returns its key."""
+        key = molfile_key(molfile)
+        self._molfiles.setdefault(key, molfile)
+        return key
+
+    def sorted_items(self) -> tuple[list[str], list[str]]:
+        """The keys in sorted order and their molfiles."""
+        keys = sorted(self._molfiles)
+        return keys, [self._molfiles[key] for key in keys]
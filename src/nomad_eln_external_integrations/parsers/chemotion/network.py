@@ -0,0 +1,85 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+The network of Chemotion reactions and the samples they use and produce.
+
+Chemotion exports one join table per role a sample can have in a reaction. Here
+all of them are combined into sample to reaction and reaction to sample
+adjacency lists in compressed sparse row form: the neighbours of node i are
+``values[offsets[i]:offsets[i + 1]]``.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+
+# the role codes of the edges, the order must not change
+ROLES = ('starting_material', 'reactant', 'solvent', 'purification_solvent', 'product')
+PRODUCT = ROLES.index('product')
+
+
+def adjacency(sources: np.ndarray, targets: np.ndarray, n: int):
+    """
+    Groups the edges by source and returns the offsets and targets arrays.
+    Edges keep their order within each group.
+    """
+    order = np.argsort(sources, kind='stable')
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+    return offsets, targets[order]
+
+
+def reaction_network(
+    n_samples: int,
+    n_reactions: int,
+    samples: Sequence[int],
+    reactions: Sequence[int],
+    roles: Sequence[int],
+) -> dict[str, np.ndarray]:
+    """
+    Builds the adjacency arrays from the edges between `samples` and
+    `reactions` with the given `roles`, which index `ROLES`.
+    """
+    samples = np.asarray(samples, dtype=np.int64)
+    reactions = np.asarray(reactions, dtype=np.int64)
+    roles = np.asarray(roles, dtype=np.int8)
+    products = roles == PRODUCT
+    inputs = ~products
+
+    input_offsets, input_samples = adjacency(
+        reactions[inputs], samples[inputs], n_reactions
+    )
+    _, input_roles = adjacency(reactions[inputs], roles[inputs], n_reactions)
+    product_offsets, product_samples = adjacency(
+        reactions[products], samples[products], n_reactions
+    )
+    use_offsets, uses = adjacency(samples[inputs], reactions[inputs], n_samples)
+    origin_offsets, origins = adjacency(
+        samples[products], reactions[products], n_samples
+    )
+    return dict(
+        input_offsets=input_offsets,
+        input_samples=input_samples,
+        input_roles=input_roles,
+        product_offsets=product_offsets,
+        product_samples=product_samples,
+        use_offsets=use_offsets,
+        uses=uses,
+        origin_offsets=origin_offsets,
+        origins=origins,
+    )
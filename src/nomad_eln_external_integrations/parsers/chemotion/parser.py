@@ -15,28 +15,53 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import bisect
 import json
 import os
+import re
+from collections import Counter
 from collections.abc import Iterable
-from typing import Union
+from functools import partial
+from itertools import compress
+from typing import NamedTuple, Optional, Union
 
 import numpy as np
+from ase.data import chemical_symbols
 from nomad import utils
 from nomad.datamodel import EntryArchive, EntryData
 from nomad.datamodel.data import ElnIntegrationCategory
+from nomad.datamodel.results import ELN, Material, Results
 from nomad.metainfo import (
     JSON,
     Datetime,
     MSection,
     Quantity,
+    Reference,
     Section,
+    SectionProxy,
     SubSection,
 )
 from nomad.metainfo.data_type import m_float16
 from nomad.parsing.parser import MatchingParser
 
+from .columnar import (
+    datetime_column,
+    epoch_seconds,
+    numeric_column,
+    range_column,
+    well_grids,
+)
+from .manifest import ExportManifest
+from .molecules import MoleculeStore, molecule_key
+from .molfiles import MolfileStore
+from .network import ROLES, reaction_network
+from .schema import TableDecoder, load_decoders
+from .selection import select_rows
+from .trees import container_parents, nested_set
+
 
 class ChemotionGeneralMetainfo(MSection):
+    id = Quantity(type=str, description='The uuid of the row')
     user_id = Quantity(type=str)
     created_at = Quantity(type=Datetime)
     updated_at = Quantity(type=Datetime)
@@ -54,6 +79,24 @@ class ChemotionReactionSample(ChemotionGeneralMetainfo):
     coefficient = Quantity(type=m_float16().no_type_check())
 
 
+class ChemotionMolfileMetainfo(ChemotionGeneralMetainfo):
+    molfile = Quantity(type=str)
+    molfile_ref = Quantity(
+        type=str,
+        description='The key of the molfile in the Molfiles section of the entry. '
+        'It is set instead of molfile, if molfiles are stored out of line.',
+    )
+
+    def resolve_molfile(self) -> str:
+        """
+        Returns the molfile, looking it up in the Molfiles section of the entry
+        if it is stored out of line.
+        """
+        if self.molfile is not None or not self.molfile_ref:
+            return self.molfile
+        return self.m_parent.Molfiles.molfile(self.molfile_ref)
+
+
 class ChemotionCollection(ChemotionGeneralMetainfo):
     ancestry = Quantity(type=str)
     label = Quantity(type=str)
@@ -70,7 +113,7 @@ class ChemotionCollection(ChemotionGeneralMetainfo):
     researchplan_detail_level = Quantity(type=int)
 
 
-class ChemotionSample(ChemotionGeneralMetainfo):
+class ChemotionSample(ChemotionMolfileMetainfo):
     name = Quantity(type=str)
     target_amount_value = Quantity(type=m_float16().no_type_check())
     target_amount_unit = Quantity(type=str)
@@ -132,7 +175,7 @@ class ChemotionFingerprint(ChemotionGeneralMetainfo):
     num_set_bits = Quantity(type=int)
 
 
-class ChemotionMolecule(ChemotionGeneralMetainfo):
+class ChemotionMolecule(ChemotionMolfileMetainfo):
     inchikey = Quantity(type=str)
     inchistring = Quantity(type=str)
     density = Quantity(type=m_float16().no_type_check())
@@ -150,6 +193,11 @@ class ChemotionMolecule(ChemotionGeneralMetainfo):
     cas = Quantity(type=str, shape=['*'])
     molfile_version = Quantity(type=str)
     file = Quantity(type=str, a_browser=dict(adaptor='RawFileAdaptor'))
+    canonical_molecule = Quantity(
+        type=Reference(SectionProxy('ChemotionMolecule')),
+        description='The molecule with the full record, if another entry of the '
+        'upload already holds it',
+    )
 
     def post_process(self, **kwargs):
         full_path = os.path.join('images', 'molecules', self.molecule_svg_file)
@@ -172,8 +220,8 @@ class ChemotionReaction(ChemotionGeneralMetainfo):
     timestamp_start = Quantity(type=str)
     timestamp_stop = Quantity(type=str)
     observation = Quantity(type=JSON, a_browser=dict(value_component='JsonValue'))
-    purification = Quantity(type=JSON)
-    dangerous_products = Quantity(type=JSON)
+    purification = Quantity(type=str, shape=['*'])
+    dangerous_products = Quantity(type=str, shape=['*'])
     tlc_solvents = Quantity(type=str)
     tlc_description = Quantity(type=str)
     rf_value = Quantity(type=str)
@@ -223,9 +271,31 @@ class ChemotionReactionsProductSample(ChemotionReactionSample):
 
 
 class ChemotionWellplate(ChemotionGeneralMetainfo):
+    """
+    A wellplate with its wells as dense grids. The well at ``position_x``,
+    ``position_y`` is at ``[position_y - 1, position_x - 1]`` of every grid. The
+    string values of the wells are stored once per plate and the ``*_index``
+    grids hold indices into them, -1 for empty wells.
+    """
+
     name = Quantity(type=str)
     size = Quantity(type=int)
     description = Quantity(type=JSON, a_browser=dict(value_component='JsonValue'))
+    well_ids = Quantity(type=str, shape=['*'], description='The uuids of the wells')
+    well_index = Quantity(type=np.int32, shape=['*', '*'])
+    sample_ids = Quantity(
+        type=str, shape=['*'], description='The uuids of the samples in the wells'
+    )
+    sample_index = Quantity(type=np.int32, shape=['*', '*'])
+    readouts = Quantity(type=str, shape=['*'])
+    readout_index = Quantity(type=np.int32, shape=['*', '*'])
+    readout_values = Quantity(
+        type=np.float64,
+        shape=['*', '*'],
+        description='The numeric readouts, NaN for empty wells and text readouts',
+    )
+    additives = Quantity(type=str, shape=['*'])
+    additive_index = Quantity(type=np.int32, shape=['*', '*'])
 
 
 class ChemotionCollectionsWellplate(ChemotionGeneralMetainfo):
@@ -236,8 +306,8 @@ class ChemotionWell(ChemotionGeneralMetainfo):
     wellplate_id = Quantity(type=str)
     position_x = Quantity(type=int)
     position_y = Quantity(type=int)
-    readout = Quantity(type=Datetime)
-    additive = Quantity(type=Datetime)
+    readout = Quantity(type=str)
+    additive = Quantity(type=str)
 
 
 class ChemotionScreen(ChemotionGeneralMetainfo):
@@ -260,7 +330,7 @@ class ChemotionScreensWellplate(ChemotionGeneralMetainfo):
 
 class ChemotionResearchPlan(ChemotionGeneralMetainfo):
     name = Quantity(type=str)
-    body = Quantity(type=JSON, a_browser=dict(value_component='JsonValue'))
+    body = Quantity(type=JSON, shape=['*'], a_browser=dict(value_component='JsonValue'))
     sdf_file = Quantity(type=str)
     svg_file = Quantity(type=str)
     created_by = Quantity(type=str)
@@ -274,6 +344,7 @@ class ChemotionCollectionsResearchPlan(ChemotionGeneralMetainfo):
 
 
 class ChemotionContainer(MSection):
+    id = Quantity(type=str, description='The uuid of the row')
     ancestry = Quantity(type=str)
     containable_id = Quantity(type=str)
     containable_type = Quantity(type=str)
@@ -323,6 +394,274 @@ class ChemotionLiterature(ChemotionGeneralMetainfo):
     doi = Quantity(type=str)
 
 
+class ChemotionTableColumns(MSection):
+    """
+    Column-oriented view of a Chemotion table. Each quantity holds one value per
+    row, in the order of `ids`, so that whole tables can be aggregated without
+    visiting the individual row sections.
+    """
+
+    ids = Quantity(type=str, shape=['*'], description='The uuids of the rows')
+    created_at = Quantity(
+        type=np.float64,
+        shape=['*'],
+        unit='s',
+        description='Creation times in seconds since the Unix epoch',
+    )
+    updated_at = Quantity(
+        type=np.float64,
+        shape=['*'],
+        unit='s',
+        description='Modification times in seconds since the Unix epoch',
+    )
+
+
+class ChemotionSampleColumns(ChemotionTableColumns):
+    target_amount_value = Quantity(type=np.float64, shape=['*'])
+    real_amount_value = Quantity(type=np.float64, shape=['*'])
+    density = Quantity(type=np.float64, shape=['*'])
+    molarity_value = Quantity(type=np.float64, shape=['*'])
+    melting_point = Quantity(
+        type=np.float64, shape=['*', 2], description='Lower and upper bound'
+    )
+    boiling_point = Quantity(
+        type=np.float64, shape=['*', 2], description='Lower and upper bound'
+    )
+
+
+class ChemotionMoleculeColumns(ChemotionTableColumns):
+    density = Quantity(type=np.float64, shape=['*'])
+    molecular_weight = Quantity(type=np.float64, shape=['*'])
+    exact_molecular_weight = Quantity(type=np.float64, shape=['*'])
+    melting_point = Quantity(
+        type=np.float64, shape=['*', 2], description='Lower and upper bound'
+    )
+    boiling_point = Quantity(
+        type=np.float64, shape=['*', 2], description='Lower and upper bound'
+    )
+
+
+class ChemotionFiles(MSection):
+    """The consistency of the files that come with a Chemotion export."""
+
+    missing_files = Quantity(
+        type=str,
+        shape=['*'],
+        description='Files that are referenced but not part of the export',
+    )
+    orphan_files = Quantity(
+        type=str,
+        shape=['*'],
+        description='Files of the export that are not referenced',
+    )
+    checksum_mismatches = Quantity(
+        type=str,
+        shape=['*'],
+        description='Attachments whose content does not match their checksum',
+    )
+
+
+class ChemotionMolfiles(MSection):
+    """The distinct molfiles of the samples and molecules, sorted by their key."""
+
+    keys = Quantity(
+        type=str, shape=['*'], description='The sha256 digests of the molfiles'
+    )
+    molfiles = Quantity(type=str, shape=['*'])
+
+    def molfile(self, key: str) -> str:
+        i = bisect.bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            raise KeyError(key)
+        return self.molfiles[i]
+
+
+class ChemotionRowVersions(MSection):
+    """
+    The ids and modification times of the rows of all tables, so that the next
+    import of the same export can find the changed rows without reading the
+    rows. The rows of ``tables[i]`` are ``ids[offsets[i]:offsets[i + 1]]``, in
+    the order of their sub section.
+    """
+
+    tables = Quantity(type=str, shape=['*'], description='The sub section names')
+    offsets = Quantity(type=np.int64, shape=['*'])
+    ids = Quantity(type=str, shape=['*'])
+    updated_at = Quantity(
+        type=np.float64,
+        shape=['*'],
+        unit='s',
+        description='Modification times in seconds since the Unix epoch, NaN if '
+        'unknown',
+    )
+
+
+class ChemotionChanges(MSection):
+    """The rows that changed since the previous import of the same export."""
+
+    new_rows = Quantity(type=int)
+    changed_rows = Quantity(type=int)
+    unchanged_rows = Quantity(type=int)
+    deleted_rows = Quantity(type=int)
+
+
+class ChemotionContainerTree(MSection):
+    """
+    The hierarchy of the containers as a nested set. All indices refer to the
+    Container sub section; the subtree of container i is
+    ``preorder[position[i]:subtree_end[i]]``.
+    """
+
+    parent = Quantity(
+        type=np.int64,
+        shape=['*'],
+        description='The index of the parent container, -1 for roots',
+    )
+    preorder = Quantity(
+        type=np.int64,
+        shape=['*'],
+        description='The container indices in depth-first pre-order',
+    )
+    position = Quantity(
+        type=np.int64,
+        shape=['*'],
+        description='The position of each container in preorder',
+    )
+    subtree_end = Quantity(
+        type=np.int64,
+        shape=['*'],
+        description='The exclusive end of the subtree of each container in preorder',
+    )
+    child_offsets = Quantity(
+        type=np.int64,
+        shape=['*'],
+        description='The children of container i are '
+        'children[child_offsets[i]:child_offsets[i + 1]]',
+    )
+    children = Quantity(type=np.int64, shape=['*'])
+    sorted_ids = Quantity(
+        type=str, shape=['*'], description='The sorted uuids of the containers'
+    )
+    sorted_indices = Quantity(
+        type=np.int64,
+        shape=['*'],
+        description='The index of the container of each uuid in sorted_ids',
+    )
+    element_ids = Quantity(
+        type=str,
+        shape=['*'],
+        description='The sorted uuids of the samples, reactions, etc. that have '
+        'containers',
+    )
+    element_roots = Quantity(
+        type=np.int64,
+        shape=['*'],
+        description='The index of the root container of each element in element_ids',
+    )
+
+    def container_index(self, container_id: str) -> int:
+        i = bisect.bisect_left(self.sorted_ids, container_id)
+        if i == len(self.sorted_ids) or self.sorted_ids[i] != container_id:
+            raise KeyError(container_id)
+        return int(self.sorted_indices[i])
+
+    def children_of(self, index: int) -> np.ndarray:
+        return self.children[self.child_offsets[index] : self.child_offsets[index + 1]]
+
+    def subtree(self, index: int) -> np.ndarray:
+        """The indices of the container and all its descendants in pre-order."""
+        return self.preorder[self.position[index] : self.subtree_end[index]]
+
+    def containers_of(self, element_id: str) -> np.ndarray:
+        """The indices of all containers of a sample, reaction, etc."""
+        start = bisect.bisect_left(self.element_ids, element_id)
+        end = bisect.bisect_right(self.element_ids, element_id, lo=start)
+        subtrees = [self.subtree(root) for root in self.element_roots[start:end]]
+        return np.concatenate(subtrees) if subtrees else np.empty(0, dtype=np.int64)
+
+
+class ChemotionReactionNetwork(MSection):
+    """
+    The samples used and produced by the reactions as adjacency lists. Sample
+    and reaction indices refer to the Sample and Reactions sub sections; the
+    neighbours of node i are ``values[offsets[i]:offsets[i + 1]]``.
+    """
+
+    roles = Quantity(
+        type=str, shape=['*'], description='The role names of the input_roles codes'
+    )
+    input_offsets = Quantity(type=np.int64, shape=['*'])
+    input_samples = Quantity(
+        type=np.int64,
+        shape=['*'],
+        description='The starting materials, reactants and solvents of each reaction',
+    )
+    input_roles = Quantity(
+        type=np.int8, shape=['*'], description='The role of each input sample'
+    )
+    product_offsets = Quantity(type=np.int64, shape=['*'])
+    product_samples = Quantity(
+        type=np.int64, shape=['*'], description='The products of each reaction'
+    )
+    use_offsets = Quantity(type=np.int64, shape=['*'])
+    uses = Quantity(
+        type=np.int64,
+        shape=['*'],
+        description='The reactions that use each sample as an input',
+    )
+    origin_offsets = Quantity(type=np.int64, shape=['*'])
+    origins = Quantity(
+        type=np.int64,
+        shape=['*'],
+        description='The reactions that produce each sample',
+    )
+
+    def inputs_of(self, reaction: int) -> np.ndarray:
+        return self.input_samples[
+            self.input_offsets[reaction] : self.input_offsets[reaction + 1]
+        ]
+
+    def products_of(self, reaction: int) -> np.ndarray:
+        return self.product_samples[
+            self.product_offsets[reaction] : self.product_offsets[reaction + 1]
+        ]
+
+    def where_used(self, sample: int) -> np.ndarray:
+        """The reactions that use the sample as an input."""
+        return self.uses[self.use_offsets[sample] : self.use_offsets[sample + 1]]
+
+    def made_by(self, sample: int) -> np.ndarray:
+        """The reactions that produce the sample."""
+        return self.origins[
+            self.origin_offsets[sample] : self.origin_offsets[sample + 1]
+        ]
+
+    def route(self, sample: int) -> np.ndarray:
+        """
+        All reactions that lead to the sample, each one after the reactions
+        that produce its inputs.
+        """
+        route = []
+        visited = set()
+        stack = [(int(reaction), False) for reaction in self.made_by(sample)[::-1]]
+        while stack:
+            reaction, expanded = stack.pop()
+            if expanded:
+                route.append(reaction)
+                continue
+            if reaction in visited:
+                continue
+            visited.add(reaction)
+            stack.append((reaction, True))
+            for input_sample in self.inputs_of(reaction)[::-1]:
+                stack.extend(
+                    (int(origin), False)
+                    for origin in self.made_by(input_sample)[::-1]
+                    if origin not in visited
+                )
+        return np.asarray(route, dtype=np.int64)
+
+
 class Chemotion(EntryData):
     """
     Each exported .eln formatted file contains ro-crate-metadata.json file which is parsed into this class.
@@ -377,13 +716,34 @@ class Chemotion(EntryData):
     ReactionsSolventSample = SubSection(
         sub_section=ChemotionReactionsSolventSample, repeats=True
     )
+    ReactionsReactantSample = SubSection(
+        sub_section=ChemotionReactionsReactantSample, repeats=True
+    )
+    ReactionsPurificationSolventSample = SubSection(
+        sub_section=ChemotionReactionsPurificationSolventSample, repeats=True
+    )
     ReactionsProductSample = SubSection(
         sub_section=ChemotionReactionsProductSample, repeats=True
     )
+    Wellplate = SubSection(sub_section=ChemotionWellplate, repeats=True)
+    CollectionsWellplate = SubSection(
+        sub_section=ChemotionCollectionsWellplate, repeats=True
+    )
+    Screen = SubSection(sub_section=ChemotionScreen, repeats=True)
+    CollectionsScreen = SubSection(sub_section=ChemotionCollectionsScreen, repeats=True)
+    ScreensWellplate = SubSection(sub_section=ChemotionScreensWellplate, repeats=True)
     ResearchPlan = SubSection(sub_section=ChemotionResearchPlan, repeats=True)
     CollectionsResearchPlan = SubSection(
         sub_section=ChemotionCollectionsResearchPlan, repeats=True
     )
+    SampleColumns = SubSection(sub_section=ChemotionSampleColumns)
+    MoleculeColumns = SubSection(sub_section=ChemotionMoleculeColumns)
+    Files = SubSection(sub_section=ChemotionFiles)
+    Molfiles = SubSection(sub_section=ChemotionMolfiles)
+    Changes = SubSection(sub_section=ChemotionChanges)
+    RowVersions = SubSection(sub_section=ChemotionRowVersions)
+    ContainerTree = SubSection(sub_section=ChemotionContainerTree)
+    ReactionNetwork = SubSection(sub_section=ChemotionReactionNetwork)
 
 
 _element_type_section_mapping = {
@@ -399,20 +759,442 @@ _element_type_section_mapping = {
     'CollectionsReaction': ChemotionCollectionsReaction,
     'ReactionsStartingMaterialSample': ChemotionReactionsStartingMaterialSample,
     'ReactionsSolventSample': ChemotionReactionsSolventSample,
+    'ReactionsReactantSample': ChemotionReactionsReactantSample,
+    'ReactionsPurificationSolventSample': ChemotionReactionsPurificationSolventSample,
     'ReactionsProductSample': ChemotionReactionsProductSample,
+    'Wellplate': ChemotionWellplate,
+    'CollectionsWellplate': ChemotionCollectionsWellplate,
+    'Screen': ChemotionScreen,
+    'CollectionsScreen': ChemotionCollectionsScreen,
+    'ScreensWellplate': ChemotionScreensWellplate,
     'ResearchPlan': ChemotionResearchPlan,
     'CollectionsResearchPlan': ChemotionCollectionsResearchPlan,
 }
 
 
-def _set_inf_to_nan_if_string(dct, key):
-    if key in dct and isinstance(dct[key], str):
-        dct[key] = np.NaN
+# the wells are decoded like the other tables, but stored in grids of their plates
+_decoded_table_mapping = {**_element_type_section_mapping, 'Well': ChemotionWell}
+
+
+_columnar_table_mapping = {
+    'Sample': ChemotionSampleColumns,
+    'Molecule': ChemotionMoleculeColumns,
+}
+
+_reaction_sample_roles = {
+    'ReactionsStartingMaterialSample': 'starting_material',
+    'ReactionsReactantSample': 'reactant',
+    'ReactionsSolventSample': 'solvent',
+    'ReactionsPurificationSolventSample': 'purification_solvent',
+    'ReactionsProductSample': 'product',
+}
+
+_datetime_columns = ('created_at', 'updated_at')
+
+_file_sub_sections = ('Sample', 'Molecule', 'Reactions', 'Attachment')
+
+# the sections that are derived from whole tables, by their path in the archive,
+# and these tables
+_derived_tables = {
+    ('data', 'SampleColumns'): ('Sample',),
+    ('data', 'MoleculeColumns'): ('Molecule',),
+    ('data', 'ContainerTree'): ('Container',),
+    ('data', 'ReactionNetwork'): ('Sample', 'Reactions', *_reaction_sample_roles),
+    ('results',): (
+        'Collection',
+        'Sample',
+        'Molecule',
+        'Reactions',
+        'ResearchPlan',
+        'Wellplate',
+        'Screen',
+    ),
+}
+
+_file_directories = (
+    'attachments',
+    os.path.join('images', 'samples'),
+    os.path.join('images', 'molecules'),
+    os.path.join('images', 'reactions'),
+)
+
+
+_element_symbol_re = re.compile(r'[A-Z][a-z]?')
+
+
+def _unique(values: Iterable) -> list[str]:
+    return list(dict.fromkeys(str(value) for value in values if value))
+
+
+def _formula_elements(formulas: Iterable[str]) -> list[str]:
+    symbols = {
+        symbol for formula in formulas for symbol in _element_symbol_re.findall(formula)
+    }
+    return sorted(symbols & set(chemical_symbols[1:]))
+
+
+def _chemotion_results(chemotion: Chemotion) -> Results:
+    """
+    Collects the names, labels, identifiers and formulas of all elements of the
+    export, so that exports can be found by the compounds they contain.
+    """
+    formulas = _unique(molecule.sum_formular for molecule in chemotion.Molecule)
+    sample_cas = (
+        sample.xref.get('cas', {}).get('value')
+        for sample in chemotion.Sample
+        if isinstance(sample.xref, dict) and isinstance(sample.xref.get('cas'), dict)
+    )
+    eln = ELN(
+        lab_ids=_unique(
+            [
+                *(sample.short_label for sample in chemotion.Sample),
+                *(sample.external_label for sample in chemotion.Sample),
+                *(reaction.short_label for reaction in chemotion.Reactions),
+                *(molecule.inchikey for molecule in chemotion.Molecule),
+                *(cas for molecule in chemotion.Molecule for cas in molecule.cas or []),
+                *sample_cas,
+            ]
+        ),
+        names=_unique(
+            [
+                *(sample.name for sample in chemotion.Sample),
+                *(molecule.iupac_name for molecule in chemotion.Molecule),
+                *(
+                    name
+                    for molecule in chemotion.Molecule
+                    for name in molecule.names or []
+                ),
+                *(reaction.name for reaction in chemotion.Reactions),
+                *(plan.name for plan in chemotion.ResearchPlan),
+                *(wellplate.name for wellplate in chemotion.Wellplate),
+                *(screen.name for screen in chemotion.Screen),
+            ]
+        ),
+        tags=_unique(
+            [*(collection.label for collection in chemotion.Collection), *formulas]
+        ),
+    )
+    results = Results(eln=eln)
+    elements = _formula_elements(formulas)
+    if elements:
+        results.material = Material(elements=elements)
+    return results
+
+
+def _is_deleted(row) -> bool:
+    return isinstance(row, dict) and row.get('deleted_at') not in (None, 'None', '')
+
+
+def _parse_row(item_name: str, row_id: str, row):
+    section_cls = _element_type_section_mapping[item_name]
+    if isinstance(row, dict):
+        row = {k: v for k, v in row.items() if v is not None}
+    section = section_cls(id=row_id)
+    section.m_update_from_dict(row)
+
+    if item_name in ['Sample', 'Molecule', 'Reaction', 'ResearchPlan', 'Attachment']:
+        section.post_process()
+
+    return section
+
+
+def _to_json(data):
+    # as nomad.archive.to_json, which cannot be imported here: nomad.archive
+    # loads the parser entry points and with them this module
+    return data.to_json() if hasattr(data, 'to_json') else data
+
+
+class _PreviousImport:
+    """
+    The archive of the previous import of an export. Only the row versions are
+    read up front; the sections that are reused are read from the archive when
+    they are needed.
+    """
+
+    def __init__(self, reader, archive):
+        self._reader = reader
+        self._archive = archive
+        self.rows = 0
+        self.versions: dict[str, tuple[dict[str, int], np.ndarray]] = {}
+        versions = archive['data'].get('RowVersions')
+        if versions is None:
+            return
+        ids = _to_json(versions['ids'])
+        updated_at = np.asarray(_to_json(versions['updated_at']), dtype=np.float64)
+        offsets = _to_json(versions['offsets'])
+        self.rows = len(ids)
+        for i, table in enumerate(_to_json(versions['tables'])):
+            start, end = offsets[i], offsets[i + 1]
+            self.versions[table] = (
+                {row_id: index for index, row_id in enumerate(ids[start:end])},
+                updated_at[start:end],
+            )
+
+    def unchanged(
+        self, table: str, ids: list[str], updated_at: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the index of each row in the previous import, -1 for new rows,
+        and whether the row is unchanged. Rows without a modification time are
+        unchanged, if they had none before either.
+        """
+        indices, previous_updated_at = self.versions.get(table, ({}, None))
+        positions = np.fromiter(
+            (indices.get(row_id, -1) for row_id in ids), dtype=np.int64, count=len(ids)
+        )
+        if previous_updated_at is None:
+            return positions, np.zeros(len(ids), dtype=bool)
+        previous = previous_updated_at[np.maximum(positions, 0)]
+        same = (previous == updated_at) | (np.isnan(previous) & np.isnan(updated_at))
+        return positions, (positions >= 0) & same
+
+    def section(self, *path: str) -> Optional[dict]:
+        """The serialized section at `path` in the archive, None if it has none."""
+        section = self._archive
+        for name in path:
+            section = section.get(name)
+            if section is None:
+                return None
+        return _to_json(section)
+
+    def close(self):
+        self._reader.close()
+
+
+class _RowChanges:
+    """
+    Compares the rows of an export with the previous import of the same export.
+    Collects the row versions and changes of the new import and tells which
+    derived sections of the previous import can be reused.
+    """
+
+    def __init__(self, previous: Optional[_PreviousImport]):
+        self.previous = previous
+        self.counts = ChemotionChanges(
+            new_rows=0, changed_rows=0, unchanged_rows=0, deleted_rows=0
+        )
+        self.versions: dict[str, tuple[list[str], np.ndarray]] = {}
+        self.unchanged_ids: dict[str, set[str]] = {}
+        self.unchanged_tables: set[str] = set()
+
+    def add_table(
+        self,
+        item_name: str,
+        item_content: dict,
+        columns: dict[str, np.ndarray],
+        parsed: np.ndarray,
+    ):
+        """Compares the parsed rows of a table with their previous versions."""
+        table = 'Reactions' if item_name == 'Reaction' else item_name
+        ids = [row_id for row_id, is_parsed in zip(item_content, parsed) if is_parsed]
+        updated_at = (
+            epoch_seconds(columns['updated_at'])[parsed]
+            if 'updated_at' in columns
+            else np.full(len(ids), np.nan)
+        )
+        self.versions[table] = (ids, updated_at)
+        if self.previous is None:
+            self.counts.new_rows += len(ids)
+            return
+        positions, unchanged = self.previous.unchanged(table, ids, updated_at)
+        known = int((positions >= 0).sum())
+        self.counts.unchanged_rows += int(unchanged.sum())
+        self.counts.changed_rows += known - int(unchanged.sum())
+        self.counts.new_rows += len(ids) - known
+        self.unchanged_ids[table] = {ids[i] for i in np.flatnonzero(unchanged)}
+        # the sections derived from a table only stay the same, if it has the
+        # same rows in the same order
+        previous_ids, _ = self.previous.versions.get(table, ({}, None))
+        if (
+            len(previous_ids) == len(ids)
+            and unchanged.all()
+            and (positions == np.arange(len(ids))).all()
+        ):
+            self.unchanged_tables.add(table)
+
+    def reused(self, path: tuple[str, ...], section_cls) -> Optional[MSection]:
+        """
+        The section at `path` of the previous import, if the tables that it is
+        derived from did not change, otherwise None.
+        """
+        if self.previous is None or not all(
+            table in self.unchanged_tables
+            # or a table that neither import has
+            or (table not in self.versions and table not in self.previous.versions)
+            for table in _derived_tables[path]
+        ):
+            return None
+        section = self.previous.section(*path)
+        return None if section is None else section_cls.m_from_dict(section)
+
+    def checked_files(self, attachments: list) -> tuple[set[str], list[str]]:
+        """
+        The files of unchanged attachments, whose checksums the previous import
+        already verified, and those of them that did not match.
+        """
+        files = self.previous.section('data', 'Files') if self.previous else None
+        if files is None:
+            return set(), []
+        unchanged = self.unchanged_ids.get('Attachment', set())
+        checked = {
+            attachment.file
+            for attachment in attachments
+            if attachment.file and attachment.id in unchanged
+        }
+        mismatches = [
+            path for path in files.get('checksum_mismatches', []) if path in checked
+        ]
+        return checked, mismatches
+
+    def sections(self) -> tuple[ChemotionChanges, ChemotionRowVersions]:
+        if self.previous is not None:
+            self.counts.deleted_rows = self.previous.rows - (
+                self.counts.unchanged_rows + self.counts.changed_rows
+            )
+        return self.counts, _row_versions(self.versions)
+
+
+def _row_versions(
+    versions: dict[str, tuple[list[str], np.ndarray]],
+) -> ChemotionRowVersions:
+    tables = list(versions)
+    lengths = [len(versions[table][0]) for table in tables]
+    return ChemotionRowVersions(
+        tables=tables,
+        offsets=np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]),
+        ids=[row_id for table in tables for row_id in versions[table][0]],
+        updated_at=np.concatenate(
+            [np.zeros(0), *(versions[table][1] for table in tables)]
+        ),
+    )
+
+
+def _linked_molecule(row_id: str, row: dict, reference: str) -> ChemotionMolecule:
+    """
+    The section of a molecule that another entry of the upload holds. It only
+    keeps the identifiers of the molecule and a reference to its full record.
+    """
+    svg_file = row.get('molecule_svg_file')
+    fields = dict(
+        inchikey=row.get('inchikey'),
+        cano_smiles=row.get('cano_smiles'),
+        molfile_version=row.get('molfile_version'),
+        molecule_svg_file=svg_file,
+        file=os.path.join('images', 'molecules', svg_file) if svg_file else None,
+        updated_at=row.get('updated_at'),
+    )
+    return ChemotionMolecule(
+        id=row_id,
+        canonical_molecule=reference,
+        **{name: value for name, value in fields.items() if value is not None},
+    )
+
+
+def _container_tree(containers: list[ChemotionContainer]) -> ChemotionContainerTree:
+    ids = [container.id for container in containers]
+    parent = container_parents(
+        ids,
+        [container.parent_id for container in containers],
+        [container.ancestry for container in containers],
+    )
+    sorted_ids = sorted((container_id, i) for i, container_id in enumerate(ids))
+    elements = sorted(
+        (container.containable_id, i)
+        for i, container in enumerate(containers)
+        if container.containable_id
+    )
+    return ChemotionContainerTree(
+        **nested_set(parent),
+        sorted_ids=[container_id for container_id, _ in sorted_ids],
+        sorted_indices=[i for _, i in sorted_ids],
+        element_ids=[element_id for element_id, _ in elements],
+        element_roots=[i for _, i in elements],
+    )
+
+
+def _reaction_network(chemotion: Chemotion) -> ChemotionReactionNetwork:
+    sample_index = {sample.id: i for i, sample in enumerate(chemotion.Sample)}
+    reaction_index = {reaction.id: i for i, reaction in enumerate(chemotion.Reactions)}
+    samples, reactions, roles = [], [], []
+    for sub_section_name, role in _reaction_sample_roles.items():
+        for row in getattr(chemotion, sub_section_name):
+            if row.sample_id in sample_index and row.reaction_id in reaction_index:
+                samples.append(sample_index[row.sample_id])
+                reactions.append(reaction_index[row.reaction_id])
+                roles.append(ROLES.index(role))
+    return ChemotionReactionNetwork(
+        roles=list(ROLES),
+        **reaction_network(
+            len(sample_index), len(reaction_index), samples, reactions, roles
+        ),
+    )
+
+
+def _store_molfiles(chemotion: Chemotion) -> ChemotionMolfiles:
+    """
+    Moves the molfiles of the samples and molecules into one section, which
+    holds each molfile once.
+    """
+    molfile_store = MolfileStore()
+    for section in (*chemotion.Sample, *chemotion.Molecule):
+        if section.molfile:
+            section.molfile_ref = molfile_store.add(section.molfile)
+            section.molfile = None
+    keys, molfiles = molfile_store.sorted_items()
+    return ChemotionMolfiles(keys=keys, molfiles=molfiles)
+
+
+def _decode_columns(
+    section_cls, ids: list[str], rows: list, decoded: dict[str, np.ndarray]
+) -> ChemotionTableColumns:
+    """
+    Builds the columns of a table. The numbers and timestamps that the table
+    decoder already decoded are taken from `decoded`, the other columns are
+    decoded from the rows.
+    """
+    rows = [row if isinstance(row, dict) else {} for row in rows]
+    columns = section_cls(ids=ids)
+    for name, quantity in section_cls.m_def.all_quantities.items():
+        if name == 'ids':
+            continue
+        values = decoded.get(name)
+        if name in _datetime_columns:
+            if values is None:
+                values = datetime_column(rows, name)
+            values = epoch_seconds(values)
+        elif values is not None:
+            if len(quantity.shape) == 1:
+                values = np.where(values[:, 0] == values[:, 1], values[:, 0], np.nan)
+        elif len(quantity.shape) > 1:
+            values = range_column(rows, name)
+        else:
+            values = numeric_column(rows, name)
+        columns.m_set(quantity, values)
+    return columns
+
+
+class ChemotionOptions(NamedTuple):
+    """The options of the Chemotion parser, see `ChemotionEntryPoint`."""
+
+    columnar: bool = True
+    verify_files: bool = True
+    checksum_workers: int = 4
+    store_molfiles: bool = False
+    incremental: bool = False
+    molecule_store: Optional[str] = None
+    molecule_store_timeout: float = 30.0
+    collections: Optional[list[str]] = None
+    tables: Optional[list[str]] = None
 
 
 class ChemotionParser(MatchingParser):
     creates_children = True
 
+    def __init__(self, *args, options: ChemotionOptions = ChemotionOptions(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.options = options
+        self._molecules: Optional[MoleculeStore] = None
+
     def is_mainfile(
         self,
         filename: str,
@@ -429,41 +1211,410 @@ class ChemotionParser(MatchingParser):
 
         return [str(0)]
 
+    def _verify_files(
+        self,
+        chemotion: Chemotion,
+        export_dir: str,
+        logger,
+        orphans: bool = True,
+        changes: Optional[_RowChanges] = None,
+    ):
+        manifest = ExportManifest(export_dir)
+        referenced = dict.fromkeys(
+            section.file
+            for sub_section_name in _file_sub_sections
+            for section in getattr(chemotion, sub_section_name)
+            if section.file
+        )
+        # unchanged attachments keep the checksum result of the previous import
+        checked, checksum_mismatches = (
+            changes.checked_files(chemotion.Attachment) if changes else (set(), [])
+        )
+        checksums = {
+            attachment.file: attachment.checksum
+            for attachment in chemotion.Attachment
+            if attachment.file
+            and attachment.checksum
+            and attachment.file not in checked
+        }
+
+        files = ChemotionFiles(
+            missing_files=[path for path in referenced if path not in manifest],
+            orphan_files=(
+                manifest.orphans(referenced, _file_directories) if orphans else []
+            ),
+            checksum_mismatches=checksum_mismatches
+            + manifest.verify_checksums(
+                checksums, max_workers=self.options.checksum_workers
+            ),
+        )
+        chemotion.Files = files
+
+        if files.missing_files or files.orphan_files or files.checksum_mismatches:
+            logger.warning(
+                'inconsistent files in chemotion export',
+                details=dict(
+                    missing_files=len(files.missing_files),
+                    orphan_files=len(files.orphan_files),
+                    checksum_mismatches=len(files.checksum_mismatches),
+                ),
+            )
+
+    def _load_decoders(self, mainfile: str, logger) -> dict[str, TableDecoder]:
+        """
+        Returns the decoders of all tables, compiled from the schema of the
+        export. Tables that the schema does not describe are decoded without
+        validation.
+        """
+        decoders = {}
+        schema_path = os.path.join(os.path.dirname(mainfile), 'schema.json')
+        if os.path.exists(schema_path):
+            try:
+                decoders = load_decoders(schema_path, _decoded_table_mapping)
+            except Exception as e:
+                logger.warning('could not compile the chemotion schema', exc_info=e)
+        for decoder in decoders.values():
+            if decoder.incompatible_columns:
+                logger.warning(
+                    'chemotion columns do not match their quantities and are ignored',
+                    details=dict(
+                        table=decoder.table, columns=decoder.incompatible_columns
+                    ),
+                )
+        return {
+            table: decoders.get(table) or TableDecoder(table, {}, {}, section_cls)
+            for table, section_cls in _decoded_table_mapping.items()
+        }
+
+    def _read_export(self, mainfile: str) -> dict:
+        """
+        Reads the tables of the export with the selected rows and without the
+        deleted rows of an incremental import.
+        """
+        with open(mainfile) as f:
+            data = json.load(f)
+        if self.options.collections is not None or self.options.tables is not None:
+            data = select_rows(data, self.options.collections, self.options.tables)
+        if self.options.incremental:
+            data = {
+                item_name: {
+                    row_id: row
+                    for row_id, row in item_content.items()
+                    if not _is_deleted(row)
+                }
+                for item_name, item_content in data.items()
+            }
+        return data
+
+    def _parse_table(
+        self,
+        item_name: str,
+        item_content: dict,
+        decoder: TableDecoder,
+        logger,
+        linked: Optional[dict[str, str]] = None,
+    ) -> tuple[list[MSection], dict[str, np.ndarray], np.ndarray]:
+        """
+        Parses the rows of a table into sections. The rows are decoded together,
+        column by column. Returns the sections, the decoded numbers and
+        timestamps by column and which rows were parsed. The rows in `linked`
+        only reference the record that their id is mapped to.
+        """
+        rows = list(item_content.values())
+        invalid_values: Counter = Counter()
+        columns: dict[str, np.ndarray] = {}
+        decoded_rows = decoder.decode_rows(
+            [row if isinstance(row, dict) else {} for row in rows],
+            invalid_values,
+            columns,
+        )
+        sections = []
+        parsed = np.zeros(len(rows), dtype=bool)
+        failed_rows = 0
+        for i, (row_id, row) in enumerate(item_content.items()):
+            try:
+                if linked and row_id in linked:
+                    section = _linked_molecule(row_id, decoded_rows[i], linked[row_id])
+                else:
+                    section = _parse_row(
+                        item_name,
+                        row_id,
+                        decoded_rows[i] if isinstance(row, dict) else row,
+                    )
+                sections.append(section)
+                parsed[i] = True
+            except Exception as e:
+                if not failed_rows:
+                    first_error = e
+                failed_rows += 1
+
+        if invalid_values:
+            logger.warning(
+                'invalid values in chemotion table are ignored',
+                details=dict(table=item_name, columns=dict(invalid_values)),
+            )
+        if failed_rows:
+            logger.error(
+                'could not parse chemotion rows',
+                details=dict(table=item_name, rows=failed_rows, error=str(first_error)),
+                exc_info=first_error,
+            )
+        return sections, columns, parsed
+
+    def _fill_wellplates(
+        self, chemotion: Chemotion, wells: dict, decoder: TableDecoder, logger
+    ):
+        invalid_values: Counter = Counter()
+        decoded_rows = decoder.decode_rows(
+            [row if isinstance(row, dict) else {} for row in wells.values()],
+            invalid_values,
+        )
+        if invalid_values:
+            logger.warning(
+                'invalid values in chemotion table are ignored',
+                details=dict(table='Well', columns=dict(invalid_values)),
+            )
+        grids, duplicates, invalid_wells = well_grids(
+            [dict(row, id=row_id) for row_id, row in zip(wells, decoded_rows)]
+        )
+        if invalid_wells:
+            logger.warning(
+                'wells without a valid position or with invalid values are ignored',
+                details=dict(wells=len(invalid_wells)),
+            )
+        if duplicates:
+            logger.warning(
+                'wells with the position of another well of their plate are ignored',
+                details=dict(
+                    wellplates=len(duplicates),
+                    wells=sum(len(ids) for ids in duplicates.values()),
+                ),
+            )
+        for wellplate in chemotion.Wellplate:
+            wellplate.m_update(**grids.pop(wellplate.id, {}))
+        if grids:
+            logger.warning(
+                'wells of unknown wellplates are ignored',
+                details=dict(wellplates=len(grids)),
+            )
+
+    def _add_derived_sections(
+        self,
+        chemotion: Chemotion,
+        data: dict,
+        columns: dict[str, dict[str, np.ndarray]],
+        changes: Optional[_RowChanges],
+    ):
+        """
+        Adds the columns, the container tree and the reaction network. They are
+        reused from the previous import, if their tables did not change.
+        """
+        builders = {}
+        if self.options.columnar:
+            for item_name, section_cls in _columnar_table_mapping.items():
+                if item_name in data:
+                    builders[f'{item_name}Columns'] = partial(
+                        _decode_columns,
+                        section_cls,
+                        list(data[item_name]),
+                        list(data[item_name].values()),
+                        columns.get(item_name, {}),
+                    )
+        if chemotion.Container:
+            builders['ContainerTree'] = partial(_container_tree, chemotion.Container)
+        if chemotion.Reactions:
+            builders['ReactionNetwork'] = partial(_reaction_network, chemotion)
+
+        for name, build in builders.items():
+            section = None
+            if changes is not None:
+                section_cls = Chemotion.m_def.all_sub_sections[name].sub_section
+                section = changes.reused(('data', name), section_cls.section_cls)
+            setattr(chemotion, name, build() if section is None else section)
+
+    def _molecule_store(self) -> Optional[MoleculeStore]:
+        if self.options.molecule_store and self._molecules is None:
+            self._molecules = MoleculeStore(
+                self.options.molecule_store,
+                timeout=self.options.molecule_store_timeout,
+            )
+        return self._molecules
+
+    def _link_molecules(
+        self, rows: dict, child_archive: EntryArchive, logger
+    ) -> dict[str, str]:
+        """
+        Claims the molecules of the export, given as rows by id, by their index.
+        Returns the ids of the molecules that another entry of the upload
+        already holds with a reference to their full record.
+        """
+        metadata = child_archive.metadata
+        if metadata is None or not (
+            metadata.upload_id and metadata.entry_id and metadata.mainfile
+        ):
+            logger.warning('molecules are only deduplicated within uploads')
+            return {}
+
+        molecule_keys = {
+            row_id: molecule_key(row) if isinstance(row, dict) else None
+            for row_id, row in rows.items()
+        }
+        keys: dict[str, int] = {}
+        for index, key in enumerate(molecule_keys.values()):
+            if key:
+                keys.setdefault(key, index)
+
+        molecules = self._molecule_store()
+        upload_id, entry_id = metadata.upload_id, metadata.entry_id
+        owners = molecules.claim(upload_id, entry_id, metadata.mainfile, keys)
+        # the claims of entries that are no longer part of the upload are stale
+        context = child_archive.m_context
+        stale = {
+            owner.entry_id
+            for owner in owners.values()
+            if owner.entry_id != entry_id
+            and context is not None
+            and not context.raw_path_exists(owner.mainfile)
+        }
+        if stale:
+            molecules.release(upload_id, stale)
+            owners = molecules.claim(upload_id, entry_id, metadata.mainfile, keys)
+
+        linked = {
+            row_id: f'../upload/archive/{owners[key].entry_id}'
+            f'#/data/Molecule/{owners[key].index}'
+            for row_id, key in molecule_keys.items()
+            if key and owners[key].entry_id != entry_id
+        }
+        if linked:
+            logger.info(
+                'linked chemotion molecules to other entries of the upload',
+                details=dict(linked_molecules=len(linked), stale_entries=len(stale)),
+            )
+        return linked
+
+    def _read_previous(self, child_archives) -> Optional[_PreviousImport]:
+        """
+        Opens the previously parsed child archive or returns None, if the export
+        was not parsed before.
+        """
+        for child_archive in child_archives.values():
+            upload_files = getattr(child_archive.m_context, 'upload_files', None)
+            metadata = child_archive.metadata
+            if upload_files is None or metadata is None or not metadata.entry_id:
+                return None
+            try:
+                reader = upload_files.read_archive(metadata.entry_id)
+            except Exception:
+                return None
+            try:
+                return _PreviousImport(reader, reader[metadata.entry_id])
+            except Exception:
+                reader.close()
+                return None
+        return None
+
     def parse(
         self, mainfile: str, archive: EntryArchive, logger=None, child_archives=None
     ):
         if logger is None:
             logger = utils.get_logger(__name__)
 
-        chemotion = Chemotion()
-
-        with open(mainfile) as f:
-            data = json.load(f)
+        previous = None
+        if self.options.incremental:
+            previous = self._read_previous(child_archives)
+        try:
+            chemotion, results = self._parse(mainfile, child_archives, previous, logger)
+        finally:
+            if previous is not None:
+                previous.close()
 
-        for item_name, item_content in data.items():
-            for sub_item in item_content.values():
-                if isinstance(sub_item, dict):
-                    sub_item = {k: v for k, v in sub_item.items() if v is not None}
-                try:
-                    chemotion_subsection = _element_type_section_mapping[item_name]()
-                    _set_inf_to_nan_if_string(sub_item, 'melting_point')
-                    _set_inf_to_nan_if_string(sub_item, 'boiling_point')
-
-                    chemotion_subsection.m_update_from_dict(sub_item)
-
-                    if item_name in ['Sample', 'Molecule', 'Reaction', 'ResearchPlan']:
-                        chemotion_subsection.post_process()
-                    item_name = 'Reactions' if item_name == 'Reaction' else item_name
-                    sub_section_def = getattr(chemotion.m_def.section_cls, item_name)
-                    chemotion.m_add_sub_section(
-                        sub_section_def, chemotion_subsection, -1
-                    )
-                except Exception as e:
-                    logger.error(
-                        'No dot (.) is allowed in the column name.',
-                        details=dict(column=item_name),
-                        exc_info=e,
-                    )
         for child_archive in child_archives.values():
             child_archive.data = chemotion
+            child_archive.results = results
         logger.info('eln parsed successfully')
+
+    def _parse(
+        self,
+        mainfile: str,
+        child_archives: dict,
+        previous: Optional[_PreviousImport],
+        logger,
+    ) -> tuple[Chemotion, Results]:
+        options = self.options
+        chemotion = Chemotion()
+        data = self._read_export(mainfile)
+        decoders = self._load_decoders(mainfile, logger)
+        changes = _RowChanges(previous) if options.incremental else None
+        child_archive = next(iter(child_archives.values()))
+
+        # the molecules that other entries hold are linked before their full
+        # sections would be built
+        linked = {}
+        if options.molecule_store and data.get('Molecule'):
+            linked = self._link_molecules(data['Molecule'], child_archive, logger)
+
+        columns: dict[str, dict[str, np.ndarray]] = {}
+        for item_name, item_content in data.items():
+            if item_name == 'Well':
+                continue
+            if item_name not in _element_type_section_mapping:
+                logger.warning(
+                    'unsupported chemotion table is ignored',
+                    details=dict(table=item_name, rows=len(item_content)),
+                )
+                continue
+            sections, columns[item_name], parsed = self._parse_table(
+                item_name,
+                item_content,
+                decoders[item_name],
+                logger,
+                linked if item_name == 'Molecule' else None,
+            )
+            sub_section_name = 'Reactions' if item_name == 'Reaction' else item_name
+            for section in sections:
+                chemotion.m_add_sub_section(
+                    getattr(Chemotion, sub_section_name), section
+                )
+            if changes is not None:
+                changes.add_table(item_name, item_content, columns[item_name], parsed)
+            if item_name == 'Molecule' and options.molecule_store and not parsed.all():
+                # the claims are made again with the indices of the parsed rows
+                self._link_molecules(
+                    dict(compress(item_content.items(), parsed)), child_archive, logger
+                )
+
+        if changes is not None:
+            chemotion.Changes, chemotion.RowVersions = changes.sections()
+            logger.info(
+                'incremental chemotion import', details=chemotion.Changes.m_to_dict()
+            )
+
+        self._add_derived_sections(chemotion, data, columns, changes)
+
+        if data.get('Well'):
+            self._fill_wellplates(chemotion, data['Well'], decoders['Well'], logger)
+
+        if options.store_molfiles:
+            chemotion.Molfiles = _store_molfiles(chemotion)
+
+        if options.verify_files:
+            # the files of rows that are not selected would all be orphans
+            selected = options.collections is not None or options.tables is not None
+            self._verify_files(
+                chemotion,
+                os.path.dirname(mainfile),
+                logger,
+                orphans=not selected,
+                changes=changes,
+            )
+
+        return chemotion, self._results(chemotion, changes)
+
+    def _results(self, chemotion: Chemotion, changes: Optional[_RowChanges]) -> Results:
+        # linked molecules lack the names and formulas of their full record, so
+        # the results of another import may differ, even if no table changed
+        results = None
+        if changes is not None and not self.options.molecule_store:
+            results = changes.reused(('results',), Results)
+        return _chemotion_results(chemotion) if results is None else results
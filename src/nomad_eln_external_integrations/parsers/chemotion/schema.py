@@ -0,0 +1,283 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Table decoders compiled from the ``schema.json`` of a Chemotion export.
+
+Every Chemotion export describes its tables with a JSON schema (draft-07). The
+schema is compiled once per distinct content into one decoder per table. A
+decoder knows, for every column, which JSON types are valid according to the
+schema and can be assigned to the quantity of the section the rows are parsed
+into. The rows of a table are decoded together, column by column. Decoding
+drops invalid values and counts them per column, instead of failing on the
+whole row. Numbers and timestamps are converted in bulk, so that the sections
+do not parse them again one value at a time.
+
+Tables without a schema get a decoder that does not validate the columns, but
+still converts the numbers and timestamps.
+"""
+
+import hashlib
+import json
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from nomad.metainfo import MSection
+from nomad.metainfo.data_type import (
+    JSON,
+    Datetime,
+    ExactNumber,
+    InexactNumber,
+    m_bool,
+    m_str,
+)
+
+from .columnar import range_bounds
+
+_decoders: dict[tuple, dict[str, 'TableDecoder']] = {}
+
+_json_types = {
+    type(None): 'null',
+    bool: 'boolean',
+    int: 'integer',
+    float: 'number',
+    str: 'string',
+    list: 'array',
+    dict: 'object',
+}
+
+_all_json_types = ('string', 'integer', 'number', 'boolean', 'array', 'object', 'null')
+
+# the JSON types that can be assigned to quantities of these types, in the
+# order in which they are checked
+_datatype_json_types = (
+    (JSON, {'object'}),
+    (m_str, {'string', 'integer', 'number', 'boolean'}),
+    (Datetime, {'string'}),
+    (m_bool, {'boolean'}),
+)
+
+_number_json_types = (
+    (ExactNumber, {'integer'}),
+    (InexactNumber, {'integer', 'number'}),
+)
+
+_NUMBER_KINDS = ('integer', 'number')
+
+
+def _schema_types(schema: dict, definitions: dict) -> tuple[set, Optional[str]]:
+    if '$ref' in schema:
+        schema = definitions.get(schema['$ref'].split('/')[-1], {})
+    types = schema.get('type', _all_json_types)
+    types = {types} if isinstance(types, str) else set(types)
+    if 'number' in types:
+        types.add('integer')
+    return types, schema.get('pattern')
+
+
+def _quantity_types(quantity) -> Optional[set]:
+    """The JSON types that can be assigned to the quantity, None for any."""
+    if quantity.shape:
+        return {'array'}
+    datatype = quantity.type
+    json_types = _datatype_json_types
+    if not getattr(datatype, '_disable_type_check', False):
+        json_types += _number_json_types
+    return next(
+        (set(types) for cls, types in json_types if isinstance(datatype, cls)), None
+    )
+
+
+class TableDecoder:
+    """Validates the rows of one table against the schema and the section."""
+
+    def __init__(self, table: str, schema: dict, definitions: dict, section_cls):
+        self.table = table
+        self.incompatible_columns: list[str] = []
+
+        # exports do not always stick to their schema, columns that the schema
+        # does not declare are passed on without validation
+        quantities = section_cls.m_def.all_quantities
+        self.columns: dict[str, Optional[tuple[set, Optional[str]]]] = dict.fromkeys(
+            quantities
+        )
+        self.numbers = {
+            name
+            for name, quantity in quantities.items()
+            if isinstance(quantity.type, InexactNumber) and not quantity.shape
+        }
+        self.datetimes = {
+            name
+            for name, quantity in quantities.items()
+            if isinstance(quantity.type, Datetime)
+        }
+        for name, column_schema in schema.get('properties', {}).items():
+            if name not in quantities:
+                continue
+            types, pattern = _schema_types(column_schema, definitions)
+            types.discard('null')
+            if not types:
+                del self.columns[name]
+                continue
+            quantity_types = _quantity_types(quantities[name])
+            if quantity_types is not None:
+                types &= quantity_types
+            if not types:
+                self.incompatible_columns.append(name)
+                del self.columns[name]
+                continue
+            self.columns[name] = (types, pattern)
+
+    def _decode_numbers(
+        self,
+        name: str,
+        values: pd.Series,
+        decoded: list[dict],
+        columns: Optional[dict],
+    ) -> np.ndarray:
+        """
+        Decodes numbers, also those that Chemotion writes as strings, including
+        ranges like ``'-Infinity...Infinity'`` or ``'12.5...13'``. A range becomes
+        its value, if both bounds are equal, and NaN otherwise; the bounds are
+        only kept in `columns`. Returns which values are valid.
+        """
+        bounds, valid = range_bounds(values)
+        numbers = np.where(bounds[:, 0] == bounds[:, 1], bounds[:, 0], np.nan)
+        positions = values.index.to_numpy()
+        for position, value in zip(positions[valid], numbers[valid].tolist()):
+            decoded[position][name] = value
+        if columns is not None:
+            column = np.full((len(decoded), 2), np.nan)
+            column[positions[valid]] = bounds[valid]
+            columns[name] = column
+        return valid
+
+    def _decode_datetimes(
+        self,
+        name: str,
+        values: pd.Series,
+        decoded: list[dict],
+        columns: Optional[dict],
+    ) -> np.ndarray:
+        """Decodes ISO 8601 timestamps in UTC. Returns which values are valid."""
+        timestamps = pd.to_datetime(values, utc=True, errors='coerce', format='ISO8601')
+        valid = timestamps.notna().to_numpy()
+        positions = values.index.to_numpy()[valid]
+        datetimes = timestamps[valid].dt.to_pydatetime().tolist()
+        for position, value in zip(positions, datetimes):
+            decoded[position][name] = value
+        if columns is not None:
+            column = np.full(len(decoded), np.datetime64('NaT'), dtype='datetime64[ms]')
+            column[positions] = (
+                timestamps[valid].dt.tz_convert(None).to_numpy(dtype='datetime64[ms]')
+            )
+            columns[name] = column
+        return valid
+
+    def decode_rows(
+        self, rows: list[dict], invalid: Counter, columns: Optional[dict] = None
+    ) -> list[dict]:
+        """
+        Returns the values of the rows that can be assigned to the section. The
+        rows are decoded column by column; columns that are not in the section
+        are left out, the invalid values are counted by column in `invalid`.
+
+        Numbers become floats and timestamps datetimes. If `columns` is given,
+        the decoded numbers and timestamps are also put into it by column name,
+        as float64 bounds of shape (n, 2) and as datetime64 values, NaN and NaT
+        for missing and invalid values.
+        """
+        decoded: list[dict] = [{} for _ in rows]
+        names = set().union(*(row.keys() for row in rows)) & self.columns.keys()
+        for name in names:
+            values = pd.Series([row.get(name) for row in rows], dtype=object)
+            kinds = values.map(type).map(_json_types).fillna('object')
+            present = (kinds != 'null').to_numpy(copy=True)
+            valid = present
+            column = self.columns[name]
+            if column is not None:
+                types, pattern = column
+                valid = present & kinds.isin(types).to_numpy()
+                strings = valid & (kinds == 'string').to_numpy()
+                if pattern is not None and strings.any():
+                    matches = values[strings].str.match(pattern)
+                    valid[strings] = matches.to_numpy(dtype=bool)
+            strings = present & (kinds == 'string').to_numpy()
+
+            if name in self.numbers:
+                # Chemotion writes some numbers as strings
+                candidates = strings | (valid & kinds.isin(_NUMBER_KINDS).to_numpy())
+                valid = np.zeros(len(rows), dtype=bool)
+                valid[candidates] = self._decode_numbers(
+                    name, values[candidates], decoded, columns
+                )
+            elif name in self.datetimes:
+                candidates = valid & strings
+                valid = np.zeros(len(rows), dtype=bool)
+                valid[candidates] = self._decode_datetimes(
+                    name, values[candidates], decoded, columns
+                )
+            else:
+                for position, value in zip(
+                    np.flatnonzero(valid), values[valid].tolist()
+                ):
+                    decoded[position][name] = value
+
+            invalid_values = int((present & ~valid).sum())
+            if invalid_values:
+                invalid[name] += invalid_values
+        return decoded
+
+
+def compile_schema(schema: dict, sections: dict[str, type[MSection]]) -> dict:
+    """Compiles the decoders of all tables in the schema that have a section."""
+    definitions = schema.get('definitions', {})
+    decoders = {}
+    for table, table_schema in schema.get('properties', {}).items():
+        if table not in sections:
+            continue
+        rows_schema = table_schema
+        if '$ref' in table_schema:
+            rows_schema = definitions.get(table_schema['$ref'].split('/')[-1], {})
+        row_schemas = list(rows_schema.get('patternProperties', {}).values())
+        row_schema = row_schemas[0] if row_schemas else {}
+        decoders[table] = TableDecoder(table, row_schema, definitions, sections[table])
+    return decoders
+
+
+def load_decoders(path: str, sections: dict[str, type[MSection]]) -> dict:
+    """
+    Returns the compiled decoders for a schema file. The decoders are cached by
+    the sha256 digest of the file content, as most exports share one schema,
+    and the definitions of the sections.
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    key = (
+        hashlib.sha256(content).hexdigest(),
+        tuple(
+            sorted(
+                (table, section_cls.m_def.definition_id)
+                for table, section_cls in sections.items()
+            )
+        ),
+    )
+    if key not in _decoders:
+        _decoders[key] = compile_schema(json.loads(content), sections)
+    return _decoders[key]
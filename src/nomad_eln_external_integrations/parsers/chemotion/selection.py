@@ -0,0 +1,158 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Selects the rows of a Chemotion export by collection and by table.
+
+A collection selection keeps the selected collections, their join table rows
+and the elements they link to. From there, the rows that belong to the kept
+elements are pulled in: the reaction samples and their samples, the wells and
+screens of wellplates, the molecules of samples and the containers and
+attachments of all kept elements.
+"""
+
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Optional
+
+_ANCESTRY_SEPARATOR = '/'
+
+# join table: (element column, element table)
+_collection_joins = {
+    'CollectionsSample': ('sample_id', 'Sample'),
+    'CollectionsReaction': ('reaction_id', 'Reaction'),
+    'CollectionsWellplate': ('wellplate_id', 'Wellplate'),
+    'CollectionsScreen': ('screen_id', 'Screen'),
+    'CollectionsResearchPlan': ('research_plan_id', 'ResearchPlan'),
+}
+
+# (table, owner column, owner table, referenced columns and tables); the rows
+# of a table are kept with their owner and keep the rows they reference, so
+# the order matters
+_dependents = [
+    *(
+        (table, 'reaction_id', 'Reaction', [('sample_id', 'Sample')])
+        for table in (
+            'ReactionsStartingMaterialSample',
+            'ReactionsReactantSample',
+            'ReactionsSolventSample',
+            'ReactionsPurificationSolventSample',
+            'ReactionsProductSample',
+        )
+    ),
+    ('ScreensWellplate', 'screen_id', 'Screen', [('wellplate_id', 'Wellplate')]),
+    ('Well', 'wellplate_id', 'Wellplate', [('sample_id', 'Sample')]),
+    (
+        'Sample',
+        'id',
+        'Sample',
+        [
+            ('molecule_id', 'Molecule'),
+            ('fingerprint_id', 'Fingerprint'),
+            ('molecule_name_id', 'MoleculeName'),
+        ],
+    ),
+    ('MoleculeName', 'molecule_id', 'Molecule', []),
+    ('Residue', 'sample_id', 'Sample', []),
+]
+
+# the tables whose rows can own containers and attachments
+_element_tables = ('Sample', 'Reaction', 'Wellplate', 'Screen', 'ResearchPlan')
+
+
+def _rows(data: dict, table: str) -> Iterable[tuple[str, dict]]:
+    return (
+        (row_id, row)
+        for row_id, row in data.get(table, {}).items()
+        if isinstance(row, dict)
+    )
+
+
+def _select_containers(data: dict, keep: dict[str, set]):
+    elements = set().union(*(keep[table] for table in _element_tables))
+    containers = keep['Container']
+    for row_id, row in _rows(data, 'Container'):
+        if row.get('containable_id') in elements:
+            containers.add(row_id)
+
+    # descendants know all their ancestors, but not necessarily in order
+    children = defaultdict(list)
+    for row_id, row in _rows(data, 'Container'):
+        parents = {row.get('parent_id')}
+        parents.update((row.get('ancestry') or '').split(_ANCESTRY_SEPARATOR))
+        for parent_id in parents - {None, ''}:
+            children[parent_id].append(row_id)
+    stack = list(containers)
+    while stack:
+        for child_id in children.pop(stack.pop(), []):
+            if child_id not in containers:
+                containers.add(child_id)
+                stack.append(child_id)
+
+    attachables = elements | containers
+    for row_id, row in _rows(data, 'Attachment'):
+        if row.get('attachable_id') in attachables:
+            keep['Attachment'].add(row_id)
+
+
+def _select_collections(data: dict, collections: Iterable[str]) -> dict:
+    collections = set(collections)
+    keep: dict[str, set] = defaultdict(set)
+    keep['Collection'] = {
+        row_id
+        for row_id, row in _rows(data, 'Collection')
+        if row_id in collections or row.get('label') in collections
+    }
+
+    for join_table, (column, element_table) in _collection_joins.items():
+        for row_id, row in _rows(data, join_table):
+            if row.get('collection_id') in keep['Collection']:
+                keep[join_table].add(row_id)
+                keep[element_table].add(row.get(column))
+
+    for table, owner_column, owner_table, references in _dependents:
+        for row_id, row in _rows(data, table):
+            owner_id = row_id if owner_column == 'id' else row.get(owner_column)
+            if owner_id not in keep[owner_table]:
+                continue
+            keep[table].add(row_id)
+            for column, referenced_table in references:
+                keep[referenced_table].add(row.get(column))
+
+    _select_containers(data, keep)
+
+    return {
+        table: {row_id: row for row_id, row in rows.items() if row_id in keep[table]}
+        for table, rows in data.items()
+    }
+
+
+def select_rows(
+    data: dict,
+    collections: Optional[Iterable[str]] = None,
+    tables: Optional[Iterable[str]] = None,
+) -> dict:
+    """
+    Returns the export `data` reduced to the rows of the given collections,
+    given by uuid or label, and to the given tables. None selects everything.
+    """
+    if collections is not None:
+        data = _select_collections(data, collections)
+    if tables is not None:
+        tables = set(tables)
+        data = {table: rows for table, rows in data.items() if table in tables}
+    return data
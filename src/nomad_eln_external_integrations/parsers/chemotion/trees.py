@@ -0,0 +1,122 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+A nested-set index of the Chemotion container hierarchy.
+
+Chemotion stores the hierarchy of containers twice: as a ``parent_id`` and as an
+``ancestry`` path of uuids, nearest ancestor first. From these, the containers
+are numbered in depth-first pre-order, so that the subtree of every container is
+one contiguous slice of that order.
+"""
+
+from collections.abc import Sequence
+from typing import Optional
+
+import numpy as np
+
+_ANCESTRY_SEPARATOR = '/'
+
+
+def _parent_id(parent_id: Optional[str], ancestry: Optional[str]) -> Optional[str]:
+    if parent_id:
+        return parent_id
+    if ancestry:
+        return ancestry.split(_ANCESTRY_SEPARATOR, 1)[0] or None
+    return None
+
+
+def container_parents(
+    ids: Sequence[str],
+    parent_ids: Sequence[Optional[str]],
+    ancestries: Sequence[Optional[str]],
+) -> np.ndarray:
+    """
+    Returns the index of the parent of each container, or -1 for containers
+    without a parent in `ids`. The ``parent_id`` takes precedence over the
+    ``ancestry``.
+    """
+    index = {container_id: i for i, container_id in enumerate(ids)}
+    return np.fromiter(
+        (
+            index.get(_parent_id(parent_id, ancestry), -1)
+            for parent_id, ancestry in zip(parent_ids, ancestries)
+        ),
+        dtype=np.int64,
+        count=len(ids),
+    )
+
+
+def nested_set(parent: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Numbers a forest given by its parent array in depth-first pre-order.
+
+    Returns a dict with the arrays:
+        parent: The parent array; containers on a cycle are cut loose as roots.
+        preorder: The container indices in pre-order, siblings in index order.
+        position: The position of each container in `preorder`.
+        subtree_end: The exclusive end of each subtree in `preorder`.
+        child_offsets: The children of container i are
+            ``children[child_offsets[i]:child_offsets[i + 1]]``.
+        children: The container indices grouped by parent.
+    """
+    n = len(parent)
+    parent = np.array(parent, dtype=np.int64)
+    visited = np.zeros(n, dtype=bool)
+    preorder = []
+    cut = False
+
+    def children_of(parent):
+        order = np.argsort(parent, kind='stable')
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(parent[parent >= 0], minlength=n), out=offsets[1:])
+        return offsets, order[parent[order] >= 0]
+
+    child_offsets, children = children_of(parent)
+    for root in [*np.flatnonzero(parent < 0), *range(n)]:
+        if visited[root]:
+            continue
+        cut |= bool(parent[root] >= 0)
+        parent[root] = -1
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if visited[node]:
+                continue
+            visited[node] = True
+            preorder.append(node)
+            stack.extend(children[child_offsets[node] : child_offsets[node + 1]][::-1])
+
+    preorder = np.asarray(preorder, dtype=np.int64)
+    if cut:
+        child_offsets, children = children_of(parent)
+
+    position = np.empty(n, dtype=np.int64)
+    position[preorder] = np.arange(n)
+    size = np.ones(n, dtype=np.int64)
+    for node in preorder[::-1]:
+        if parent[node] >= 0:
+            size[parent[node]] += size[node]
+
+    return dict(
+        parent=parent,
+        preorder=preorder,
+        position=position,
+        subtree_end=position + size,
+        child_offsets=child_offsets,
+        children=children,
+    )
@@ -1,7 +1,60 @@
 from nomad.config.models.plugins import SchemaPackageEntryPoint
+from pydantic import Field
 
 
 class LabfolderEntryPoint(SchemaPackageEntryPoint):
+    fetch_workers: int = Field(
+        8,
+        description='The number of labfolder element versions that are requested '
+        'concurrently during a resync.',
+    )
+    entries_page_size: int = Field(
+        50, description='The number of labfolder entries requested per page.'
+    )
+    entries_prefetch: int = Field(
+        1,
+        description='The number of pages of labfolder entries that are requested '
+        'ahead of the page that is processed.',
+    )
+    download_workers: int = Field(
+        4,
+        description='The number of labfolder file and image downloads that run '
+        'at the same time.',
+    )
+    download_chunk_size: int = Field(
+        1024 * 1024,
+        description='The number of bytes that are read and written at a time '
+        'when labfolder files are downloaded.',
+    )
+    download_resumes: int = Field(
+        3,
+        description='How often an interrupted labfolder download is resumed '
+        'before it fails.',
+    )
+    max_concurrent_requests: int = Field(
+        8,
+        description='The maximum number of concurrent labfolder api requests. '
+        'The number is lowered while the server is throttling.',
+    )
+    max_retries: int = Field(
+        5,
+        description='How often a throttled or failed labfolder api request is retried.',
+    )
+    retry_delay: float = Field(
+        0.5,
+        description='The base of the exponential backoff between retries in seconds.',
+    )
+    max_retry_delay: float = Field(
+        30.0,
+        description='The maximum delay between retries in seconds, also when '
+        'the server asks for longer with Retry-After.',
+    )
+    sanitize_cache_size: int = Field(
+        4096,
+        description='The number of sanitized labfolder text contents that are '
+        'cached. The cache is kept in memory by every worker process.',
+    )
+
     def load(self):
         from nomad_eln_external_integrations.schema_packages.labfolder.schema import (
             m_package,
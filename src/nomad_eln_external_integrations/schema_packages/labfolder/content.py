@@ -0,0 +1,172 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+The index of the Labfolder files that were downloaded into an upload.
+
+Files are indexed by the element version they were downloaded for and by the
+sha256 digest of their content. A file that is already indexed for an element
+version is not downloaded again and identical content is only stored once.
+Downloads are written once, into a temporary file in the raw directory of the
+upload, and hashed while they are written. New content is then moved to its
+path, identical content is removed.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections.abc import Callable
+from typing import IO, Optional
+
+from .fetch import _PathLocks
+
+INDEX_FILE = 'labfolder-content-index.json'
+
+_TEMPORARY_PREFIX = '.labfolder-download-'
+
+
+def _raw_directory(context) -> str:
+    # a client context keeps the raw files in its local directory
+    return getattr(context, 'local_dir', None) or context.raw_path()
+
+
+class _HashingFile:
+    """A binary file that updates a digest with everything written into it."""
+
+    def __init__(self, path: str, mode: str, sha256):
+        self._file = open(path, mode.replace('t', '').replace('b', '') + 'b')
+        self._sha256 = sha256
+
+    def write(self, data) -> int:
+        if isinstance(data, str):
+            data = data.encode()
+        self._sha256.update(data)
+        return self._file.write(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._file.close()
+
+
+class ContentIndex:
+    """
+    The downloaded files of an upload. `elements` maps element version keys to
+    digests and `files` maps digests to the paths of the raw files.
+    """
+
+    def __init__(self, context, path: str = INDEX_FILE):
+        self.context = context
+        self.path = path
+        self._lock = threading.Lock()
+        self._key_locks = _PathLocks()
+        self._changed = False
+
+        data = {}
+        if context.raw_path_exists(path):
+            with context.raw_file(path, 'r') as f:
+                data = json.load(f)
+        self.elements: dict[str, str] = data.get('elements', {})
+        self.files: dict[str, str] = data.get('files', {})
+
+    def stored_file(self, key: str) -> Optional[str]:
+        """The path of the file that was downloaded for the key, if it still exists."""
+        with self._lock:
+            path = self.files.get(self.elements.get(key))
+        if path is not None and self.context.raw_path_exists(path):
+            return path
+        return None
+
+    def _file_path(self, digest: str, file_name: str) -> str:
+        path = self.files.get(digest)
+        if path is not None and self.context.raw_path_exists(path):
+            return path
+
+        # a different content might already be stored with the same name
+        path = file_name
+        if any(
+            other_path == path and other_digest != digest
+            for other_digest, other_path in self.files.items()
+        ):
+            stem, extension = os.path.splitext(file_name)
+            path = f'{stem}-{digest[:12]}{extension}'
+        return path
+
+    def download(
+        self, key: str, download: Callable[[Callable[[str, str], IO]], str]
+    ) -> str:
+        """
+        Returns the path of the file for the key. If it is not stored yet,
+        `download` is called with a function that opens a temporary file and
+        has to return the file name. The content is only kept in the upload if
+        no file with the same content exists. Downloads for the same key do not
+        run at the same time, downloads for different keys do.
+        """
+        path = self.stored_file(key)
+        if path is not None:
+            return path
+
+        with self._key_locks(key):
+            path = self.stored_file(key)
+            if path is not None:
+                return path
+            return self._download(key, download)
+
+    def _download(
+        self, key: str, download: Callable[[Callable[[str, str], IO]], str]
+    ) -> str:
+        raw_directory = _raw_directory(self.context)
+        fd, content_path = tempfile.mkstemp(prefix=_TEMPORARY_PREFIX, dir=raw_directory)
+        os.close(fd)
+        sha256 = hashlib.sha256()
+
+        def open_content(_, mode):
+            nonlocal sha256
+            if 'a' not in mode:
+                sha256 = hashlib.sha256()
+            return _HashingFile(content_path, mode, sha256)
+
+        try:
+            file_name = download(open_content)
+            digest = sha256.hexdigest()
+            with self._lock:
+                path = self._file_path(digest, file_name)
+                if self.files.get(digest) != path:
+                    # a rename within the raw directory, the content is not copied
+                    target = os.path.join(raw_directory, path)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(content_path, target)
+                    self.files[digest] = path
+                self.elements[key] = digest
+                self._changed = True
+        finally:
+            if os.path.exists(content_path):
+                os.remove(content_path)
+
+        return path
+
+    def save(self):
+        """Writes the index into the upload, if it has changed."""
+        with self._lock:
+            if not self._changed:
+                return
+            with self.context.raw_file(self.path, 'w') as f:
+                json.dump(dict(elements=self.elements, files=self.files), f)
+            self._changed = False
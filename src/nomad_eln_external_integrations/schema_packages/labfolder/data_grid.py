@@ -0,0 +1,101 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Decoding of the numeric values in the grids of Labfolder DATA elements.
+
+The API returns every value as a string. The values of all single data elements
+in a grid are gathered by their unit and converted with one pandas call, so
+that a grid becomes a float array with a unit per unit that it uses. Values are
+read as numbers by the same rule as table cells, see `numbers`.
+"""
+
+from collections.abc import Iterator
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from nomad.units import ureg
+
+from .numbers import to_numbers
+
+PATH_SEPARATOR = '/'
+
+
+def walk(items: list[dict]) -> Iterator[tuple[str, dict, Optional[dict]]]:
+    """
+    Iterates the nested data elements without recursion. Yields the path of
+    the grid that contains the item, the item and its parent item, parents
+    before their children and children in their order.
+    """
+    stack = [('', item, None) for item in reversed(items)]
+    while stack:
+        path, item, parent = stack.pop()
+        yield path, item, parent
+        children = item.get('children')
+        if children:
+            child_path = f'{path}{PATH_SEPARATOR}{item.get("title")}'
+            stack.extend((child_path, child, item) for child in reversed(children))
+
+
+def _unit(unit: Optional[str]) -> Optional[str]:
+    if not unit:
+        return None
+    try:
+        return str(ureg.Unit(unit))
+    except Exception:
+        # units that pint does not know are kept as they are
+        return unit
+
+
+def _to_float64(values: list) -> np.ndarray:
+    array = to_numbers(pd.Series(values, dtype=object)).to_numpy(np.float64, copy=True)
+    array[~np.isfinite(array)] = np.nan
+    return array
+
+
+def numeric_arrays(items: list[dict]) -> list[dict]:
+    """
+    Returns the numeric values of the single data elements in `items` grouped
+    by grid path and unit, as dicts with the path, the unit, the titles and a
+    float64 array of the values. Values that are not numbers are left out.
+    """
+    groups: dict[tuple[str, Optional[str]], tuple[list, list]] = {}
+    for path, item, _ in walk(items):
+        if item.get('children') is not None or item.get('value') is None:
+            continue
+        titles, values = groups.setdefault(
+            (path or PATH_SEPARATOR, _unit(item.get('unit'))), ([], [])
+        )
+        titles.append(item.get('title'))
+        values.append(item['value'])
+
+    arrays = []
+    for (path, unit), (titles, values) in groups.items():
+        array = _to_float64(values)
+        numeric = ~np.isnan(array)
+        if not numeric.any():
+            continue
+        arrays.append(
+            dict(
+                path=path,
+                unit=unit,
+                titles=[title for title, keep in zip(titles, numeric) if keep],
+                values=array[numeric],
+            )
+        )
+    return arrays
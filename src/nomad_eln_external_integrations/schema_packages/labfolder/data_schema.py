@@ -0,0 +1,153 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Mappings from the ``labfolder_data`` of Labfolder DATA elements to sections.
+
+The ``labfolder_data`` of a DATA element is a nested dict: groups are keyed by
+their title and hold further groups or leaves, leaves are dicts with a value,
+a unit and a description. A mapping is compiled once per target section
+definition. Group and leaf titles are matched with sub-section and quantity
+names, ignoring case and non-alphanumeric characters. Values are converted
+to the type and unit of their quantity. The compiled mappings of the most
+recently used definitions are cached.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Optional
+
+from nomad.metainfo import MSection, Quantity, Section, SubSection
+from nomad.metainfo.data_type import ExactNumber, InexactNumber, m_bool
+from nomad.units import ureg
+
+_LEAF_KEYS = frozenset(('value', 'unit', 'description'))
+
+# the number of compiled mappings that are cached
+MAPPING_CACHE_SIZE = 256
+
+_mappings: 'OrderedDict[str, SectionMapping]' = OrderedDict()
+_mappings_lock = threading.Lock()
+
+
+def _key(name: str) -> str:
+    return re.sub(r'[^0-9a-z]+', '_', name.lower()).strip('_')
+
+
+def _is_leaf(value) -> bool:
+    return isinstance(value, dict) and set(value) == _LEAF_KEYS
+
+
+def _converter(quantity: Quantity) -> Callable[[dict], Any]:
+    """Compiles the conversion of a leaf into a value of the quantity."""
+    datatype = quantity.type
+    if isinstance(datatype, ExactNumber):
+        number = int
+    elif isinstance(datatype, InexactNumber):
+        number = float
+    elif isinstance(datatype, m_bool):
+        return lambda leaf: str(leaf['value']).strip().lower() in ('true', '1', 'yes')
+    else:
+        return lambda leaf: (
+            leaf['value'] if leaf['value'] is not None else leaf['description']
+        )
+
+    if quantity.unit is None:
+        return lambda leaf: number(leaf['value'])
+
+    def convert(leaf):
+        value = number(leaf['value'])
+        if leaf['unit']:
+            return ureg.Quantity(value, leaf['unit'])
+        return value * quantity.unit
+
+    return convert
+
+
+class SectionMapping:
+    """The compiled mapping of `labfolder_data` onto one section definition."""
+
+    def __init__(self, section_def: Section):
+        self.section_def = section_def
+        self.quantities: dict[str, tuple[Quantity, Callable[[dict], Any]]] = {
+            _key(name): (quantity, _converter(quantity))
+            for name, quantity in section_def.all_quantities.items()
+        }
+        self.sub_sections: dict[str, SubSection] = {
+            _key(name): sub_section
+            for name, sub_section in section_def.all_sub_sections.items()
+        }
+
+    def apply(self, data: dict) -> tuple[MSection, list[str], list[str]]:
+        """
+        Creates a section from the data. Returns the section, the paths of the
+        data that have no quantity or sub-section, and the paths of the values
+        that could not be converted.
+        """
+        root = self.section_def.section_cls()
+        unmapped: list[str] = []
+        invalid: list[str] = []
+        stack = [(self, root, data, '')]
+        while stack:
+            mapping, section, values, path = stack.pop()
+            for title, value in values.items():
+                item_path = f'{path}/{title}'
+                key = _key(str(title))
+                if _is_leaf(value):
+                    if key not in mapping.quantities:
+                        unmapped.append(item_path)
+                        continue
+                    quantity, convert = mapping.quantities[key]
+                    if value['value'] is None and value['description'] is None:
+                        continue
+                    try:
+                        section.m_set(quantity, convert(value))
+                    except Exception:
+                        invalid.append(item_path)
+                    continue
+
+                sub_section = mapping.sub_sections.get(key)
+                if sub_section is None or not isinstance(value, dict):
+                    unmapped.append(item_path)
+                    continue
+                child = sub_section.sub_section.section_cls()
+                section.m_add_sub_section(sub_section, child)
+                stack.append(
+                    (compile_mapping(sub_section.sub_section), child, value, item_path)
+                )
+        return root, unmapped, invalid
+
+
+def compile_mapping(section_def: Section) -> SectionMapping:
+    """Returns the mapping for the section definition, compiled once."""
+    key: Optional[str] = getattr(section_def, 'definition_id', None)
+    if key is None:
+        return SectionMapping(section_def)
+    with _mappings_lock:
+        mapping = _mappings.get(key)
+        if mapping is not None:
+            _mappings.move_to_end(key)
+            return mapping
+    mapping = SectionMapping(section_def)
+    with _mappings_lock:
+        _mappings[key] = mapping
+        _mappings.move_to_end(key)
+        while len(_mappings) > MAPPING_CACHE_SIZE:
+            _mappings.popitem(last=False)
+    return mapping
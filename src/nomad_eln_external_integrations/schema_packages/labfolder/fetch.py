@@ -0,0 +1,339 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Concurrent requests and streaming downloads for the Labfolder API.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import IO, NamedTuple, Optional, TypeVar
+
+import requests
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# the responses that signal a throttling or temporarily unavailable server
+RETRY_STATUS_CODES = frozenset(
+    (
+        requests.codes.too_many_requests,
+        requests.codes.bad_gateway,
+        requests.codes.service_unavailable,
+        requests.codes.gateway_timeout,
+    )
+)
+
+# the number of calls per worker that `ordered_map` submits ahead of the results
+ORDERED_MAP_WINDOW = 2
+
+
+class Retries(NamedTuple):
+    """How often and how long to retry a request."""
+
+    max_retries: int
+    base_delay: float
+    max_delay: float
+
+
+class Chunks(NamedTuple):
+    """How to stream a download."""
+
+    chunk_size: int
+    max_resumes: int
+
+
+def ordered_map(
+    function: Callable[[T], R], items: Iterable[T], max_workers: int
+) -> Iterator[R]:
+    """
+    Applies `function` to all items with up to `max_workers` calls running at
+    a time and yields the results in the order of the items. The items are
+    consumed lazily: at most `ORDERED_MAP_WINDOW` calls per worker are submitted
+    ahead of the result that is yielded next. If a call raises, the exception is
+    re-raised when its result is reached and the calls that have not started
+    yet are cancelled.
+    """
+    if max_workers <= 1:
+        yield from map(function, items)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    window = max_workers * ORDERED_MAP_WINDOW
+    futures = deque()
+    try:
+        for item in items:
+            futures.append(executor.submit(function, item))
+            if len(futures) >= window:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def paged(
+    fetch_page: Callable[[int, int], list], page_size: int, prefetch: int
+) -> Iterator[list]:
+    """
+    Yields the pages of a limit/offset paginated list. `fetch_page` is called
+    with offset and limit. The first page is fetched in the calling thread, the
+    next `prefetch` pages are requested while the current page is processed.
+    The list ends with the first short page.
+    """
+    page = fetch_page(0, page_size)
+    if page:
+        yield page
+    if len(page) < page_size:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max(prefetch, 1))
+    try:
+        offset = page_size
+        futures = deque()
+        while True:
+            while len(futures) <= prefetch:
+                futures.append(executor.submit(fetch_page, offset, page_size))
+                offset += page_size
+            page = futures.popleft().result()
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _PathLocks:
+    """Locks by file path that only exist while they are used."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks: dict[str, list] = {}
+
+    @contextmanager
+    def __call__(self, path: str):
+        with self._lock:
+            lock = self._locks.setdefault(path, [threading.Lock(), 0])
+            lock[1] += 1
+        try:
+            with lock[0]:
+                yield
+        finally:
+            with self._lock:
+                lock[1] -= 1
+                if not lock[1]:
+                    del self._locks[path]
+
+
+_path_locks = _PathLocks()
+
+
+def download(
+    request: Callable[..., requests.Response],
+    url: str,
+    raw_file: Callable[[str, str], IO[bytes]],
+    file_name: Callable[[requests.Response], str],
+    chunks: Chunks,
+) -> str:
+    """
+    Streams the content of `url` in chunks of `chunks.chunk_size` bytes into the
+    raw file named by `file_name(response)` and returns the name. An interrupted
+    transfer is resumed with a range request for the missing bytes up to
+    `chunks.max_resumes` times; if the server ignores the range, the file is
+    written again from the start. Downloads to the same file do not run at the
+    same time.
+    """
+    response = request(url, stream=True)
+    try:
+        path = file_name(response)
+    except BaseException:
+        response.close()
+        raise
+    with _path_locks(path):
+        mode, written = 'wb', 0
+        max_resumes = max(chunks.max_resumes, 0)
+        for resume in range(max_resumes + 1):
+            with closing(response):
+                try:
+                    with raw_file(path, mode) as f:
+                        for chunk in response.iter_content(
+                            chunk_size=chunks.chunk_size
+                        ):
+                            f.write(chunk)
+                            written += len(chunk)
+                    return path
+                except (
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.ConnectionError,
+                ):
+                    if resume == max_resumes:
+                        raise
+
+            response = request(
+                url, stream=True, headers=dict(Range=f'bytes={written}-')
+            )
+            if response.status_code == requests.codes.partial_content:
+                mode = 'ab'
+            else:
+                mode, written = 'wb', 0
+
+
+class AdaptiveLimit:
+    """
+    Limits the number of concurrent requests. The limit is halved when the
+    server throttles and increased by one again after as many healthy responses
+    as the current limit, but never beyond `maximum`. Throttled responses to
+    requests that were started before the last decrease do not decrease the
+    limit again.
+    """
+
+    def __init__(self, maximum: int):
+        self.maximum = max(maximum, 1)
+        self.limit = self.maximum
+        self._running = 0
+        self._successes = 0
+        self._generation = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> int:
+        """Waits for a free slot and returns the generation to release it with."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._running < self.limit)
+            self._running += 1
+            return self._generation
+
+    def release(self, generation: int, throttled: bool):
+        with self._condition:
+            self._running -= 1
+            if throttled:
+                if generation == self._generation:
+                    self.limit = max(self.limit // 2, 1)
+                    self._generation += 1
+                    self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+def retry_after(response: Optional[requests.Response]) -> Optional[float]:
+    """The seconds to wait according to the `Retry-After` header, if any."""
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def backoff(attempt: int, base: float, maximum: float) -> float:
+    """An exponential backoff with full jitter."""
+    return random.uniform(0, min(maximum, base * 2**attempt))
+
+
+def _release_on_close(
+    response: requests.Response, limit: AdaptiveLimit, generation: int, throttled: bool
+):
+    close = response.close
+    released = False
+
+    def close_and_release():
+        nonlocal released
+        try:
+            close()
+        finally:
+            if not released:
+                released = True
+                limit.release(generation, throttled=throttled)
+
+    response.close = close_and_release
+
+
+def send_with_retries(
+    send: Callable[[], requests.Response],
+    limit: AdaptiveLimit,
+    retries: Retries,
+    on_retry: Optional[
+        Callable[[int, float, Optional[requests.Response]], None]
+    ] = None,
+    stream: bool = False,
+) -> requests.Response:
+    """
+    Sends a request within the `limit` and retries it up to
+    `retries.max_retries` times while the server throttles, is unavailable or
+    cannot be reached. Between attempts, it waits as long as the server asks for
+    with `Retry-After`, but at most `retries.max_delay`, or for a jittered
+    exponential backoff. The last response is returned and the last connection
+    error is raised when all attempts fail. The response of a `stream` request
+    keeps its slot of the limit until it is closed, so that the transfer of the
+    body counts as running.
+    """
+    max_retries = max(retries.max_retries, 0)
+    for attempt in range(max_retries + 1):
+        response, error = None, None
+        generation = limit.acquire()
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        except BaseException:
+            limit.release(generation, throttled=False)
+            raise
+
+        retry = error is not None or response.status_code in RETRY_STATUS_CODES
+        last = not retry or attempt == max_retries
+        if stream and last and response is not None:
+            _release_on_close(response, limit, generation, throttled=retry)
+            break
+        limit.release(generation, throttled=retry)
+        if last:
+            break
+        if stream and response is not None:
+            response.close()
+
+        delay = retry_after(response)
+        if delay is None:
+            delay = backoff(attempt, retries.base_delay, retries.max_delay)
+        else:
+            delay = min(delay, retries.max_delay)
+        if on_retry is not None:
+            on_retry(attempt, delay, response)
+        time.sleep(delay)
+
+    if error is not None:
+        raise error
+    return response
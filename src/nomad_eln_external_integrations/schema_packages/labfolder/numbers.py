@@ -0,0 +1,42 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+The rule by which the values of Labfolder data elements and tables are read as
+numbers.
+
+The decimal separator is a point. A comma is only read as a thousands separator
+between groups of three digits, so '1,234.5' is 1234.5, while '2,5' and '1,5'
+are not numbers.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+_grouped = re.compile(r'^[+-]?\d{1,3}(?:,\d{3})+(?:\.\d*)?(?:[eE][+-]?\d+)?$')
+
+
+def to_numbers(values: pd.Series) -> pd.Series:
+    """
+    Reads the values as float64 numbers, NaN for values that are not numbers.
+    """
+    strings = values.astype(str).str.strip()
+    grouped = strings.str.match(_grouped)
+    strings = strings.where(~grouped, strings.str.replace(',', '', regex=False))
+    return pd.to_numeric(strings, errors='coerce').astype(np.float64)
@@ -0,0 +1,89 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Sanitisation of the HTML content of Labfolder text elements.
+
+The sanitised HTML is cached by the sha256 digest of the raw content, so that
+text that did not change is not cleaned again on the next resync. The cache is
+kept in memory and per process, every worker process has its own.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from lxml.html.clean import clean_html  # pylint: disable=no-name-in-module
+
+# the default number of sanitised contents that are kept in the cache
+CACHE_SIZE = 4096
+
+_cache: 'OrderedDict[bytes, str]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _key(content: str) -> bytes:
+    return hashlib.sha256(content.encode()).digest()
+
+
+def _cached(key: bytes):
+    with _cache_lock:
+        sanitized = _cache.get(key)
+        if sanitized is not None:
+            _cache.move_to_end(key)
+        return sanitized
+
+
+def _cache_put(key: bytes, sanitized: str, cache_size: int):
+    with _cache_lock:
+        _cache[key] = sanitized
+        _cache.move_to_end(key)
+        while len(_cache) > max(cache_size, 0):
+            _cache.popitem(last=False)
+
+
+def _clean(content: str) -> str:
+    return clean_html(content)
+
+
+def sanitize(content: str, cache_size: int = CACHE_SIZE) -> str:
+    """Returns the sanitised HTML content."""
+    key = _key(content)
+    sanitized = _cached(key)
+    if sanitized is None:
+        sanitized = _clean(content)
+        _cache_put(key, sanitized, cache_size)
+    return sanitized
+
+
+def sanitize_all(contents: list[str], cache_size: int = CACHE_SIZE) -> list[str]:
+    """
+    Returns the sanitised HTML of all contents. The distinct contents that are
+    not cached are cleaned once each and at most `cache_size` contents are kept
+    in the cache.
+    """
+    keys = [_key(content) for content in contents]
+    sanitized = {key: _cached(key) for key in keys}
+    missing = {
+        key: content for key, content in zip(keys, contents) if sanitized[key] is None
+    }
+
+    for key, content in missing.items():
+        sanitized[key] = _clean(content)
+        _cache_put(key, sanitized[key], cache_size)
+
+    return [sanitized[key] for key in keys]
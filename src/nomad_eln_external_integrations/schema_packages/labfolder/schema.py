@@ -17,11 +17,14 @@
 #
 import json
 import re
+from collections.abc import Callable
+from contextlib import closing
+from typing import NamedTuple, Optional
 from urllib.parse import parse_qs, urlparse
 
+import numpy as np
 import requests
 import yaml
-from lxml.html.clean import clean_html  # pylint: disable=no-name-in-module
 from nomad.config import config
 from nomad.datamodel.data import ElnIntegrationCategory, EntryData
 from nomad.metainfo import (
@@ -35,13 +38,88 @@ from nomad.metainfo import (
     SubSection,
 )
 from nomad.metainfo.metainfo import SchemaPackage, SectionProxy
-
-# configuration = config.get_plugin_entry_point(
-#     'nomad_eln_external_integrations.schema_packages.labfolder:schema'
-# )
+from nomad.units import ureg
+
+from .content import ContentIndex
+from .data_grid import numeric_arrays, walk
+from .data_schema import compile_mapping
+from .fetch import (
+    AdaptiveLimit,
+    Chunks,
+    Retries,
+    download,
+    ordered_map,
+    paged,
+    send_with_retries,
+)
+from .sanitize import CACHE_SIZE, sanitize, sanitize_all
+from .table import DATETIME, NUMERIC, STRING, decode_sheets
 
 m_package = SchemaPackage()
 
+_DEFAULT_FETCH_WORKERS = 8
+_DEFAULT_ENTRIES_PAGE_SIZE = 50
+_DEFAULT_ENTRIES_PREFETCH = 1
+_DEFAULT_DOWNLOAD_WORKERS = 4
+_DEFAULT_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+_DEFAULT_DOWNLOAD_RESUMES = 3
+_DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+_DEFAULT_MAX_RETRIES = 5
+_DEFAULT_RETRY_DELAY = 0.5
+_DEFAULT_MAX_RETRY_DELAY = 30.0
+
+
+def _configuration(name: str, default):
+    """
+    Returns a setting of the labfolder entry point, or the default if the
+    plugin configuration is not available.
+    """
+    try:
+        configuration = config.get_plugin_entry_point(
+            'nomad_eln_external_integrations.schema_packages.labfolder:schema'
+        )
+    except Exception:
+        return default
+    return getattr(configuration, name, default)
+
+
+class _FileDownload(NamedTuple):
+    """A file of an element and how it is named and stored."""
+
+    url: str
+    # returns the file name for the response
+    file_name: Callable[[requests.Response], str]
+    # the key of the file version in the content index
+    key: str
+
+
+def _download(
+    labfolder_api_method,
+    archive,
+    file: _FileDownload,
+    content_index: Optional[ContentIndex] = None,
+):
+    """
+    Downloads a file and returns its path. With a content index, the file is
+    only downloaded and stored if the index does not have it yet.
+    """
+
+    def download_to(raw_file):
+        return download(
+            lambda url, **kwargs: labfolder_api_method(requests.get, url, **kwargs),
+            file.url,
+            raw_file,
+            file.file_name,
+            Chunks(
+                _configuration('download_chunk_size', _DEFAULT_DOWNLOAD_CHUNK_SIZE),
+                _configuration('download_resumes', _DEFAULT_DOWNLOAD_RESUMES),
+            ),
+        )
+
+    if content_index is None:
+        return download_to(archive.m_context.raw_file)
+    return content_index.download(file.key, download_to)
+
 
 class LabfolderDataElementDataContent(MSection):
     """The content of a labfolder data grid."""
@@ -65,6 +143,23 @@ class LabfolderDataElementGrid(LabfolderDataElementDataContent):
     children = SubSection(sub_section=LabfolderDataElementDataContent, repeats=True)
 
 
+class LabfolderDataArray(MSection):
+    """The numeric values of the data elements in a grid that share a unit."""
+
+    path = Quantity(type=str, description='the titles of the enclosing groups')
+    unit = Quantity(type=str, description='the unit of the values')
+    titles = Quantity(
+        type=str, shape=['*'], description='the titles of the data elements'
+    )
+    values = Quantity(
+        type=np.float64, shape=['*'], description='the values of the data elements'
+    )
+
+    def quantity(self):
+        """Returns the values as a pint quantity."""
+        return ureg.Quantity(self.values, self.unit)
+
+
 class LabfolderImportError(Exception):
     pass
 
@@ -87,14 +182,16 @@ class LabfolderElement(MSection):
     )
     owner_id = Quantity(type=str, description='the id of the original author')
     element_type = Quantity(
-        type=MEnum('TEXT', 'DATA', 'FILE', 'TABLE', 'WELL_PLATE'),
+        type=MEnum('TEXT', 'DATA', 'FILE', 'IMAGE', 'TABLE', 'WELL_PLATE'),
         description='Denotes that this is a file element. The value is always `FILE`',
     )
 
-    def download_files(self, labfolder_api_method, archive, logger):
+    def download_files(self, labfolder_api_method, archive, logger, content_index=None):
         pass
 
-    def post_process(self, labfolder_api_method, archive, logger, res_data={}):
+    def post_process(
+        self, labfolder_api_method, archive, logger, res_data={}, content_index=None
+    ):
         pass
 
 
@@ -115,10 +212,12 @@ class LabfolderEntry(MSection):
 
     elements = SubSection(sub_section=LabfolderElement, repeats=True)
 
-    def download_files(self, labfolder_api_method, archive, logger):
+    def download_files(self, labfolder_api_method, archive, logger, content_index=None):
         pass
 
-    def post_process(self, labfolder_api_method, archive, logger, res_data={}):
+    def post_process(
+        self, labfolder_api_method, archive, logger, res_data={}, content_index=None
+    ):
         pass
 
 
@@ -131,7 +230,9 @@ class LabfolderTextElement(LabfolderElement):
 
     def post_process(self, *args, **kwargs):
         if self.content:
-            self.content = clean_html(self.content)
+            self.content = sanitize(
+                self.content, _configuration('sanitize_cache_size', CACHE_SIZE)
+            )
 
 
 class LabfolderFileElement(LabfolderElement):
@@ -144,13 +245,21 @@ class LabfolderFileElement(LabfolderElement):
 
     file = Quantity(type=str, a_browser=dict(adaptor='RawFileAdaptor'))
 
-    def download_files(self, labfolder_api_method, archive, logger):
-        response = labfolder_api_method(
-            requests.get, f'/elements/file/{self.id}/download'
-        )
+    def download_files(self, labfolder_api_method, archive, logger, content_index=None):
+        file_path = self.file_name
         try:
-            with archive.m_context.raw_file(self.file_name, 'wb') as f:
-                f.write(response.content)
+            file_path = _download(
+                labfolder_api_method,
+                archive,
+                _FileDownload(
+                    f'/elements/file/{self.id}/download',
+                    lambda response: self.file_name,
+                    f'{self.id}/{self.version_id}/download',
+                ),
+                content_index,
+            )
+        except LabfolderImportError:
+            raise
         except Exception as e:
             logger.error(
                 'could not download file',
@@ -158,10 +267,12 @@ class LabfolderFileElement(LabfolderElement):
                 data=dict(file_name=self.file_name),
             )
 
-        self.file = self.file_name
+        self.file = file_path
 
-    def post_process(self, labfolder_api_method, archive, logger, res_data={}):
-        self.download_files(labfolder_api_method, archive, logger)
+    def post_process(
+        self, labfolder_api_method, archive, logger, res_data={}, content_index=None
+    ):
+        self.download_files(labfolder_api_method, archive, logger, content_index)
 
 
 class LabfolderImageElement(LabfolderElement):
@@ -187,38 +298,99 @@ class LabfolderImageElement(LabfolderElement):
     original_image_file = Quantity(type=str, a_browser=dict(adaptor='RawFileAdaptor'))
     preview_image_file = Quantity(type=str, a_browser=dict(adaptor='RawFileAdaptor'))
 
-    def download_files(self, labfolder_api_method, archive, logger):
-        def download(path, file_quantity):
-            response = labfolder_api_method(
-                requests.get, f'/elements/image/{self.id}/{path}'
-            )
-
+    def download_files(self, labfolder_api_method, archive, logger, content_index=None):
+        def image_file_name(response):
             content_disposition = response.headers.get('Content-Disposition', '')
             match = re.match(r'^attachment; filename="(.+)"$', content_disposition)
             if match:
-                file_name = match.group(1)
-            else:
-                file_name = self.id
-                logger.warn(
-                    'there is no filename for an image', data=dict(element_id=self.id)
-                )
+                return match.group(1)
+
+            logger.warn(
+                'there is no filename for an image', data=dict(element_id=self.id)
+            )
+            return self.id
+
+        def download(path, file_quantity):
             try:
-                with archive.m_context.raw_file(file_name, 'wb') as f:
-                    f.write(response.content)
+                file_name = _download(
+                    labfolder_api_method,
+                    archive,
+                    _FileDownload(
+                        f'/elements/image/{self.id}/{path}',
+                        image_file_name,
+                        f'{self.id}/{self.version_id}/{path}',
+                    ),
+                    content_index,
+                )
+            except LabfolderImportError:
+                raise
             except Exception as e:
                 logger.error(
                     'could not download file',
                     exc_info=e,
-                    data=dict(file_name=self.file_name),
+                    data=dict(element_id=self.id, path=path),
                 )
+                return
 
             self.m_set(file_quantity, file_name)
 
         download('original-data', LabfolderImageElement.original_image_file)
         download('preview-data', LabfolderImageElement.preview_image_file)
 
-    def post_process(self, labfolder_api_method, archive, logger, res_data={}):
-        self.download_files(labfolder_api_method, archive, logger)
+    def post_process(
+        self, labfolder_api_method, archive, logger, res_data={}, content_index=None
+    ):
+        self.download_files(labfolder_api_method, archive, logger, content_index)
+
+
+class LabfolderTableColumn(MSection):
+    """The values of a column in the used range of a table sheet."""
+
+    index = Quantity(type=int, description='the index of the column in the sheet')
+    name = Quantity(type=str, description='the value in the header row')
+    value_type = Quantity(
+        type=MEnum(NUMERIC, DATETIME, STRING),
+        description='the type of all values in the column',
+    )
+    numeric_values = Quantity(
+        type=np.float64,
+        shape=['*'],
+        description='the values of a numeric column, NaN for empty cells',
+    )
+    datetime_values = Quantity(
+        type=np.float64,
+        shape=['*'],
+        unit='s',
+        description='the values of a datetime column in seconds since the Unix '
+        'epoch, NaN for empty cells',
+    )
+    string_values = Quantity(
+        type=str, shape=['*'], description='the values of a string column'
+    )
+
+    def values(self):
+        """Returns the values of the column, whatever their type."""
+        if self.value_type == NUMERIC:
+            return self.numeric_values
+        if self.value_type == DATETIME:
+            return self.datetime_values
+        return self.string_values
+
+
+class LabfolderTableSheet(MSection):
+    """The used range of a table sheet, decoded column by column."""
+
+    m_def = Section(label_quantity='name')
+
+    name = Quantity(type=str, description='the name of the sheet')
+    first_row = Quantity(type=int, description='the first row of the used range')
+    first_column = Quantity(type=int, description='the first column of the used range')
+    row_count = Quantity(type=int, description='the number of rows in the range')
+    column_count = Quantity(type=int, description='the number of columns in the range')
+    header = Quantity(
+        type=bool, description='whether the first row holds the column names'
+    )
+    columns = SubSection(sub_section=LabfolderTableColumn, repeats=True)
 
 
 class LabfolderTableElement(LabfolderElement):
@@ -228,6 +400,56 @@ class LabfolderTableElement(LabfolderElement):
         description='The JSON content of the table element',
         a_browser=dict(value_component='JsonValue'),
     )
+    content_file = Quantity(
+        type=str,
+        description='The raw file with the JSON content of the table element',
+    )
+    sheets = SubSection(sub_section=LabfolderTableSheet, repeats=True)
+
+    def raw_content(self):
+        """
+        Returns the JSON content of the table. If it is stored in a raw file,
+        it is only read on the first call.
+        """
+        if self.content is None and self.content_file:
+            with self.m_root().m_context.raw_file(self.content_file, 'r') as f:
+                self.content = json.load(f)
+        return self.content
+
+    def post_process(
+        self, labfolder_api_method, archive, logger, res_data={}, content_index=None
+    ):
+        self.sheets = []
+        for sheet in decode_sheets(self.content):
+            columns = sheet.pop('columns')
+            nomad_sheet = LabfolderTableSheet(**sheet)
+            for column in columns:
+                values = column.pop('values')
+                nomad_column = LabfolderTableColumn(**column)
+                nomad_column.m_set(
+                    LabfolderTableColumn.m_def.all_quantities[
+                        f'{column["value_type"].lower()}_values'
+                    ],
+                    values,
+                )
+                nomad_sheet.columns.append(nomad_column)
+            self.sheets.append(nomad_sheet)
+
+        # the decoded sheets replace the content in the archive, the content
+        # itself is kept in a raw file of the upload
+        if content_index is None or self.content is None:
+            return
+
+        def store(raw_file):
+            file_name = f'labfolder-table-{self.id}.json'
+            with raw_file(file_name, 'w') as f:
+                json.dump(self.content, f)
+            return file_name
+
+        self.content_file = content_index.download(
+            f'{self.id}/{self.version_id}/content', store
+        )
+        self.content = None
 
 
 class LabfolderDataElement(LabfolderElement):
@@ -244,25 +466,57 @@ class LabfolderDataElement(LabfolderElement):
         type=Reference(Section), a_eln=dict(component='ReferenceEditQuantity')
     )
 
-    def parse_data(self, data_from_response, data_converted):
-        for item in data_from_response:
-            children = item.get('children', None)
-            if children is not None:
-                item_dict_name = item.get('title', None)
-                data_converted[item_dict_name] = {}
-                self.parse_data(children, data_converted[item_dict_name])
+    numeric_data = SubSection(sub_section=LabfolderDataArray, repeats=True)
+
+    def m_update_from_dict(self, data: dict, **kwargs) -> None:
+        data = dict(data)
+        data_elements = data.pop('data_elements', None)
+        super().m_update_from_dict(data, **kwargs)
+        if data_elements is not None:
+            self.add_data_elements(data_elements)
+
+    def add_data_elements(self, data_elements: list[dict]):
+        """
+        Fills `data_elements` and `numeric_data` from the data elements of the
+        API without recursing into the nested groups.
+        """
+        sections = {}
+        for _, item, parent in walk(data_elements):
+            if parent is None:
+                section = LabfolderDataElementGrid()
+                self.data_elements.append(section)
             else:
-                child_dict = {}
-                child_dict_name = item.get('title', None)
-                child_dict[child_dict_name] = {}
-                child_dict[child_dict_name].update({'value': item.get('value', None)})
-                child_dict[child_dict_name].update({'unit': item.get('unit', None)})
-                child_dict[child_dict_name].update(
-                    {'description': item.get('description', None)}
-                )
-                data_converted.update(child_dict)
+                parent_section = sections[id(parent)]
+                children = parent_section.m_def.all_sub_sections['children']
+                section = children.sub_section.section_cls()
+                parent_section.m_add_sub_section(children, section)
+            section.m_update_from_dict(
+                {key: value for key, value in item.items() if key != 'children'}
+            )
+            if item.get('children'):
+                sections[id(item)] = section
 
-    def post_process(self, labfolder_api_method, archive, logger, res_data={}):
+        self.numeric_data = [
+            LabfolderDataArray(**array) for array in numeric_arrays(data_elements)
+        ]
+
+    def parse_data(self, data_from_response, data_converted):
+        groups = {None: data_converted}
+        for _, item, parent in walk(data_from_response):
+            group = groups[None if parent is None else id(parent)]
+            title = item.get('title', None)
+            if item.get('children', None) is not None:
+                group[title] = groups[id(item)] = {}
+            else:
+                group[title] = {
+                    'value': item.get('value', None),
+                    'unit': item.get('unit', None),
+                    'description': item.get('description', None),
+                }
+
+    def post_process(
+        self, labfolder_api_method, archive, logger, res_data={}, content_index=None
+    ):
         data_from_response = res_data.get('data_elements', None)
         if data_from_response is not None:
             data_converted = {}
@@ -305,6 +559,86 @@ _element_type_section_mapping = {
 }
 
 
+def _apply_data_schemas(elements: list[LabfolderElement], logger):
+    """
+    Fills the `nomad_data` of all data elements with a `nomad_data_schema`. The
+    elements are grouped by their schema and the mapping of each schema is
+    only compiled once.
+    """
+    batches: dict[int, list[LabfolderDataElement]] = {}
+    schemas: dict[int, Section] = {}
+    for element in elements:
+        if (
+            isinstance(element, LabfolderDataElement)
+            and element.labfolder_data
+            and element.nomad_data_schema
+        ):
+            schema = element.nomad_data_schema
+            batches.setdefault(id(schema), []).append(element)
+            schemas[id(schema)] = schema
+
+    for schema_id, batch in batches.items():
+        schema = schemas[schema_id]
+        unmapped: set[str] = set()
+        invalid: set[str] = set()
+        failed: list[tuple[str, Exception]] = []
+        try:
+            mapping = compile_mapping(schema)
+        except Exception as e:
+            logger.error(
+                'could not apply schema to labfolder data element',
+                exc_info=e,
+                data=dict(schema=schema.name, elements=len(batch)),
+            )
+            continue
+
+        for element in batch:
+            try:
+                section, element_unmapped, element_invalid = mapping.apply(
+                    element.labfolder_data
+                )
+            except Exception as e:
+                failed.append((element.id, e))
+                continue
+            element.nomad_data = section
+            unmapped.update(element_unmapped)
+            invalid.update(element_invalid)
+
+        if unmapped:
+            logger.warning(
+                'labfolder data could not be mapped onto the schema',
+                data=dict(schema=schema.name, paths=sorted(unmapped)),
+            )
+        if invalid:
+            logger.warning(
+                'labfolder data values could not be converted to their quantities',
+                data=dict(schema=schema.name, paths=sorted(invalid)),
+            )
+        if failed:
+            logger.error(
+                'could not apply schema to labfolder data element',
+                exc_info=failed[0][1],
+                data=dict(
+                    schema=schema.name,
+                    elements=[element_id for element_id, _ in failed],
+                ),
+            )
+
+
+class LabfolderEntryArchive(EntryData):
+    """A labfolder entry that is stored in its own NOMAD entry."""
+
+    m_def = Section(label='Labfolder Entry')
+
+    project_url = Quantity(type=str, description='The url of the labfolder project')
+    entry = SubSection(sub_section=LabfolderEntry)
+
+    def normalize(self, archive, logger):
+        super().normalize(archive, logger)
+        if self.entry is not None:
+            _apply_data_schemas(self.entry.elements, logger)
+
+
 class LabfolderProject(EntryData):
     m_def = Section(
         label='Labfolder Project Import', categories=[ElnIntegrationCategory]
@@ -314,6 +648,7 @@ class LabfolderProject(EntryData):
         super().__init__(*args, **kwargs)
 
         self.__headers = None
+        self.__limit = None
         self.logger = None
 
     project_url = Quantity(type=str, a_eln=dict(component='StringEditQuantity'))
@@ -325,24 +660,80 @@ class LabfolderProject(EntryData):
     resync_labfolder_repository = Quantity(
         type=bool, a_eln=dict(component='BoolEditQuantity')
     )
+    incremental_resync = Quantity(
+        type=bool,
+        default=False,
+        description='Only fetch the elements that are new or have a new version '
+        'and keep all other elements as they are.',
+        a_eln=dict(component='BoolEditQuantity'),
+    )
+
+    split_entries = Quantity(
+        type=bool,
+        default=False,
+        description='Store every labfolder entry in its own NOMAD entry, which '
+        'is referenced from the project, instead of in the project.',
+        a_eln=dict(component='BoolEditQuantity'),
+    )
 
     entries = SubSection(sub_section=LabfolderEntry, repeats=True)
+    entry_archives = Quantity(
+        type=Reference(LabfolderEntryArchive.m_def),
+        shape=['*'],
+        description='The NOMAD entries of the labfolder entries, if they are split.',
+    )
+
+    def _send(self, method, url, **kwargs) -> requests.Response:
+        """Sends a request to the labfolder api within the limit, with retries."""
+
+        def on_retry(attempt, delay, response):
+            self.logger.warning(
+                'retrying labfolder api request',
+                data=dict(
+                    url=url,
+                    attempt=attempt + 1,
+                    delay=delay,
+                    status_code=getattr(response, 'status_code', None),
+                ),
+            )
+
+        return send_with_retries(
+            lambda: method(f'{self._api_base_url}{url}', timeout=10, **kwargs),
+            self._limit,
+            Retries(
+                _configuration('max_retries', _DEFAULT_MAX_RETRIES),
+                _configuration('retry_delay', _DEFAULT_RETRY_DELAY),
+                _configuration('max_retry_delay', _DEFAULT_MAX_RETRY_DELAY),
+            ),
+            on_retry,
+            stream=kwargs.get('stream', False),
+        )
 
     def _labfolder_api_method(
         self, method, url, msg='cannot do labfolder api request', **kwargs
     ):
-        response = method(
-            f'{self._api_base_url}{url}', headers=self._headers, timeout=10, **kwargs
-        )
+        headers = {**self._headers, **kwargs.pop('headers', {})}
+        response = self._send(method, url, headers=headers, **kwargs)
 
         if response.status_code >= 400:
             self.logger.error(
                 msg, data=dict(status_code=response.status_code, text=response.text)
             )
+            response.close()
             raise LabfolderImportError()
 
         return {} if url.endswith('/logout') else response
 
+    @property
+    def _limit(self) -> AdaptiveLimit:
+        if self.__limit is None:
+            self.__limit = AdaptiveLimit(
+                _configuration(
+                    'max_concurrent_requests', _DEFAULT_MAX_CONCURRENT_REQUESTS
+                )
+            )
+        return self.__limit
+
     @property
     def _api_base_url(self):
         match = re.match(r'^(.+)/eln/notebook.*$', self.project_url)
@@ -355,11 +746,181 @@ class LabfolderProject(EntryData):
 
         return f'{match.group(1)}/api/v2'
 
+    @staticmethod
+    def _known_elements(elements: list[dict], logger) -> list[dict]:
+        known_elements = []
+        for element in elements:
+            if element['type'] not in _element_type_path_mapping:
+                logger.warn(
+                    'unknown element type', data=dict(element_type=element['type'])
+                )
+                continue
+            known_elements.append(element)
+        return known_elements
+
+    def _fetch_element(self, element: dict) -> dict:
+        return self._labfolder_api_method(
+            requests.get,
+            f'/elements/{_element_type_path_mapping[element["type"]]}/{element["id"]}/version/{element["version_id"]}',
+        ).json()
+
+    def _add_entries(
+        self,
+        entries: list[dict],
+        archive,
+        logger,
+        current_elements: dict[str, LabfolderElement],
+        content_index: Optional[ContentIndex],
+    ) -> int:
+        """
+        Adds the listed entries with their elements. Elements that are in
+        `current_elements` with the listed version are kept instead of fetched,
+        all listed elements are removed from `current_elements`. Returns the
+        number of kept elements.
+        """
+
+        def is_current(element):
+            current_element = current_elements.get(element['id'])
+            return current_element is not None and current_element.version_id == str(
+                element['version_id']
+            )
+
+        for entry in entries:
+            entry['elements'] = self._known_elements(entry['elements'], logger)
+
+        n_kept = 0
+        new_elements = []
+        # the element versions are fetched concurrently, but the sections
+        # are created one after another in the order of the entries
+        with closing(
+            ordered_map(
+                self._fetch_element,
+                [
+                    element
+                    for entry in entries
+                    for element in entry['elements']
+                    if not is_current(element)
+                ],
+                _configuration('fetch_workers', _DEFAULT_FETCH_WORKERS),
+            )
+        ) as element_data:
+            for entry in entries:
+                elements = entry.pop('elements')
+
+                nomad_entry = LabfolderEntry()
+                try:
+                    nomad_entry.m_update_from_dict(entry)
+                except Exception as e:
+                    logger.error(
+                        'cannot update archive with labfolder data', exc_info=e
+                    )
+                    raise LabfolderImportError()
+
+                for element in elements:
+                    if is_current(element):
+                        nomad_entry.elements.append(current_elements[element['id']])
+                        n_kept += 1
+                        continue
+
+                    data = next(element_data)
+                    nomad_element = _element_type_section_mapping[element['type']]()
+
+                    nomad_element.m_update_from_dict(data)
+                    nomad_entry.elements.append(nomad_element)
+                    new_elements.append((nomad_element, data))
+                self.entries.append(nomad_entry)
+
+                for element in elements:
+                    current_elements.pop(element['id'], None)
+
+        # the html of the text elements of a page is sanitized in one batch
+        text_elements = [
+            nomad_element
+            for nomad_element, _ in new_elements
+            if isinstance(nomad_element, LabfolderTextElement) and nomad_element.content
+        ]
+        sanitized = sanitize_all(
+            [text_element.content for text_element in text_elements],
+            _configuration('sanitize_cache_size', CACHE_SIZE),
+        )
+        for text_element, content in zip(text_elements, sanitized):
+            text_element.content = content
+        new_elements = [
+            new_element
+            for new_element in new_elements
+            if not isinstance(new_element[0], LabfolderTextElement)
+        ]
+
+        # post-processing downloads the files of file and image elements, only a
+        # limited number of elements is post-processed at the same time
+        def post_process(new_element):
+            nomad_element, data = new_element
+            nomad_element.post_process(
+                self._labfolder_api_method,
+                archive,
+                logger,
+                res_data=data,
+                content_index=content_index,
+            )
+
+        with closing(
+            ordered_map(
+                post_process,
+                new_elements,
+                _configuration('download_workers', _DEFAULT_DOWNLOAD_WORKERS),
+            )
+        ) as post_processed:
+            for _ in post_processed:
+                pass
+
+        return n_kept
+
+    @staticmethod
+    def _entry_archive_path(archive, entry_id: str) -> str:
+        project = re.sub(r'\.archive\.(json|yaml|yml)$', '', archive.metadata.mainfile)
+        return f'{project}.entry-{entry_id}.archive.json'
+
+    def _entry_archive_elements(
+        self, archive, entries: list[dict]
+    ) -> dict[str, LabfolderElement]:
+        """The elements of the listed entries from their current entry archives."""
+        elements = {}
+        for entry in entries:
+            path = self._entry_archive_path(archive, entry['id'])
+            if not archive.m_context.raw_path_exists(path):
+                continue
+            with archive.m_context.raw_file(path, 'r') as f:
+                data = json.load(f)['data']
+            data.pop('m_def', None)
+            entry_archive = LabfolderEntryArchive.m_from_dict(data)
+            if entry_archive.entry is not None:
+                elements.update(
+                    (element.id, element) for element in entry_archive.entry.elements
+                )
+        return elements
+
+    def _write_entry_archives(self, archive):
+        """Moves the entries into their own entry archives."""
+        entry_archives = list(self.entry_archives or [])
+        for entry in list(self.entries):
+            path = self._entry_archive_path(archive, entry.id)
+            entry_archive = LabfolderEntryArchive(
+                project_url=self.project_url, entry=entry
+            )
+            with archive.m_context.raw_file(path, 'w') as f:
+                json.dump(dict(data=entry_archive.m_to_dict(with_root_def=True)), f)
+            archive.m_context.process_updated_raw_file(path, allow_modify=True)
+            entry_archives.append(f'../upload/archive/mainfile/{path}#/data')
+
+        self.entries.clear()
+        self.entry_archives = entry_archives
+
     @property
     def _headers(self):
         if not self.__headers:
-            response = requests.post(
-                f'{self._api_base_url}/auth/login',
+            response = self._send(
+                requests.post,
+                '/auth/login',
                 json=dict(user=self.labfolder_email, password=self.password),
             )
 
@@ -387,6 +948,84 @@ class LabfolderProject(EntryData):
                 else:
                     yaml.dump(dict(data=archive.data.m_to_dict()), f)
 
+    def _project_ids(self, archive, logger) -> list[str]:
+        """Returns the ids of the projects to import from the project url."""
+        if not self.project_url or not self.labfolder_email or not self.password:
+            logger.error('missing information, cannot import project')
+            raise LabfolderImportError()
+
+        try:
+            project_ids = parse_qs(urlparse(self.project_url).fragment[1:])[
+                'projectIds'
+            ]
+        except KeyError as e:
+            logger.error('cannot parse project ids from url', exc_info=e)
+            raise LabfolderImportError()
+
+        if self.split_entries and archive.m_context is None:
+            logger.error('cannot split labfolder entries without an upload')
+            raise LabfolderImportError()
+
+        return project_ids
+
+    def _entry_archive_ids(self) -> set[str]:
+        return {
+            getattr(reference, 'm_proxy_value', reference)
+            for reference in self.entry_archives or []
+        }
+
+    def _sync_entries(
+        self,
+        archive,
+        logger,
+        project_ids: list[str],
+        current_elements: dict[str, LabfolderElement],
+    ) -> tuple[int, int]:
+        """
+        Adds the entries of the projects page by page. With split entries the
+        elements of the entry archives of a page are added to
+        `current_elements` before the page is added. Returns the number of
+        elements loaded from entry archives and the number of kept elements.
+        """
+        n_loaded, n_kept = 0, 0
+        load_entry_archives = self.split_entries and self.incremental_resync
+
+        # the files that are already downloaded into the upload
+        content_index = None
+        if archive.m_context is not None:
+            content_index = ContentIndex(archive.m_context)
+
+        def fetch_entries(offset, limit):
+            return self._labfolder_api_method(
+                requests.get,
+                f'/entries?project_ids={",".join(project_ids)}'
+                f'&limit={limit}&offset={offset}',
+            ).json()
+
+        with closing(
+            paged(
+                fetch_entries,
+                _configuration('entries_page_size', _DEFAULT_ENTRIES_PAGE_SIZE),
+                _configuration('entries_prefetch', _DEFAULT_ENTRIES_PREFETCH),
+            )
+        ) as pages:
+            for entries in pages:
+                if load_entry_archives:
+                    entry_archive_elements = self._entry_archive_elements(
+                        archive, entries
+                    )
+                    n_loaded += len(entry_archive_elements)
+                    current_elements.update(entry_archive_elements)
+                n_kept += self._add_entries(
+                    entries, archive, logger, current_elements, content_index
+                )
+                if self.split_entries:
+                    self._write_entry_archives(archive)
+        if content_index is not None:
+            content_index.save()
+
+        return n_loaded, n_kept
+
     def normalize(self, archive, logger):
         super().normalize(archive, logger)
         self.logger = logger
@@ -394,59 +1033,46 @@ class LabfolderProject(EntryData):
             self.resync_labfolder_repository = True
 
         if self.resync_labfolder_repository:
-            if not self.project_url or not self.labfolder_email or not self.password:
-                logger.error('missing information, cannot import project')
-                raise LabfolderImportError()
-
-            try:
-                project_ids = parse_qs(urlparse(self.project_url).fragment[1:])[
-                    'projectIds'
-                ]
-            except KeyError as e:
-                logger.error('cannot parse project ids from url', exc_info=e)
-                raise LabfolderImportError()
-
-            entries = self._labfolder_api_method(
-                requests.get, f'/entries?project_ids={",".join(project_ids)}'
-            ).json()
+            project_ids = self._project_ids(archive, logger)
+
+            # keep the current elements to compare their versions with the listed,
+            # the elements of split entries are loaded page by page
+            current_elements = {}
+            if self.incremental_resync:
+                current_elements = {
+                    element.id: element
+                    for entry in self.entries
+                    for element in entry.elements
+                }
+            n_current = len(current_elements)
 
             # remove potential old content
+            previous_entry_archives = self._entry_archive_ids()
             self.entries.clear()
+            self.entry_archives = []
 
-            for entry in entries:
-                elements = entry['elements']
-                del entry['elements']
-
-                nomad_entry = LabfolderEntry()
-                try:
-                    nomad_entry.m_update_from_dict(entry)
-                except Exception as e:
-                    logger.error(
-                        'cannot update archive with labfolder data', exc_info=e
-                    )
-                    raise LabfolderImportError()
-
-                for element in elements:
-                    element_type = element['type']
-
-                    if element_type not in _element_type_path_mapping:
-                        logger.warn(
-                            'unknown element type', data=dict(element_type=element_type)
-                        )
-                        continue
-
-                    data = self._labfolder_api_method(
-                        requests.get,
-                        f'/elements/{_element_type_path_mapping[element_type]}/{element["id"]}/version/{element["version_id"]}',
-                    ).json()
-                    nomad_element = _element_type_section_mapping[element_type]()
+            n_loaded, n_kept = self._sync_entries(
+                archive, logger, project_ids, current_elements
+            )
+            n_current += n_loaded
+
+            removed_entry_archives = previous_entry_archives - self._entry_archive_ids()
+            if removed_entry_archives:
+                logger.warning(
+                    'the entry archives of removed labfolder entries remain in '
+                    'the upload',
+                    data=dict(entry_archives=sorted(removed_entry_archives)),
+                )
 
-                    nomad_element.m_update_from_dict(data)
-                    nomad_element.post_process(
-                        self._labfolder_api_method, archive, logger, res_data=data
-                    )
-                    nomad_entry.elements.append(nomad_element)
-                self.entries.append(nomad_entry)
+            if self.incremental_resync:
+                logger.info(
+                    'incremental labfolder resync',
+                    data=dict(
+                        kept_elements=n_kept,
+                        updated_elements=n_current - n_kept - len(current_elements),
+                        removed_elements=len(current_elements),
+                    ),
+                )
 
             # Resetting Token and Logging out: Invalidating all access tokens
             self.resync_labfolder_repository = False
@@ -454,22 +1080,11 @@ class LabfolderProject(EntryData):
             self._labfolder_api_method(requests.post, '/auth/logout')
             logger.info('reached the end')
 
-        elif not self.resync_labfolder_repository and len(self.elements) > 0:
-            for element in self.elements:
-                if (
-                    isinstance(element, LabfolderDataElement)
-                    and element.labfolder_data
-                    and element.nomad_data_schema
-                ):
-                    try:
-                        element.nomad_data = element.nomad_data_schema.m_from_dict(
-                            element.labfolder_data
-                        )
-                    except Exception as e:
-                        logger.error(
-                            'could not apply schema to labfolder data element',
-                            exc_info=e,
-                        )
+        elif not self.resync_labfolder_repository:
+            _apply_data_schemas(
+                [element for entry in self.entries for element in entry.elements],
+                logger,
+            )
 
 
 m_package.init_metainfo()
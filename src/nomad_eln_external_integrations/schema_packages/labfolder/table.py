@@ -0,0 +1,163 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Column-wise decoding of the spreadsheet content of Labfolder table elements.
+
+The content is a spreadsheet in the JSON format of SpreadJS: every sheet has a
+`dataTable` that maps row indices to column indices to cells. The used range
+of every sheet is decoded into one typed array per column. A column is numeric
+if all its values are numbers, by the rule in `numbers`, a datetime column if
+all its values are dates, and a string column otherwise. A first row of text
+above typed columns is read as the column names.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from .numbers import to_numbers
+
+NUMERIC = 'NUMERIC'
+DATETIME = 'DATETIME'
+STRING = 'STRING'
+
+# SpreadJS stores dates as OLE automation dates, days since 1899-12-30
+_oa_date = re.compile(r'^/OADate\((-?\d+(?:\.\d+)?)\)/$')
+_OA_EPOCH_SECONDS = -2209161600.0
+
+
+def _cell_value(cell):
+    if isinstance(cell, dict):
+        return cell.get('value')
+    return None
+
+
+def _numeric(values: pd.Series):
+    if not all(
+        isinstance(value, (int, float, str)) and not isinstance(value, bool)
+        for value in values
+    ):
+        return None
+    numbers = to_numbers(values)
+    if numbers.isna().any():
+        return None
+    return numbers
+
+
+def _epoch_seconds(values: pd.Series):
+    if not all(isinstance(value, str) for value in values):
+        return None
+    oa_dates = values.str.extract(_oa_date, expand=False)
+    if oa_dates.notna().all():
+        return oa_dates.astype(np.float64) * 86400.0 + _OA_EPOCH_SECONDS
+    timestamps = pd.to_datetime(values, utc=True, errors='coerce', format='ISO8601')
+    if timestamps.isna().any():
+        return None
+    return (timestamps - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+
+
+def decode_column(values: list) -> tuple[str, np.ndarray]:
+    """
+    Decodes the values of a column, with None for empty cells. Returns the
+    column type and the array; empty numeric and datetime cells become NaN,
+    empty string cells an empty string.
+    """
+    series = pd.Series(values, dtype=object)
+    present = series.notna() & (series != '')
+    if present.any():
+        for value_type, decode in ((NUMERIC, _numeric), (DATETIME, _epoch_seconds)):
+            decoded = decode(series[present])
+            if decoded is not None:
+                array = np.full(len(series), np.nan, dtype=np.float64)
+                array[present.to_numpy()] = decoded.to_numpy(np.float64)
+                return value_type, array
+
+    strings = series.where(present, '').astype(str)
+    return STRING, strings.to_numpy(dtype=object)
+
+
+def _is_name(value) -> bool:
+    return isinstance(value, str) and to_numbers(pd.Series([value])).isna().all()
+
+
+def _decode_rows(cells: dict, columns: list[int], first_row: int, last_row: int):
+    return [
+        decode_column(
+            [cells.get((row, column)) for row in range(first_row, last_row + 1)]
+        )
+        for column in columns
+    ]
+
+
+def decode_sheets(content) -> list[dict]:
+    """
+    Returns the sheets of the spreadsheet content as dicts with the name, the
+    first row and column and the size of the used range, whether its first row
+    holds the column names, and the columns, each with its index, name, type
+    and values.
+    """
+    sheets = content.get('sheets') if isinstance(content, dict) else None
+    if not isinstance(sheets, dict):
+        return []
+
+    decoded = []
+    for key, sheet in sheets.items():
+        data_table = (sheet.get('data') or {}).get('dataTable') or {}
+        cells = {
+            (int(row), int(column)): _cell_value(cell)
+            for row, columns in data_table.items()
+            for column, cell in (columns or {}).items()
+        }
+        cells = {index: value for index, value in cells.items() if value is not None}
+        sheet_data = dict(name=sheet.get('name', key), columns=[])
+        decoded.append(sheet_data)
+        if not cells:
+            sheet_data.update(
+                first_row=0, first_column=0, row_count=0, column_count=0, header=False
+            )
+            continue
+
+        rows = [row for row, _ in cells]
+        columns = sorted({column for _, column in cells})
+        first_row, last_row = min(rows), max(rows)
+        sheet_data.update(
+            first_row=first_row,
+            first_column=columns[0],
+            row_count=last_row - first_row + 1,
+            column_count=columns[-1] - columns[0] + 1,
+        )
+
+        # the first row holds the column names, if it only has text and the
+        # columns below are not all text
+        names = [cells.get((first_row, column)) for column in columns]
+        body = _decode_rows(cells, columns, first_row + 1, last_row)
+        header = (
+            any(isinstance(name, str) for name in names)
+            and all(name is None or _is_name(name) for name in names)
+            and any(value_type != STRING for value_type, _ in body)
+        )
+        if not header:
+            names = [None] * len(columns)
+            body = _decode_rows(cells, columns, first_row, last_row)
+        sheet_data['header'] = header
+        for column, name, (value_type, values) in zip(columns, names, body):
+            sheet_data['columns'].append(
+                dict(index=column, name=name, value_type=value_type, values=values)
+            )
+    return decoded
@@ -0,0 +1,208 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Scaling benchmark for the Chemotion parser on synthetic exports.
+
+    python -m tests.parsers.chemotion.benchmark \\
+        --schema tests/data/parsers/chemotion/test/schema.json \\
+        --sizes 1000 10000 --mixes samples reactions analyses
+
+For every table mix and size, an export is generated into a temporary directory
+and parsed once to measure the wall time. With ``--memory``, the parse runs under
+tracemalloc to measure the peak memory instead, which also slows it down. The
+archive size is the size of the serialized child archive. ``measure_reparse``
+compares a full parse with an incremental parse of an unchanged export.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from nomad.archive import read_archive, write_archive
+from nomad.datamodel import ClientContext, EntryArchive, EntryMetadata
+
+from src.nomad_eln_external_integrations.parsers.chemotion.parser import (
+    ChemotionOptions,
+    ChemotionParser,
+)
+
+from .synthetic import TABLE_MIXES, table_mix, write_export
+
+
+class _QuietLogger:
+    """Swallows the parser logs, so that they do not distort the timings."""
+
+    def _log(self, *args, **kwargs):
+        pass
+
+    debug = info = warning = warn = error = _log
+
+
+def _parse(parser: ChemotionParser, mainfile: str) -> EntryArchive:
+    child_archives = {'0': EntryArchive(metadata=EntryMetadata())}
+    parser.parse(mainfile, EntryArchive(), _QuietLogger(), child_archives)
+    return child_archives['0']
+
+
+def measure_parse(mainfile: str, memory: bool = False, **parser_options) -> dict:
+    """
+    Parses the export once and returns the wall time in seconds, the peak memory
+    in bytes if `memory` is set, the archive size in bytes and the number of rows
+    of every table.
+    """
+    parser = ChemotionParser(options=ChemotionOptions(**parser_options))
+
+    peak_memory = None
+    if memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        child_archive = _parse(parser, mainfile)
+        seconds = time.perf_counter() - start
+        if memory:
+            _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        if memory:
+            tracemalloc.stop()
+
+    chemotion = child_archive.data
+    rows = {
+        name: len(chemotion.m_get_sub_sections(sub_section))
+        for name, sub_section in chemotion.m_def.all_sub_sections.items()
+        if sub_section.repeats
+    }
+    archive_size = len(json.dumps(child_archive.m_to_dict()).encode('utf-8'))
+    return dict(
+        seconds=seconds,
+        peak_memory=peak_memory,
+        archive_size=archive_size,
+        rows=rows,
+    )
+
+
+class ArchiveFiles:
+    """Writes archives into a directory and reads them, like the upload files."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def write_archive(self, entry_id: str, archive: EntryArchive):
+        write_archive(
+            os.path.join(self.directory, f'{entry_id}.msg'),
+            1,
+            [(entry_id, archive.m_to_dict())],
+            entry_toc_depth=3,
+        )
+
+    def read_archive(self, entry_id: str):
+        return read_archive(os.path.join(self.directory, f'{entry_id}.msg'))
+
+    def child_archives(self, entry_id: str) -> dict[str, EntryArchive]:
+        context = ClientContext(local_dir=self.directory)
+        context.upload_files = self
+        return {
+            '0': EntryArchive(
+                m_context=context, metadata=EntryMetadata(entry_id=entry_id)
+            )
+        }
+
+
+def measure_reparse(
+    mainfile: str, directory: str, repeats: int = 3, **parser_options
+) -> dict:
+    """
+    Parses the export once incrementally and then measures, in turns, the wall
+    time of a full parse and of an incremental parse of the unchanged export.
+    Returns the shortest time of each in seconds.
+    """
+    archive_files = ArchiveFiles(directory)
+    full = ChemotionParser(options=ChemotionOptions(**parser_options))
+    incremental = ChemotionParser(
+        options=ChemotionOptions(incremental=True, **parser_options)
+    )
+    child_archives = archive_files.child_archives('entry')
+    incremental.parse(mainfile, EntryArchive(), _QuietLogger(), child_archives)
+    archive_files.write_archive('entry', child_archives['0'])
+
+    seconds = dict(full=[], unchanged=[])
+    for _ in range(repeats):
+        for name, parser in (('full', full), ('unchanged', incremental)):
+            child_archives = archive_files.child_archives('entry')
+            start = time.perf_counter()
+            parser.parse(mainfile, EntryArchive(), _QuietLogger(), child_archives)
+            seconds[name].append(time.perf_counter() - start)
+    return {name: min(values) for name, values in seconds.items()}
+
+
+def run_benchmark(
+    schema_path: str, sizes: list[int], mixes: list[str], **options
+) -> list[dict]:
+    """Runs the benchmark for all combinations of table mixes and sizes."""
+    results = []
+    for mix in mixes:
+        for size in sizes:
+            rows = table_mix(mix, size)
+            with tempfile.TemporaryDirectory() as directory:
+                mainfile = write_export(directory, schema_path, rows)
+                result = measure_parse(mainfile, **options)
+            result['rows'] = sum(rows.values())
+            results.append(dict(mix=mix, size=size, **result))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--schema', required=True, help='a chemotion schema.json')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument(
+        '--mixes', nargs='+', choices=sorted(TABLE_MIXES), default=sorted(TABLE_MIXES)
+    )
+    parser.add_argument('--memory', action='store_true')
+    parser.add_argument('--store-molfiles', action='store_true')
+    parser.add_argument('--no-columnar', action='store_true')
+    parser.add_argument('--no-verify-files', action='store_true')
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        args.schema,
+        args.sizes,
+        args.mixes,
+        memory=args.memory,
+        store_molfiles=args.store_molfiles,
+        columnar=not args.no_columnar,
+        verify_files=not args.no_verify_files,
+    )
+
+    print(
+        f'{"mix":<10} {"rows":>9} {"seconds":>9} {"rows/s":>9} {"peak MB":>9} {"MB":>9}'
+    )
+    for result in results:
+        peak_memory = result['peak_memory']
+        peak_memory = '-' if peak_memory is None else f'{peak_memory / 1e6:.1f}'
+        print(
+            f'{result["mix"]:<10} {result["rows"]:>9} {result["seconds"]:>9.2f} '
+            f'{result["rows"] / result["seconds"]:>9.0f} '
+            f'{peak_memory:>9} {result["archive_size"] / 1e6:>9.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Generates synthetic Chemotion exports of arbitrary size.
+
+The rows are derived from the ``schema.json`` that Chemotion ships with every
+export, so that each generated ``export.json`` validates against it. Foreign keys
+point to generated rows of the referenced tables and every referenced image and
+attachment is written as a small stub file.
+"""
+
+import hashlib
+import json
+import os
+import random
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# the ratio of rows per table relative to the size of an export
+TABLE_MIXES = {
+    'samples': {
+        'Collection': 0.001,
+        'Molecule': 0.5,
+        'MoleculeName': 0.5,
+        'Fingerprint': 0.5,
+        'Sample': 1,
+        'CollectionsSample': 1,
+    },
+    'reactions': {
+        'Collection': 0.001,
+        'Molecule': 0.5,
+        'Sample': 1,
+        'CollectionsSample': 1,
+        'Reaction': 0.25,
+        'CollectionsReaction': 0.25,
+        'ReactionsStartingMaterialSample': 0.25,
+        'ReactionsSolventSample': 0.25,
+        'ReactionsReactantSample': 0.25,
+        'ReactionsProductSample': 0.25,
+    },
+    'analyses': {
+        'Collection': 0.001,
+        'Molecule': 0.5,
+        'Sample': 1,
+        'CollectionsSample': 1,
+        'Container': 3,
+        'Attachment': 0.5,
+    },
+    'wellplates': {
+        'Collection': 0.001,
+        'Molecule': 0.05,
+        'Sample': 0.1,
+        'CollectionsSample': 0.1,
+        'Wellplate': 0.001,
+        'CollectionsWellplate': 0.001,
+        'Screen': 0.001,
+        'ScreensWellplate': 0.001,
+        'Well': 1,
+    },
+}
+
+_foreign_keys = {
+    'molecule_id': 'Molecule',
+    'sample_id': 'Sample',
+    'collection_id': 'Collection',
+    'reaction_id': 'Reaction',
+    'fingerprint_id': 'Fingerprint',
+    'molecule_name_id': 'MoleculeName',
+    'wellplate_id': 'Wellplate',
+    'screen_id': 'Screen',
+    'research_plan_id': 'ResearchPlan',
+    'literature_id': 'Literature',
+    'containable_id': 'Sample',
+    'attachable_id': 'Container',
+    'element_id': 'Sample',
+}
+
+_image_directories = {
+    'sample_svg_file': 'samples',
+    'molecule_svg_file': 'molecules',
+    'reaction_svg_file': 'reactions',
+}
+
+_string_lists = ('names', 'cas')
+
+_null_references = ('parent_id', 'shared_by_id')
+
+# the schema allows strings, but Chemotion only ever exports null for these
+_null_values = ('folder',)
+
+# wells are laid out row by row on 1536-well plates
+_PLATE_COLUMNS = 48
+_PLATE_ROWS = 32
+
+_MOLFILE = """
+  Ketcher 05142107502D 1   1.00000     0.00000     0
+
+  6  6  0     0  0            999 V2000
+  -16.1000    2.9125    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+  -15.2340    2.4125    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+  -15.2340    1.4125    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+  -16.1000    0.9125    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+  -16.9660    1.4125    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+  -16.9660    2.4125    0.0000 C   0  0  0  0  0  0  0  0  0  0  0  0
+  1  2  1  0     0  0
+  2  3  2  0     0  0
+  3  4  1  0     0  0
+  4  5  2  0     0  0
+  5  6  1  0     0  0
+  6  1  2  0     0  0
+M  END
+"""
+
+_SVG = '<svg xmlns="http://www.w3.org/2000/svg" width="1" height="1"/>'
+
+_START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def table_mix(mix: str, size: int) -> dict[str, int]:
+    """Returns the number of rows per table for one of the `TABLE_MIXES`."""
+    return {
+        table: max(1, round(ratio * size)) for table, ratio in TABLE_MIXES[mix].items()
+    }
+
+
+def _row_schema(schema: dict, table: str) -> dict:
+    table_schema = schema['properties'][table]
+    if '$ref' in table_schema:
+        table_schema = schema['definitions'][table_schema['$ref'].split('/')[-1]]
+    (row_schema,) = table_schema['patternProperties'].values()
+    return row_schema.get('properties', {})
+
+
+class _ExportGenerator:
+    def __init__(self, directory: str, rows: dict[str, int], seed: int, size: int):
+        self.directory = directory
+        self.random = random.Random(seed)
+        self.attachment_size = size
+        self.ids = {
+            table: [self._uuid() for _ in range(n)] for table, n in rows.items()
+        }
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self.random.getrandbits(128), version=4))
+
+    def _timestamp(self, index: int) -> str:
+        timestamp = _START + timedelta(seconds=index, milliseconds=index % 1000)
+        return timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+    def _write_file(self, path: str, content: bytes):
+        with open(os.path.join(self.directory, path), 'wb') as f:
+            f.write(content)
+
+    def _image(self, name: str, row_id: str) -> str:
+        file_name = f'{hashlib.sha256(row_id.encode()).hexdigest()}.svg'
+        self._write_file(
+            os.path.join('images', _image_directories[name], file_name), _SVG.encode()
+        )
+        return file_name
+
+    def _typed_value(self, name: str, prop: dict, index: int):
+        types = prop.get('type', 'string')
+        if isinstance(types, list):
+            types = next((t for t in types if t != 'null'), 'null')
+        generators = {
+            'null': lambda: None,
+            'string': lambda: f'{name}-{index}',
+            'number': lambda: round(self.random.uniform(0, 100), 5),
+            'integer': lambda: self.random.randint(0, 10),
+            'boolean': lambda: self.random.choice((True, False)),
+            'array': list,
+        }
+        return generators.get(types, dict)()
+
+    def _value(self, name: str, prop: dict, index: int, row_id: str):
+        reference = prop.get('$ref', '')
+        if name in _foreign_keys:
+            ids = self.ids.get(_foreign_keys[name])
+            value = self.random.choice(ids) if ids else None
+        elif name in _image_directories:
+            value = self._image(name, row_id)
+        elif name == 'molfile':
+            value = _MOLFILE
+        elif name == 'position_x':
+            value = index % _PLATE_COLUMNS + 1
+        elif name == 'position_y':
+            value = index // _PLATE_COLUMNS % _PLATE_ROWS + 1
+        elif name in _null_values:
+            value = None
+        elif name in _string_lists:
+            value = [f'{name}-{index}']
+        elif name in ('created_at', 'updated_at') or reference.endswith('/datetime'):
+            value = self._timestamp(index)
+        elif reference.endswith('/uuid'):
+            value = None if name in _null_references else self._uuid()
+        else:
+            value = self._typed_value(name, prop, index)
+        return value
+
+    def _attachment(self, row: dict, row_id: str):
+        content = self.random.randbytes(self.attachment_size)
+        row.update(
+            identifier=row_id,
+            key=row_id,
+            checksum=hashlib.md5(content).hexdigest(),
+            filesize=len(content),
+        )
+        self._write_file(os.path.join('attachments', row_id), content)
+
+    def table(self, table: str, properties: dict) -> dict:
+        rows = {}
+        for index, row_id in enumerate(self.ids[table]):
+            row = {
+                name: self._value(name, prop, index, row_id)
+                for name, prop in properties.items()
+            }
+            if table == 'Attachment':
+                self._attachment(row, row_id)
+            rows[row_id] = row
+        return rows
+
+
+def write_export(
+    directory: str,
+    schema_path: str,
+    rows: dict[str, int],
+    seed: int = 0,
+    attachment_size: int = 1024,
+) -> str:
+    """
+    Writes a synthetic Chemotion export with the given number of rows per table
+    into `directory` and returns the path of its ``export.json``.
+
+    Arguments:
+        directory: The directory of the export; it is created if necessary.
+        schema_path: The Chemotion ``schema.json`` that describes the tables.
+        rows: The number of rows per table. Tables not given are left empty.
+        seed: The seed for all random values, including the uuids.
+        attachment_size: The size of each attachment stub in bytes.
+    """
+    with open(schema_path) as f:
+        schema = json.load(f)
+
+    os.makedirs(os.path.join(directory, 'attachments'), exist_ok=True)
+    for image_directory in _image_directories.values():
+        os.makedirs(os.path.join(directory, 'images', image_directory), exist_ok=True)
+
+    generator = _ExportGenerator(directory, rows, seed, attachment_size)
+    export = {
+        table: generator.table(table, _row_schema(schema, table))
+        for table in schema['properties']
+        if rows.get(table)
+    }
+
+    mainfile = os.path.join(directory, 'export.json')
+    with open(mainfile, 'w') as f:
+        json.dump(export, f)
+    shutil.copyfile(schema_path, os.path.join(directory, 'schema.json'))
+    return mainfile
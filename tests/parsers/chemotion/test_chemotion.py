@@ -15,15 +15,56 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import json
+import os
+import shutil
+from collections import Counter
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
 
 import numpy as np
 import pytest
-from nomad.datamodel import EntryArchive, EntryMetadata
+from nomad.datamodel import ClientContext, EntryArchive, EntryMetadata
+from nomad.parsing.parsers import match_parser, parser_dict
 
+from src.nomad_eln_external_integrations.parsers.chemotion.columnar import (
+    datetime_column,
+    numeric_column,
+    range_bounds,
+    range_column,
+    well_grids,
+)
+from src.nomad_eln_external_integrations.parsers.chemotion.molecules import (
+    MoleculeOwner,
+    MoleculeStore,
+    molecule_key,
+)
+from src.nomad_eln_external_integrations.parsers.chemotion.network import (
+    ROLES,
+    reaction_network,
+)
 from src.nomad_eln_external_integrations.parsers.chemotion.parser import (
+    ChemotionOptions,
     ChemotionParser,
+    ChemotionReactionNetwork,
     _element_type_section_mapping,
 )
+from src.nomad_eln_external_integrations.parsers.chemotion.schema import (
+    load_decoders,
+)
+from src.nomad_eln_external_integrations.parsers.chemotion.selection import (
+    select_rows,
+)
+from src.nomad_eln_external_integrations.parsers.chemotion.trees import (
+    container_parents,
+    nested_set,
+)
+from tests.parsers.chemotion.benchmark import (
+    ArchiveFiles,
+    measure_parse,
+    measure_reparse,
+)
+from tests.parsers.chemotion.synthetic import table_mix, write_export
 
 
 @pytest.fixture(scope='module')
@@ -55,6 +96,45 @@ def _assert_chemotion(test_archive):
     assert len(test_archive.data.Molecule) == 3
     assert test_archive.data.Molecule[1].inchikey == 'XLYOFNOQVPJJNP-UHFFFAOYSA-N'
 
+    sample_columns = test_archive.data.SampleColumns
+    assert sample_columns.ids == [sample.id for sample in test_archive.data.Sample]
+    np.testing.assert_array_equal(
+        sample_columns.target_amount_value, [0.0, 0.002, 0.001, 0.002]
+    )
+    assert sample_columns.melting_point.shape == (len(sample_columns.ids), 2)
+    assert sample_columns.created_at.magnitude.tolist() == [
+        sample.created_at.timestamp() for sample in test_archive.data.Sample
+    ]
+    molecular_weight = test_archive.data.MoleculeColumns.molecular_weight
+    assert molecular_weight.dtype == np.float64
+    np.testing.assert_array_equal(
+        molecular_weight, [210.14034, 18.01528, 46.068439999999995]
+    )
+
+    assert test_archive.data.Attachment[0].file == os.path.join(
+        'attachments', 'ddd7713f-c3a2-4acf-aac6-f1eef4403408'
+    )
+    assert not test_archive.data.Files.missing_files
+    assert not test_archive.data.Files.orphan_files
+    assert not test_archive.data.Files.checksum_mismatches
+
+    assert len(test_archive.data.Reactions) == 1
+    assert [type(plan.body) for plan in test_archive.data.ResearchPlan] == [list, list]
+    network = test_archive.data.ReactionNetwork
+    assert network.inputs_of(0).tolist() == [2, 1, 3]
+    assert network.products_of(0).tolist() == [0]
+    assert network.made_by(0).tolist() == [0]
+
+    eln = test_archive.results.eln
+    assert 'XLYOFNOQVPJJNP-UHFFFAOYSA-N' in eln.lab_ids
+    assert '554-95-0' in eln.lab_ids
+    assert 'rz6502-R1' in eln.lab_ids
+    assert 'trimesic acid' in eln.names
+    assert 'Aqua dest.' in eln.names
+    assert 'C9H6O6' in eln.tags
+    assert 'Modification Sequence' in eln.tags
+    assert test_archive.results.material.elements == ['C', 'H', 'O']
+
     for k in _element_type_section_mapping.keys():
         k = 'Reactions' if k == 'Reaction' else k
         assert k in test_archive.data.m_def.all_properties
@@ -75,3 +155,575 @@ def test_chemotion(parser):
     )
     child_archive = child_archive['0']
     _assert_chemotion(child_archive)
+
+
+def test_chemotion_columns():
+    rows = [
+        {'value': '1.5', 'range': '12.5...13', 'date': '2020-11-25T06:56:37.051Z'},
+        {'value': 'Infinity', 'range': '-Infinity...Infinity', 'date': 'None'},
+        {'value': 'None', 'range': '7'},
+    ]
+
+    values = numeric_column(rows, 'value')
+    np.testing.assert_array_equal(values, [1.5, np.nan, np.nan])
+
+    np.testing.assert_array_equal(
+        range_column(rows, 'range'), [[12.5, 13.0], [np.nan, np.nan], [7.0, 7.0]]
+    )
+    bounds, valid = range_bounds(['1...2', 3, 'a...2', None, [1]])
+    np.testing.assert_array_equal(
+        bounds, [[1.0, 2.0], [3.0, 3.0], [np.nan, 2.0], [np.nan] * 2, [np.nan] * 2]
+    )
+    assert valid.tolist() == [True, True, False, False, False]
+
+    dates = datetime_column(rows, 'date')
+    assert dates[0] == np.datetime64('2020-11-25T06:56:37.051')
+    assert np.isnat(dates[1:]).all()
+
+
+def test_chemotion_files(parser, tmp_path):
+    export_dir = tmp_path / 'export'
+    shutil.copytree('tests/data/parsers/chemotion/test', export_dir)
+    attachment = export_dir / 'attachments' / 'ddd7713f-c3a2-4acf-aac6-f1eef4403408'
+    attachment.write_bytes(b'corrupted')
+    sample_image = next((export_dir / 'images' / 'samples').iterdir())
+    sample_image.unlink()
+    (export_dir / 'attachments' / 'orphan').write_bytes(b'')
+
+    archive = EntryArchive(metadata=EntryMetadata())
+    child_archive = {'0': EntryArchive(metadata=EntryMetadata())}
+    parser.parse(str(export_dir / 'export.json'), archive, None, child_archive)
+
+    files = child_archive['0'].data.Files
+    assert files.missing_files == [os.path.join('images', 'samples', sample_image.name)]
+    assert os.path.join('attachments', 'orphan') in files.orphan_files
+    assert files.checksum_mismatches == [
+        os.path.join('attachments', 'ddd7713f-c3a2-4acf-aac6-f1eef4403408')
+    ]
+
+
+def test_chemotion_molfile_store():
+    mainfile = 'tests/data/parsers/chemotion/test/export.json'
+
+    inline_archive = {'0': EntryArchive(metadata=EntryMetadata())}
+    ChemotionParser().parse(mainfile, EntryArchive(), None, inline_archive)
+    stored_archive = {'0': EntryArchive(metadata=EntryMetadata())}
+    ChemotionParser(options=ChemotionOptions(store_molfiles=True)).parse(
+        mainfile, EntryArchive(), None, stored_archive
+    )
+
+    inline = inline_archive['0'].data
+    stored = stored_archive['0'].data
+    assert stored.Molfiles.keys == sorted(set(stored.Molfiles.keys))
+    for name in ['Sample', 'Molecule']:
+        for inline_section, stored_section in zip(
+            getattr(inline, name), getattr(stored, name)
+        ):
+            assert stored_section.molfile is None
+            assert stored_section.molfile_ref in stored.Molfiles.keys
+            assert stored_section.resolve_molfile() == inline_section.molfile
+
+
+def test_chemotion_molecule_store(tmp_path):
+    upload_dir = tmp_path / 'upload'
+    for directory in ('first', 'second'):
+        shutil.copytree('tests/data/parsers/chemotion/test', upload_dir / directory)
+    store = str(tmp_path / 'molecules.sqlite')
+
+    def parse(entry_id, upload_id='upload', directory=None):
+        mainfile = f'{directory or entry_id}/export.json'
+        child_archive = {
+            '0': EntryArchive(
+                m_context=ClientContext(local_dir=str(upload_dir)),
+                metadata=EntryMetadata(
+                    upload_id=upload_id, entry_id=entry_id, mainfile=mainfile
+                ),
+            )
+        }
+        parser = ChemotionParser(
+            options=ChemotionOptions(molecule_store=store, verify_files=False)
+        )
+        parser.parse(str(upload_dir / mainfile), EntryArchive(), None, child_archive)
+        return child_archive['0'].data
+
+    first = parse('first')
+    assert all(molecule.canonical_molecule is None for molecule in first.Molecule)
+    assert parse('first').Molecule[0].molfile is not None
+
+    second = parse('second')
+    for index, (canonical, linked) in enumerate(zip(first.Molecule, second.Molecule)):
+        assert linked.canonical_molecule.m_proxy_value == (
+            f'../upload/archive/first#/data/Molecule/{index}'
+        )
+        assert linked.inchikey == canonical.inchikey
+        assert linked.molfile is None
+        assert linked.iupac_name is None
+        assert linked.file == canonical.file
+
+    # molecules are not shared with other uploads
+    other = parse('second', upload_id='other')
+    assert all(molecule.canonical_molecule is None for molecule in other.Molecule)
+
+    # the claims of entries whose mainfile is gone are released
+    shutil.rmtree(upload_dir / 'first')
+    second = parse('second')
+    assert all(molecule.canonical_molecule is None for molecule in second.Molecule)
+    third = parse('third', directory='second')
+    assert third.Molecule[0].canonical_molecule.m_proxy_value == (
+        '../upload/archive/second#/data/Molecule/0'
+    )
+
+    # the claims refer to the molecules by their index among the parsed rows
+    shutil.copytree(upload_dir / 'second', upload_dir / 'broken')
+    with open(upload_dir / 'broken' / 'export.json') as f:
+        data = json.load(f)
+    data['Molecule'][next(iter(data['Molecule']))] = 'malformed'
+    with open(upload_dir / 'broken' / 'export.json', 'w') as f:
+        json.dump(data, f)
+    parse('broken', upload_id='broken')
+    fourth = parse('fourth', upload_id='broken', directory='second')
+    assert fourth.Molecule[0].canonical_molecule is None
+    assert fourth.Molecule[1].canonical_molecule.m_proxy_value == (
+        '../upload/archive/broken#/data/Molecule/0'
+    )
+
+
+def test_molecule_store_claims(tmp_path):
+    path = str(tmp_path / 'molecules.sqlite')
+    first, second = MoleculeStore(path, timeout=1), MoleculeStore(path, timeout=1)
+    owners = first.claim('upload', 'a', 'a/export.json', {'key': 0, 'other': 1})
+    assert owners['key'] == MoleculeOwner('a', 'a/export.json', 0)
+
+    owners = second.claim('upload', 'b', 'b/export.json', {'key': 3, 'new': 4})
+    assert owners['key'] == MoleculeOwner('a', 'a/export.json', 0)
+    assert owners['new'] == MoleculeOwner('b', 'b/export.json', 4)
+
+    # claiming again replaces the claims of the entry
+    owners = first.claim('upload', 'a', 'a/export.json', {'other': 2})
+    assert owners['other'] == MoleculeOwner('a', 'a/export.json', 2)
+    owners = second.claim('upload', 'b', 'b/export.json', {'key': 3})
+    assert owners['key'] == MoleculeOwner('b', 'b/export.json', 3)
+
+    second.release('upload')
+    owners = first.claim('upload', 'c', 'c/export.json', {'new': 0})
+    assert owners['new'].entry_id == 'c'
+    first.close()
+    second.close()
+
+
+def test_molecule_key():
+    assert molecule_key({'inchikey': 'KEY', 'cano_smiles': 'C'}) == 'inchikey:KEY'
+    assert molecule_key({'inchikey': '', 'cano_smiles': 'C'}) == 'smiles:C'
+    assert molecule_key({}) is None
+
+
+def test_chemotion_container_tree(parser):
+    mainfile = 'tests/data/parsers/chemotion/test/export.json'
+    child_archive = {'0': EntryArchive(metadata=EntryMetadata())}
+    parser.parse(mainfile, EntryArchive(), None, child_archive)
+
+    chemotion = child_archive['0'].data
+    tree = chemotion.ContainerTree
+    sample = chemotion.Sample[0]
+    containers = [chemotion.Container[i] for i in tree.containers_of(sample.id)]
+    assert [container.container_type for container in containers] == [
+        None,
+        'analyses',
+        'analysis',
+        'dataset',
+    ]
+    root = tree.container_index(containers[0].id)
+    assert containers[0].containable_id == sample.id
+    assert tree.parent[root] == -1
+    assert tree.children_of(root).tolist() == [tree.container_index(containers[1].id)]
+    assert len(tree.containers_of('unknown')) == 0
+
+
+def test_nested_set():
+    # two trees, a self-loop and a cycle of two
+    tree = nested_set(np.array([-1, 0, 0, 1, -1, 5, 4, 8, 7]))
+    assert tree['preorder'].tolist() == [0, 1, 3, 2, 4, 6, 5, 7, 8]
+    assert tree['parent'].tolist() == [-1, 0, 0, 1, -1, -1, 4, -1, 7]
+    subtree = tree['preorder'][tree['position'][1] : tree['subtree_end'][1]]
+    assert subtree.tolist() == [1, 3]
+    assert tree['children'][
+        tree['child_offsets'][0] : tree['child_offsets'][1]
+    ].tolist() == [1, 2]
+    assert container_parents(
+        ['a', 'b', 'c'], [None, 'a', None], [None, 'a', 'b/a']
+    ).tolist() == [-1, 0, 1]
+
+
+def test_reaction_network():
+    # 0 -> r0 -> 1 -> r1 -> 2 with 3 as solvent of r1 and 4 made by r2 from 1
+    network = ChemotionReactionNetwork(
+        **reaction_network(
+            5,
+            3,
+            samples=[0, 1, 1, 3, 2, 1, 4],
+            reactions=[0, 0, 1, 1, 1, 2, 2],
+            roles=[
+                ROLES.index('starting_material'),
+                ROLES.index('product'),
+                ROLES.index('starting_material'),
+                ROLES.index('solvent'),
+                ROLES.index('product'),
+                ROLES.index('reactant'),
+                ROLES.index('product'),
+            ],
+        )
+    )
+    assert network.inputs_of(1).tolist() == [1, 3]
+    assert network.input_roles.tolist() == [0, 0, 2, 1]
+    assert network.where_used(1).tolist() == [1, 2]
+    assert network.made_by(2).tolist() == [1]
+    assert network.route(2).tolist() == [0, 1]
+    assert network.route(4).tolist() == [0, 2]
+    assert network.route(0).tolist() == []
+
+
+def test_chemotion_incremental(tmp_path):
+    parser = ChemotionParser(
+        options=ChemotionOptions(incremental=True, store_molfiles=True)
+    )
+    mainfile = 'tests/data/parsers/chemotion/test/export.json'
+    archive_files = ArchiveFiles(str(tmp_path))
+
+    def parse(mainfile, parser=parser):
+        child_archives = archive_files.child_archives('entry')
+        parser.parse(mainfile, EntryArchive(), None, child_archives)
+        archive_files.write_archive('entry', child_archives['0'])
+        return child_archives['0'].data
+
+    previous = parse(mainfile)
+    assert previous.Changes.new_rows > 0
+    assert previous.Changes.unchanged_rows == 0
+    assert len(previous.RowVersions.ids) == previous.Changes.new_rows
+
+    with open(mainfile) as f:
+        data = json.load(f)
+    sample_id = next(iter(data['Sample']))
+    data['Sample'][sample_id]['updated_at'] = '2024-01-01T00:00:00.000Z'
+    collections_sample_id = next(iter(data['CollectionsSample']))
+    data['CollectionsSample'][collections_sample_id]['deleted_at'] = (
+        '2024-01-01T00:00:00.000Z'
+    )
+    data['Fingerprint'].pop(next(iter(data['Fingerprint'])))
+    export_dir = tmp_path / 'export'
+    shutil.copytree('tests/data/parsers/chemotion/test', export_dir)
+    with open(export_dir / 'export.json', 'w') as f:
+        json.dump(data, f)
+
+    # a deleted collection sample and a removed fingerprint
+    deleted_rows = 2
+    chemotion = parse(str(export_dir / 'export.json'))
+    assert chemotion.Changes.new_rows == 0
+    assert chemotion.Changes.changed_rows == 1
+    assert chemotion.Changes.deleted_rows == deleted_rows
+    assert chemotion.Changes.unchanged_rows == (
+        previous.Changes.new_rows - deleted_rows - 1
+    )
+    assert chemotion.Sample[0].id == sample_id
+    assert chemotion.Sample[0].updated_at == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert len(chemotion.CollectionsSample) == len(previous.CollectionsSample) - 1
+    assert len(chemotion.Fingerprint) == len(previous.Fingerprint) - 1
+    assert len(chemotion.RowVersions.ids) == previous.Changes.new_rows - deleted_rows
+    assert chemotion.Molecule[0].m_to_dict() == previous.Molecule[0].m_to_dict()
+    assert chemotion.Molfiles.keys == previous.Molfiles.keys
+
+    # the sections derived from unchanged tables are reused, the others rebuilt
+    assert json.dumps(chemotion.MoleculeColumns.m_to_dict()) == json.dumps(
+        previous.MoleculeColumns.m_to_dict()
+    )
+    assert chemotion.SampleColumns.updated_at[0] != previous.SampleColumns.updated_at[0]
+
+    # unchanged rows are parsed from the export again, so they do not refer to
+    # molfiles of the previous import
+    chemotion = parse(
+        str(export_dir / 'export.json'),
+        ChemotionParser(options=ChemotionOptions(incremental=True)),
+    )
+    assert chemotion.Changes.unchanged_rows == len(chemotion.RowVersions.ids)
+    assert chemotion.Molfiles is None
+    assert chemotion.Molecule[0].molfile_ref is None
+    assert chemotion.Molecule[0].molfile == previous.Molecule[0].resolve_molfile()
+
+
+@pytest.mark.parametrize('mix', ['samples', 'reactions', 'analyses', 'wellplates'])
+def test_chemotion_synthetic_export(parser, tmp_path, mix):
+    rows = table_mix(mix, 20)
+    mainfile = write_export(
+        str(tmp_path), 'tests/data/parsers/chemotion/test/schema.json', rows
+    )
+
+    child_archive = {'0': EntryArchive(metadata=EntryMetadata())}
+    parser.parse(mainfile, EntryArchive(), None, child_archive)
+
+    chemotion = child_archive['0'].data
+    assert len(chemotion.Sample) == rows['Sample']
+    assert len(chemotion.CollectionsSample) == rows['CollectionsSample']
+    assert len(chemotion.Attachment) == rows.get('Attachment', 0)
+    assert not chemotion.Files.missing_files
+    assert not chemotion.Files.orphan_files
+    assert not chemotion.Files.checksum_mismatches
+
+
+def test_chemotion_wellplates(parser, tmp_path):
+    mainfile = write_export(
+        str(tmp_path),
+        'tests/data/parsers/chemotion/test/schema.json',
+        dict(Sample=3, Wellplate=1, Well=1536),
+    )
+    with open(mainfile) as f:
+        data = json.load(f)
+    # malformed wells are ignored or lose their malformed values
+    wells = data['Well']
+    (misplaced_id, misplaced), (listed_id, listed), *_ = wells.items()
+    misplaced['position_x'] = '1.5'
+    listed['readout'] = ['1', '2']
+    with open(mainfile, 'w') as f:
+        json.dump(data, f)
+
+    logger = MagicMock()
+    child_archive = {'0': EntryArchive(metadata=EntryMetadata())}
+    parser.parse(mainfile, EntryArchive(), logger, child_archive)
+
+    logger.error.assert_not_called()
+    warnings = {
+        call.args[0]: call.kwargs['details'] for call in logger.warning.mock_calls
+    }
+    assert warnings['invalid values in chemotion table are ignored'] == dict(
+        table='Well', columns=dict(position_x=1, readout=1)
+    )
+    assert warnings[
+        'wells without a valid position or with invalid values are ignored'
+    ] == dict(wells=1)
+
+    chemotion = child_archive['0'].data
+    assert 'Well' not in chemotion.m_def.all_sub_sections
+    (wellplate,) = chemotion.Wellplate
+    assert wellplate.well_index.shape == (32, 48)
+    assert len(wellplate.well_ids) == len(wells) - 1
+    assert misplaced_id not in wellplate.well_ids
+    assert set(wellplate.sample_ids) <= {sample.id for sample in chemotion.Sample}
+    y, x = listed['position_y'] - 1, listed['position_x'] - 1
+    assert wellplate.well_ids[wellplate.well_index[y, x]] == listed_id
+    assert wellplate.readout_index[y, x] == -1
+    for well_id, well in list(wells.items())[2:100]:
+        y, x = well['position_y'] - 1, well['position_x'] - 1
+        assert wellplate.well_ids[wellplate.well_index[y, x]] == well_id
+        assert wellplate.sample_ids[wellplate.sample_index[y, x]] == well['sample_id']
+        assert wellplate.readouts[wellplate.readout_index[y, x]] == well['readout']
+        assert np.isnan(wellplate.readout_values[y, x])
+
+
+def test_well_grids():
+    wells = [
+        dict(id='a', wellplate_id='plate', position_x=1, position_y=1, readout='1.5'),
+        dict(id='b', wellplate_id='plate', position_x=2, position_y=1, readout='text'),
+        dict(id='c', wellplate_id='plate', position_x=1, position_y=2, readout='-2'),
+        dict(id='d', wellplate_id='plate', position_x=1, position_y=1, readout='9'),
+        dict(id='e', wellplate_id='plate', position_x=0, position_y=1, readout='1'),
+        dict(id='f', wellplate_id='plate', position_x='1.5', position_y=1),
+        dict(id='g', wellplate_id='plate', position_x=3, position_y=1, readout=[1]),
+        dict(id='h', position_x=3, position_y=1),
+    ]
+    grids, duplicates, invalid = well_grids(wells)
+
+    assert duplicates == {'plate': ['d']}
+    assert invalid == ['e', 'f', 'g', 'h']
+    grid = grids['plate']
+    assert grid['well_index'].shape == (2, 2)
+    assert [grid['well_ids'][i] for i in grid['well_index'].ravel() if i >= 0] == [
+        'a',
+        'b',
+        'c',
+    ]
+    np.testing.assert_array_equal(
+        grid['readout_values'], [[1.5, np.nan], [-2.0, np.nan]]
+    )
+    assert grid['readouts'][grid['readout_index'][0, 1]] == 'text'
+
+
+def test_chemotion_schema_decoders(tmp_path):
+    schema_path = 'tests/data/parsers/chemotion/test/schema.json'
+    decoders = load_decoders(schema_path, _element_type_section_mapping)
+    copy = tmp_path / 'schema.json'
+    shutil.copyfile(schema_path, copy)
+    assert load_decoders(str(copy), _element_type_section_mapping) is decoders
+
+    assert decoders['Attachment'].incompatible_columns == ['folder']
+    invalid = Counter()
+    columns = {}
+    row, closed_range, no_value = decoders['Sample'].decode_rows(
+        [
+            {
+                'name': 'sample',
+                'is_top_secret': 'no',
+                'molecule_id': 'not-a-uuid',
+                'melting_point': '-Infinity...Infinity',
+                'density': '1.5',
+                'created_at': '2021-06-24T08:33:01.966Z',
+                'deleted_at': None,
+                'unknown': 1,
+            },
+            {
+                'melting_point': '12.5...13',
+                'boiling_point': '100',
+                'density': 2,
+                'created_at': 'yesterday',
+            },
+            {'boiling_point': 'unknown'},
+        ],
+        invalid,
+        columns,
+    )
+    assert np.isnan(row.pop('melting_point'))
+    assert np.isnan(closed_range.pop('melting_point'))
+    assert row == dict(
+        name='sample',
+        density=1.5,
+        created_at=datetime(2021, 6, 24, 8, 33, 1, 966000, tzinfo=timezone.utc),
+    )
+    assert closed_range == dict(boiling_point=100.0, density=2.0)
+    assert no_value == {}
+    assert invalid == Counter(
+        is_top_secret=1, molecule_id=1, boiling_point=1, created_at=1
+    )
+
+    # the decoded numbers and timestamps are also returned by column
+    np.testing.assert_array_equal(
+        columns['density'], [[1.5, 1.5], [2.0, 2.0], [np.nan, np.nan]]
+    )
+    np.testing.assert_array_equal(
+        columns['melting_point'],
+        [[np.nan, np.nan], [12.5, 13.0], [np.nan, np.nan]],
+    )
+    np.testing.assert_array_equal(
+        columns['created_at'],
+        np.array(['2021-06-24T08:33:01.966', 'NaT', 'NaT'], dtype='datetime64[ms]'),
+    )
+
+
+def test_chemotion_table_errors(tmp_path):
+    export_dir = tmp_path / 'export'
+    shutil.copytree('tests/data/parsers/chemotion/test', export_dir)
+    mainfile = export_dir / 'export.json'
+    data = json.loads(mainfile.read_text())
+    for sample in data['Sample'].values():
+        sample['is_top_secret'] = 'no'
+    mainfile.write_text(json.dumps(data))
+
+    logger = MagicMock()
+    child_archive = {'0': EntryArchive(metadata=EntryMetadata())}
+    ChemotionParser().parse(str(mainfile), EntryArchive(), logger, child_archive)
+
+    assert len(child_archive['0'].data.Sample) == len(data['Sample'])
+    warnings = [
+        call.kwargs['details']
+        for call in logger.warning.call_args_list
+        if call.args[0] == 'invalid values in chemotion table are ignored'
+    ]
+    assert (
+        dict(
+            table='Sample',
+            columns=dict(is_top_secret=4),
+        )
+        in warnings
+    )
+    logger.error.assert_not_called()
+
+
+def test_chemotion_select_collections():
+    with open('tests/data/parsers/chemotion/test/export.json') as f:
+        data = json.load(f)
+    (sample_id, sample), *_ = data['Sample'].items()
+    data['Collection']['other'] = dict(label='Other')
+    data['Sample']['other-sample'] = dict(sample, molecule_id='other-molecule')
+    data['Molecule']['other-molecule'] = {}
+    data['CollectionsSample']['other-link'] = dict(
+        collection_id='other', sample_id='other-sample'
+    )
+    data['Container']['other-container'] = dict(
+        containable_id='other-sample', parent_id=None, ancestry=''
+    )
+
+    other = select_rows(data, collections=['other'])
+    assert list(other['Sample']) == ['other-sample']
+    assert list(other['Molecule']) == ['other-molecule']
+    assert list(other['Container']) == ['other-container']
+    assert not other['Reaction']
+    assert not other['ReactionsProductSample']
+
+    modification = select_rows(data, collections=['Modification Sequence'])
+    assert 'other-sample' not in modification['Sample']
+    assert sample_id in modification['Sample']
+    for table, rows in modification.items():
+        if table not in ('Collection', 'Sample', 'Molecule', 'CollectionsSample'):
+            assert len(rows) == len(data[table]) - (table == 'Container')
+
+    tables = select_rows(data, collections=['other'], tables=['Sample'])
+    assert list(tables) == ['Sample']
+
+
+def test_chemotion_select_tables():
+    mainfile = 'tests/data/parsers/chemotion/test/export.json'
+    child_archive = {'0': EntryArchive(metadata=EntryMetadata())}
+    ChemotionParser(options=ChemotionOptions(tables=['Sample', 'Molecule'])).parse(
+        mainfile, EntryArchive(), None, child_archive
+    )
+
+    with open(mainfile) as f:
+        data = json.load(f)
+    chemotion = child_archive['0'].data
+    assert [sample.id for sample in chemotion.Sample] == list(data['Sample'])
+    assert [molecule.id for molecule in chemotion.Molecule] == list(data['Molecule'])
+    assert not chemotion.Container
+    assert not chemotion.Reactions
+    assert not chemotion.Files.orphan_files
+
+
+@pytest.mark.parametrize('memory', [False, True])
+def test_chemotion_benchmark(tmp_path, memory):
+    rows = table_mix('reactions', 40)
+    mainfile = write_export(
+        str(tmp_path), 'tests/data/parsers/chemotion/test/schema.json', rows
+    )
+    result = measure_parse(mainfile, memory=memory)
+    assert result['seconds'] > 0
+    assert (result['peak_memory'] is not None) == memory
+    assert result['archive_size'] > 0
+    assert {
+        'Reaction' if name == 'Reactions' else name: count
+        for name, count in result['rows'].items()
+        if count
+    } == rows
+
+
+@pytest.mark.parametrize(
+    'mainfile,matches',
+    [
+        pytest.param('export.json', True, id='export'),
+        pytest.param('chemotion/export.json', True, id='nested-export'),
+        pytest.param('labfolder-export.json', False, id='other-export'),
+        pytest.param('export.json.bak', False, id='suffix'),
+    ],
+)
+def test_chemotion_mainfile_name(tmp_path, mainfile, matches):
+    path = tmp_path / mainfile
+    path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile('tests/data/parsers/chemotion/test/export.json', path)
+    parser, _ = match_parser(str(path))
+    assert (parser is parser_dict['parsers/chemotion']) == matches
+
+
+def test_chemotion_reparse_benchmark(tmp_path):
+    # the attachments of an unchanged export are not hashed again
+    mainfile = write_export(
+        str(tmp_path / 'export'),
+        'tests/data/parsers/chemotion/test/schema.json',
+        table_mix('analyses', 20),
+        attachment_size=4 << 20,
+    )
+    seconds = measure_reparse(mainfile, str(tmp_path))
+    assert seconds['unchanged'] < seconds['full']
@@ -0,0 +1,178 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Throughput benchmark for the Labfolder project resync against a fake server.
+
+    python -m tests.schema_packages.labfolder.benchmark \\
+        --entries 100 1000 --elements 10 --latency 0.01 --file-size 1000000
+
+For every number of entries, a fake Labfolder server is started and the project
+is synced twice into a temporary upload directory: a full sync and, after the
+given fraction of elements got a new version, an incremental sync. Every sync
+is run twice, once to measure the wall time and once under tracemalloc to
+measure the peak memory. The worker counts and retry settings are taken from
+the plugin configuration.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from nomad.datamodel import ClientContext, EntryArchive, EntryMetadata
+
+from src.nomad_eln_external_integrations.schema_packages.labfolder.schema import (
+    LabfolderProject,
+)
+
+from .fake_server import FakeLabfolderServer, generate_entries, update_entries
+
+
+class _QuietLogger:
+    """Swallows the resync logs, so that they do not distort the timings."""
+
+    def _log(self, *args, **kwargs):
+        pass
+
+    debug = info = warning = warn = error = _log
+
+
+def _archive(directory: str, project: LabfolderProject) -> EntryArchive:
+    archive = EntryArchive(
+        m_context=ClientContext(local_dir=directory),
+        metadata=EntryMetadata(mainfile='labfolder.archive.json'),
+    )
+    archive.data = project
+    return archive
+
+
+def _sync(server: FakeLabfolderServer, archive: EntryArchive):
+    archive.data.m_update(
+        labfolder_email='benchmark',
+        password='benchmark',
+        resync_labfolder_repository=True,
+    )
+    archive.data.normalize(archive, _QuietLogger())
+
+
+def _copy(project: LabfolderProject) -> LabfolderProject:
+    return LabfolderProject.m_from_dict(project.m_to_dict())
+
+
+def measure_sync(
+    server: FakeLabfolderServer,
+    directory: str,
+    project: LabfolderProject,
+) -> dict:
+    """
+    Syncs a copy of the project twice and returns the synced project, the wall
+    time in seconds, the number of fetched elements, the downloaded bytes and
+    the peak memory in bytes. The timed sync writes into `directory`, the
+    other one into a copy of its previous content.
+    """
+    with tempfile.TemporaryDirectory() as memory_directory:
+        shutil.copytree(directory, memory_directory, dirs_exist_ok=True)
+
+        server.reset_statistics()
+        archive = _archive(directory, _copy(project))
+        start = time.perf_counter()
+        _sync(server, archive)
+        seconds = time.perf_counter() - start
+        elements, bytes_sent = len(server.requested), server.bytes_sent
+
+        memory_archive = _archive(memory_directory, _copy(project))
+        tracemalloc.start()
+        try:
+            _sync(server, memory_archive)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return dict(
+        seconds=seconds,
+        elements=elements,
+        bytes=bytes_sent,
+        peak_memory=peak_memory,
+        project=archive.data,
+    )
+
+
+def run_benchmark(
+    entry_counts: list[int],
+    n_elements: int,
+    update_fraction: float,
+    **server_options,
+) -> list[dict]:
+    """Runs a full and an incremental sync for all numbers of entries."""
+    results = []
+    for n_entries in entry_counts:
+        entries = generate_entries(n_entries, n_elements)
+        with FakeLabfolderServer(entries, **server_options) as server:
+            with tempfile.TemporaryDirectory() as directory:
+                project = LabfolderProject(project_url=server.project_url)
+                full = measure_sync(server, directory, project)
+
+                update_entries(entries, update_fraction)
+                project = full.pop('project')
+                project.incremental_resync = True
+                incremental = measure_sync(server, directory, project)
+                incremental.pop('project')
+
+        for sync, result in (('full', full), ('incremental', incremental)):
+            results.append(dict(sync=sync, entries=n_entries, **result))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--entries', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--elements', type=int, default=10)
+    parser.add_argument('--update-fraction', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--file-size', type=int, default=100_000)
+    parser.add_argument('--text-size', type=int, default=2_000)
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        args.entries,
+        args.elements,
+        args.update_fraction,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        file_size=args.file_size,
+        text_size=args.text_size,
+    )
+
+    print(
+        f'{"sync":<12} {"entries":>8} {"elements":>9} {"seconds":>9} '
+        f'{"elements/s":>11} {"MB/s":>8} {"peak MB":>9}'
+    )
+    for result in results:
+        print(
+            f'{result["sync"]:<12} {result["entries"]:>8} {result["elements"]:>9} '
+            f'{result["seconds"]:>9.2f} '
+            f'{result["elements"] / result["seconds"]:>11.0f} '
+            f'{result["bytes"] / result["seconds"] / 1e6:>8.1f} '
+            f'{result["peak_memory"] / 1e6:>9.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+#
+# Copyright The NOMAD Authors.
+#
+# This file is part of NOMAD. See https://nomad-lab.eu for further info.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+A local stand-in for the Labfolder API, for tests and benchmarks.
+
+The server implements the part of the API that the project resync uses: login,
+logout, the paginated entries, the element versions and the file and image
+downloads with range requests. The listed entries are a plain list of entry
+dicts that can be changed between syncs. Latency, error rate and payload sizes
+are configurable and the server records what was requested. The same entries
+can also be written as an offline project export.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+ELEMENT_TYPES = ('TEXT', 'FILE', 'IMAGE', 'DATA', 'TABLE', 'WELL_PLATE')
+
+_download_file_names = {
+    'download': '{id}.bin',
+    'original-data': '{id}.png',
+    'preview-data': '{id}-preview.png',
+}
+_element_type_downloads = {
+    'FILE': ('download',),
+    'IMAGE': ('original-data', 'preview-data'),
+}
+
+_element_path = re.compile(r'^/api/v2/elements/([\w-]+)/([^/]+)/version/([^/]+)$')
+_download_path = re.compile(
+    r'^/api/v2/elements/(file|image)/([^/]+)/(download|original-data|preview-data)$'
+)
+
+
+def generate_entries(
+    n_entries: int,
+    n_elements: int,
+    element_types: tuple[str, ...] = ELEMENT_TYPES,
+    seed: int = 0,
+) -> list[dict]:
+    """Returns entries with `n_elements` elements of random types each."""
+    rng = random.Random(seed)
+    return [
+        {
+            'id': str(entry),
+            'version_id': '1',
+            'project_id': '1',
+            'title': f'entry {entry}',
+            'elements': [
+                {
+                    'id': f'{entry}-{element}',
+                    'version_id': '1',
+                    'type': rng.choice(element_types),
+                }
+                for element in range(n_elements)
+            ],
+        }
+        for entry in range(n_entries)
+    ]
+
+
+def update_entries(entries: list[dict], fraction: float, seed: int = 0) -> int:
+    """Gives a new version to a fraction of the elements, returns their number."""
+    rng = random.Random(seed)
+    n_updated = 0
+    for entry in entries:
+        for element in entry['elements']:
+            if rng.random() < fraction:
+                element['version_id'] = str(int(element['version_id']) + 1)
+                n_updated += 1
+    return n_updated
+
+
+def _text(element_id: str, version_id: str, size: int) -> str:
+    filler = ' lorem ipsum' * (size // 12)
+    return f'<p>{element_id} {version_id}{filler}</p>'
+
+
+def _element_data(element: dict, version_id: str, text_size: int) -> dict:
+    element_type = element['type']
+    data = {
+        'id': element['id'],
+        'version_id': version_id,
+        'element_type': element_type,
+        'owner_id': '1',
+        'creation_date': '2022-08-29T09:22:30+00:00',
+        'version_date': '2022-08-29T09:22:30+00:00',
+    }
+    if element_type == 'TEXT':
+        data['content'] = _text(element['id'], version_id, text_size)
+    elif element_type == 'FILE':
+        data['file_name'] = f'{element["id"]}.bin'
+    elif element_type == 'IMAGE':
+        data['title'] = element['id']
+    elif element_type == 'DATA':
+        data['data_elements'] = [
+            {
+                'type': 'DATA_ELEMENT_GROUP',
+                'title': 'group',
+                'children': [
+                    {
+                        'type': 'SINGLE_DATA_ELEMENT',
+                        'title': 'volume',
+                        'value': version_id,
+                        'unit': 'mL',
+                        'physical_quantity_id': '6',
+                    },
+                    {
+                        'type': 'DESCRIPTIVE_DATA_ELEMENT',
+                        'title': 'note',
+                        'description': element['id'],
+                    },
+                ],
+            }
+        ]
+    elif element_type == 'TABLE':
+        data['title'] = element['id']
+        data['content'] = {
+            'sheets': {
+                'Sheet1': {
+                    'name': 'Sheet1',
+                    'data': {
+                        'dataTable': {
+                            '0': {'0': {'value': 'volume'}, '1': {'value': 1.5}},
+                            '1': {'0': {'value': 'mass'}, '1': {'value': 2.5}},
+                        }
+                    },
+                }
+            }
+        }
+    elif element_type == 'WELL_PLATE':
+        data['title'] = element['id']
+        data['content'] = {'version': '14.1.3'}
+        data['meta_data'] = {'plate': {'size': '24'}}
+    return data
+
+
+def _file_content(size: int) -> bytes:
+    return bytes(range(256)) * (size // 256) + bytes(size % 256)
+
+
+class FakeLabfolderServer:
+    """
+    A Labfolder API on a local port. Every request waits for `latency` seconds
+    and element and download requests fail with a 503 at the given
+    `error_rate`. Downloads have `file_size` bytes, text elements about
+    `text_size` characters.
+    """
+
+    def __init__(
+        self,
+        entries: Optional[list[dict]] = None,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        file_size: int = 1024,
+        text_size: int = 0,
+    ):
+        self.entries = entries if entries is not None else []
+        self.latency = latency
+        self.error_rate = error_rate
+        self.text_size = text_size
+        self.file = _file_content(file_size)
+
+        # the number of next element requests that are throttled with a 429
+        self.throttle = 0
+        # the number of next downloads that are interrupted halfway
+        self.interruptions = 0
+        self.honor_range = True
+
+        self.requested: list[str] = []
+        self.downloads: list[str] = []
+        self.bytes_sent = 0
+        self.running = 0
+        self.max_running = 0
+
+        self._lock = threading.Lock()
+        # the errors are drawn reproducibly
+        self._random = random.Random(0)
+        self._elements: dict[str, dict] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    @property
+    def project_url(self) -> str:
+        return f'{self.url}/eln/notebook#?projectIds=1'
+
+    def reset_statistics(self):
+        with self._lock:
+            self.requested.clear()
+            self.downloads.clear()
+            self.bytes_sent = 0
+            self.max_running = 0
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs=dict(poll_interval=0.01),
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _fails(self) -> bool:
+        with self._lock:
+            if self.throttle > 0:
+                self.throttle -= 1
+                return True
+            return self._random.random() < self.error_rate
+
+    def _index_elements(self):
+        self._elements = {
+            element['id']: element
+            for entry in self.entries
+            for element in entry['elements']
+        }
+
+    def _element(self, element_id: str) -> Optional[dict]:
+        # the index is renewed with every first page of entries, new elements
+        # can also be added in between
+        if element_id not in self._elements:
+            self._index_elements()
+        return self._elements.get(element_id)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(
+                self, status: int, body: bytes = b'', headers: Optional[dict] = None
+            ):
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.bytes_sent += len(body)
+
+            def _send_json(self, data):
+                self._send(
+                    200,
+                    json.dumps(data).encode(),
+                    {'Content-Type': 'application/json'},
+                )
+
+            def _unavailable(self):
+                self._send(503, headers={'Retry-After': '0'})
+
+            def do_POST(self):
+                time.sleep(server.latency)
+                if self.path == '/api/v2/auth/login':
+                    self._send_json({'token': 'fake-token'})
+                elif self.path == '/api/v2/auth/logout':
+                    self._send(204)
+                else:
+                    self._send(404)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/api/v2/entries':
+                    time.sleep(server.latency)
+                    query = parse_qs(url.query)
+                    offset = int(query.get('offset', ['0'])[0])
+                    limit = int(query.get('limit', ['20'])[0])
+                    if offset == 0:
+                        server._index_elements()
+                    self._send_json(server.entries[offset : offset + limit])
+                    return
+
+                match = _element_path.match(url.path)
+                if match:
+                    self._get_element(match.group(2), match.group(3))
+                    return
+
+                match = _download_path.match(url.path)
+                if match:
+                    self._download(*match.groups())
+                    return
+
+                self._send(404)
+
+            def _get_element(self, element_id, version_id):
+                element = server._element(element_id)
+                if element is None:
+                    self._send(404)
+                    return
+                if server._fails():
+                    self._unavailable()
+                    return
+
+                with server._lock:
+                    server.running += 1
+                    server.max_running = max(server.max_running, server.running)
+                    server.requested.append(element_id)
+                try:
+                    time.sleep(server.latency)
+                    data = _element_data(element, version_id, server.text_size)
+                finally:
+                    with server._lock:
+                        server.running -= 1
+                self._send_json(data)
+
+            def _download(self, element_type, element_id, kind):
+                if server._element(element_id) is None:
+                    self._send(404)
+                    return
+                time.sleep(server.latency)
+                if server._fails():
+                    self._unavailable()
+                    return
+
+                file_name = _download_file_names[kind].format(id=element_id)
+                content, status = server.file, 200
+                match = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+                if match and server.honor_range:
+                    content, status = content[int(match.group(1)) :], 206
+
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(content)))
+                self.send_header(
+                    'Content-Disposition', f'attachment; filename="{file_name}"'
+                )
+                self.end_headers()
+                with server._lock:
+                    server.downloads.append(self.path)
+                    interrupted = server.interruptions > 0
+                    server.interruptions -= interrupted
+                if interrupted:
+                    # send half of the content and drop the connection
+                    content = content[: len(content) // 2]
+                    self.close_connection = True
+                self.wfile.write(content)
+                with server._lock:
+                    server.bytes_sent += len(content)
+
+        return Handler
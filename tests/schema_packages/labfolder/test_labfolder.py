@@ -16,14 +16,54 @@
 # limitations under the License.
 #
 
+from collections import OrderedDict
+import io
+import re
+import sys
+import time
 from unittest.mock import MagicMock
+from lxml.html.clean import clean_html
 import pytest
 from nomad import utils
 import json
 import requests
-from nomad.datamodel import EntryArchive, EntryMetadata
+from nomad.datamodel import ClientContext, EntryArchive, EntryMetadata
+from nomad.metainfo import MSection, Quantity, SubSection
+import numpy as np
 
-from src.nomad_eln_external_integrations.schema_packages.labfolder.schema import LabfolderProject, LabfolderImportError
+from src.nomad_eln_external_integrations.schema_packages.labfolder import (
+    data_schema as labfolder_data_schema,
+)
+from src.nomad_eln_external_integrations.schema_packages.labfolder import (
+    sanitize as labfolder_sanitize,
+)
+from src.nomad_eln_external_integrations.schema_packages.labfolder.content import (
+    INDEX_FILE,
+)
+from src.nomad_eln_external_integrations.schema_packages.labfolder.fetch import (
+    ORDERED_MAP_WINDOW,
+    AdaptiveLimit,
+    Chunks,
+    Retries,
+    download,
+    ordered_map,
+    paged,
+    retry_after,
+    send_with_retries,
+)
+from src.nomad_eln_external_integrations.schema_packages.labfolder.schema import (
+    LabfolderDataElement,
+    LabfolderImportError,
+    LabfolderProject,
+)
+from src.nomad_eln_external_integrations.schema_packages.labfolder.table import (
+    decode_sheets,
+)
+from tests.schema_packages.labfolder.benchmark import run_benchmark
+from tests.schema_packages.labfolder.fake_server import (
+    FakeLabfolderServer,
+    generate_entries,
+)
 
 
 def test_labfolder_integration():
@@ -196,7 +236,7 @@ def test_labfolder_detailed(
         mock_response.status_code = status_code
         mock_response.url = '/test_endpoint'
 
-        if args[0] == f'{base_api_url}/entries?project_ids=1':
+        if args[0].startswith(f'{base_api_url}/entries?project_ids=1&'):
             mock_response.return_value = element_data
         else:
             mock_response.return_value = response_data
@@ -237,9 +277,596 @@ def test_labfolder_detailed(
             )
         else:
             del parsed_data['labfolder_data']
+            assert parsed_data.pop('numeric_data') == [
+                {
+                    'path': '/first title',
+                    'unit': 'milliliter',
+                    'titles': ['child title'],
+                    'values': [1.0],
+                }
+            ]
             assert json.dumps(parsed_data, sort_keys=True) == json.dumps(
                 response_data, sort_keys=True
             )
     else:
         with pytest.raises(LabfolderImportError):
             labfolder_instance.normalize(test_archive, logger=logger)
+
+
+_FETCH_WORKERS = 3
+
+
+@pytest.fixture
+def labfolder_server(monkeypatch):
+    """A local fake labfolder server with slow requests."""
+    # the package exports the entry point as `schema`, which hides the module
+    labfolder_schema = sys.modules[LabfolderProject.__module__]
+    configuration = dict(
+        fetch_workers=_FETCH_WORKERS,
+        entries_page_size=3,
+        entries_prefetch=1,
+        retry_delay=0.001,
+    )
+    monkeypatch.setattr(labfolder_schema, '_configuration', configuration.get)
+
+    entries = generate_entries(4, 5, element_types=('TEXT',))
+    with FakeLabfolderServer(entries, latency=0.02, file_size=102400) as server:
+        yield server
+
+
+def _resync(labfolder_instance, archive):
+    labfolder_instance.m_update(
+        labfolder_email='test_email',
+        password='test_password',
+        resync_labfolder_repository=True,
+    )
+    labfolder_instance.normalize(archive, logger=utils.get_logger(__name__))
+    return {
+        entry.id: [(element.id, element.version_id) for element in entry.elements]
+        for entry in labfolder_instance.entries
+    }
+
+
+def _listed(entries):
+    return {
+        entry['id']: [
+            (element['id'], element['version_id']) for element in entry['elements']
+        ]
+        for entry in entries
+    }
+
+
+def test_labfolder_data_grid():
+    data_elements = [
+        {
+            'type': 'DATA_ELEMENT_GROUP',
+            'title': 'outer',
+            'children': [
+                {
+                    'type': 'DATA_ELEMENT_GROUP',
+                    'title': 'inner',
+                    'children': [
+                        {
+                            'type': 'SINGLE_DATA_ELEMENT',
+                            'title': f'volume {index}',
+                            'value': value,
+                            'unit': unit,
+                        }
+                        for index, (value, unit) in enumerate(
+                            [
+                                ('1', 'mL'),
+                                ('1,234.5', 'ml'),
+                                ('2,5', 'mL'),
+                                ('n/a', 'mL'),
+                                ('3', 'g'),
+                            ]
+                        )
+                    ],
+                },
+                {'type': 'SINGLE_DATA_ELEMENT', 'title': 'count', 'value': '4'},
+            ],
+        }
+    ]
+    element = LabfolderDataElement()
+    element.m_update_from_dict(dict(id='1', data_elements=data_elements))
+
+    grid = element.data_elements[0]
+    assert grid.title == 'outer'
+    assert [child.title for child in grid.children] == ['inner', 'count']
+    assert [child.value for child in grid.children[0].children] == [
+        '1',
+        '1,234.5',
+        '2,5',
+        'n/a',
+        '3',
+    ]
+
+    arrays = {(array.path, array.unit): array for array in element.numeric_data}
+    assert set(arrays) == {
+        ('/outer/inner', 'milliliter'),
+        ('/outer/inner', 'gram'),
+        ('/outer', None),
+    }
+    volumes = arrays[('/outer/inner', 'milliliter')]
+    # commas only separate thousands, decimal commas are not numbers
+    assert volumes.titles == ['volume 0', 'volume 1']
+    assert volumes.quantity().to('liter').magnitude.tolist() == pytest.approx(
+        [0.001, 1.2345]
+    )
+    assert arrays[('/outer', None)].values.tolist() == [4.0]
+
+
+def test_labfolder_concurrent_fetch(labfolder_server):
+    server = labfolder_server
+
+    test_archive = EntryArchive(metadata=EntryMetadata())
+    labfolder_instance = LabfolderProject(project_url=server.project_url)
+    test_archive.data = labfolder_instance
+
+    synced = _resync(labfolder_instance, test_archive)
+    assert list(synced.items()) == list(_listed(server.entries).items())
+    assert 1 < server.max_running <= _FETCH_WORKERS
+
+
+def test_labfolder_incremental_resync(labfolder_server):
+    server = labfolder_server
+
+    test_archive = EntryArchive(metadata=EntryMetadata())
+    labfolder_instance = LabfolderProject(
+        project_url=server.project_url, incremental_resync=True
+    )
+    test_archive.data = labfolder_instance
+    _resync(labfolder_instance, test_archive)
+    kept_element = labfolder_instance.entries[0].elements[1]
+
+    entries = server.entries
+    entries[0]['elements'][0]['version_id'] = '2'
+    del entries[1]['elements'][2]
+    entries[2]['elements'].append({'id': '2-5', 'version_id': '1', 'type': 'TEXT'})
+    del entries[3]
+    server.requested.clear()
+
+    synced = _resync(labfolder_instance, test_archive)
+    assert list(synced.items()) == list(_listed(server.entries).items())
+    assert sorted(server.requested) == ['0-0', '2-5']
+    assert labfolder_instance.entries[0].elements[0].content == '<p>0-0 2</p>'
+    assert labfolder_instance.entries[0].elements[1] is kept_element
+
+
+def test_ordered_map_error():
+    failing = 3
+
+    def fail(item):
+        if item == failing:
+            raise ValueError(item)
+        return item
+
+    results = ordered_map(fail, range(10), 4)
+    assert [next(results) for _ in range(failing)] == list(range(failing))
+    with pytest.raises(ValueError):
+        next(results)
+
+
+def test_ordered_map_window():
+    consumed = []
+
+    def items():
+        for item in range(100):
+            consumed.append(item)
+            yield item
+
+    results = ordered_map(lambda item: item, items(), 4)
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    assert len(consumed) <= 3 + 4 * ORDERED_MAP_WINDOW
+    assert list(results) == list(range(3, 100))
+
+
+@pytest.mark.parametrize('n_items', [0, 5, 6, 7])
+def test_paged(n_items):
+    items = list(range(n_items))
+    offsets = []
+
+    def fetch_page(offset, limit):
+        offsets.append(offset)
+        return items[offset : offset + limit]
+
+    pages = list(paged(fetch_page, 3, 2))
+    assert [item for page in pages for item in page] == items
+    assert all(len(page) > 0 for page in pages)
+    assert max(offsets) <= n_items + 2 * 3
+
+
+@pytest.mark.parametrize(
+    'interruptions,honor_range',
+    [
+        pytest.param(0, True, id='complete'),
+        pytest.param(2, True, id='resumed'),
+        pytest.param(1, False, id='restarted'),
+    ],
+)
+def test_download(labfolder_server, tmp_path, interruptions, honor_range):
+    server = labfolder_server
+    server.interruptions, server.honor_range = interruptions, honor_range
+
+    def raw_file(path, mode):
+        return open(tmp_path / path, mode)
+
+    def file_name(response):
+        return re.search('filename="(.+)"', response.headers['Content-Disposition'])[1]
+
+    path = download(
+        requests.get,
+        f'{server.url}/api/v2/elements/file/0-0/download',
+        raw_file,
+        file_name,
+        Chunks(chunk_size=1000, max_resumes=2),
+    )
+    assert path == '0-0.bin'
+    assert (tmp_path / path).read_bytes() == server.file
+
+
+def test_download_fails(labfolder_server, tmp_path):
+    server = labfolder_server
+    server.interruptions = 2
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        download(
+            requests.get,
+            f'{server.url}/api/v2/elements/file/0-0/download',
+            lambda path, mode: open(tmp_path / path, mode),
+            lambda response: 'f.bin',
+            Chunks(chunk_size=1000, max_resumes=1),
+        )
+
+
+def test_labfolder_content_index(labfolder_server, tmp_path):
+    server = labfolder_server
+    server.entries = [
+        {
+            'id': '0',
+            'elements': [
+                {'id': 'a', 'version_id': '1', 'type': 'FILE'},
+                {'id': 'b', 'version_id': '1', 'type': 'FILE'},
+                {'id': 'c', 'version_id': '1', 'type': 'IMAGE'},
+            ],
+        }
+    ]
+
+    test_archive = EntryArchive(
+        m_context=ClientContext(local_dir=str(tmp_path)),
+        metadata=EntryMetadata(mainfile='project.archive.json'),
+    )
+    labfolder_instance = LabfolderProject(project_url=server.project_url)
+    test_archive.data = labfolder_instance
+    _resync(labfolder_instance, test_archive)
+
+    # all downloads have the same content, which is only stored once
+    file_element, other_file_element, image_element = labfolder_instance.entries[
+        0
+    ].elements
+    assert sorted(server.downloads) == [
+        '/api/v2/elements/file/a/download',
+        '/api/v2/elements/file/b/download',
+        '/api/v2/elements/image/c/original-data',
+        '/api/v2/elements/image/c/preview-data',
+    ]
+    # the elements are downloaded concurrently, any of them may store the content
+    stored_files = [
+        path.name for path in tmp_path.iterdir() if path.suffix in ('.bin', '.png')
+    ]
+    assert len(stored_files) == 1
+    assert file_element.file == other_file_element.file == stored_files[0]
+    assert image_element.original_image_file == stored_files[0]
+    assert image_element.preview_image_file == stored_files[0]
+    assert (tmp_path / INDEX_FILE).exists()
+
+    # a full resync finds all files in the index
+    server.downloads.clear()
+    server.entries[0]['elements'][1]['version_id'] = '2'
+    content, server.file = server.file, b'changed'
+    _resync(labfolder_instance, test_archive)
+    assert server.downloads == ['/api/v2/elements/file/b/download']
+    changed_file = labfolder_instance.entries[0].elements[1].file
+    assert changed_file != stored_files[0]
+    assert (tmp_path / changed_file).read_bytes() == b'changed'
+    assert (tmp_path / stored_files[0]).read_bytes() == content
+    # the downloads are moved into place or removed, never left behind
+    assert not list(tmp_path.glob('.labfolder-download-*'))
+
+
+def test_labfolder_throttled(labfolder_server):
+    server = labfolder_server
+    server.throttle = 4
+
+    test_archive = EntryArchive(metadata=EntryMetadata())
+    labfolder_instance = LabfolderProject(project_url=server.project_url)
+    test_archive.data = labfolder_instance
+
+    synced = _resync(labfolder_instance, test_archive)
+    assert list(synced.items()) == list(_listed(server.entries).items())
+    assert server.throttle == 0
+
+
+def test_adaptive_limit():
+    maximum = 8
+    limit = AdaptiveLimit(maximum)
+
+    # throttled responses of requests started together decrease the limit once
+    generations = [limit.acquire() for _ in range(4)]
+    for generation in generations:
+        limit.release(generation, throttled=True)
+    assert limit.limit == maximum // 2
+
+    limit.release(limit.acquire(), throttled=True)
+    assert limit.limit == maximum // 4
+
+    # as many successes as the current limit increase it by one
+    for _ in range(2 + 3 + 4):
+        limit.release(limit.acquire(), throttled=False)
+    assert limit.limit == maximum // 4 + 3
+
+
+@pytest.mark.parametrize(
+    'value,expected',
+    [
+        pytest.param(None, None, id='missing'),
+        pytest.param('3', 3.0, id='seconds'),
+        pytest.param('Wed, 21 Oct 2015 07:28:00 GMT', 0.0, id='past-date'),
+        pytest.param('soon', None, id='invalid'),
+    ],
+)
+def test_retry_after(value, expected):
+    response = requests.Response()
+    if value is not None:
+        response.headers['Retry-After'] = value
+    assert retry_after(response) == expected
+
+
+def _response(status_code, **headers):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers)
+    response.raw = io.BytesIO()
+    return response
+
+
+def test_send_with_retries_delay(monkeypatch):
+    monkeypatch.setattr(time, 'sleep', lambda delay: None)
+    ok = _response(200)
+    responses = iter([_response(503, **{'Retry-After': '3600'}), ok])
+    delays = []
+
+    response = send_with_retries(
+        lambda: next(responses),
+        AdaptiveLimit(1),
+        Retries(max_retries=1, base_delay=0.1, max_delay=2.0),
+        lambda attempt, delay, response: delays.append(delay),
+    )
+    assert response is ok
+    assert delays == [2.0]
+
+
+def test_send_with_retries_stream():
+    limit = AdaptiveLimit(1)
+    response = send_with_retries(
+        lambda: _response(200), limit, Retries(0, 0.0, 0.0), stream=True
+    )
+    # the slot is held until the body is closed
+    assert limit._running == 1
+    response.close()
+    response.close()
+    assert limit._running == 0
+
+
+def test_sanitize_cache(monkeypatch):
+    cleaned = []
+
+    def clean(content):
+        cleaned.append(content)
+        return clean_html(content)
+
+    monkeypatch.setattr(labfolder_sanitize, '_clean', clean)
+    monkeypatch.setattr(labfolder_sanitize, '_cache', OrderedDict())
+    contents = ['<p>a<script></script></p>', '<p>b</p>', '<p>a<script></script></p>']
+
+    assert labfolder_sanitize.sanitize_all(contents) == [
+        clean_html(content) for content in contents
+    ]
+    assert labfolder_sanitize.sanitize(contents[1]) == clean_html(contents[1])
+    assert cleaned == contents[:2]
+
+
+def test_sanitize_cache_size(monkeypatch):
+    monkeypatch.setattr(labfolder_sanitize, '_cache', OrderedDict())
+    contents = [f'<p onclick="x()">{index}</p>' for index in range(16)]
+    cache_size = 8
+    assert labfolder_sanitize.sanitize_all(contents, cache_size=cache_size) == [
+        clean_html(content) for content in contents
+    ]
+    assert list(labfolder_sanitize._cache.values()) == [
+        clean_html(content) for content in contents[-cache_size:]
+    ]
+
+
+def test_labfolder_benchmark():
+    n_entries, n_elements = 3, 4
+    results = run_benchmark([n_entries], n_elements, 0.5, file_size=1000, text_size=100)
+    assert [result['sync'] for result in results] == ['full', 'incremental']
+    full, incremental = results
+    assert full['elements'] == n_entries * n_elements
+    assert 0 < incremental['elements'] < full['elements']
+    for result in results:
+        assert result['seconds'] > 0
+        assert result['peak_memory'] > 0
+
+
+def test_labfolder_split_entries(labfolder_server, tmp_path):
+    server = labfolder_server
+    test_archive = EntryArchive(
+        m_context=ClientContext(local_dir=str(tmp_path)),
+        metadata=EntryMetadata(
+            mainfile='project.archive.json', upload_id='upload', entry_id='project'
+        ),
+    )
+    labfolder_instance = LabfolderProject(
+        project_url=server.project_url, split_entries=True, incremental_resync=True
+    )
+    test_archive.data = labfolder_instance
+    processed = []
+    test_archive.m_context.process_updated_raw_file = lambda path, allow_modify=False: (
+        processed.append((path, allow_modify))
+    )
+    _resync(labfolder_instance, test_archive)
+
+    assert len(labfolder_instance.entries) == 0
+    # the context processes the written entry archives
+    assert processed == [
+        (f'project.entry-{entry}.archive.json', True) for entry in range(4)
+    ]
+    context = test_archive.m_context
+    assert [
+        reference.m_proxy_value for reference in labfolder_instance.entry_archives
+    ] == [
+        context.normalize_reference(
+            labfolder_instance,
+            f'../upload/archive/mainfile/project.entry-{entry}.archive.json#/data',
+        )
+        for entry in range(4)
+    ]
+    # only the project stub with the references is written into the mainfile
+    project = json.loads((tmp_path / 'project.archive.json').read_text())['data']
+    assert 'entries' not in project
+    assert 'labfolder_email' not in project
+
+    entry = json.loads((tmp_path / 'project.entry-0.archive.json').read_text())
+    assert entry['data']['m_def'].endswith('LabfolderEntryArchive')
+    assert [element['id'] for element in entry['data']['entry']['elements']] == [
+        f'0-{element}' for element in range(5)
+    ]
+
+    # the elements of the split entries are compared in an incremental resync
+    server.entries[1]['elements'][0]['version_id'] = '2'
+    server.reset_statistics()
+    _resync(labfolder_instance, test_archive)
+    assert server.requested == ['1-0']
+    entry = json.loads((tmp_path / 'project.entry-1.archive.json').read_text())
+    assert entry['data']['entry']['elements'][0]['version_id'] == '2'
+    assert len(labfolder_instance.entry_archives) == len(server.entries)
+
+
+class _DataGroup(MSection):
+    volume = Quantity(type=float, unit='liter')
+    note = Quantity(type=str)
+
+
+class _DataSample(MSection):
+    group = SubSection(sub_section=_DataGroup)
+
+
+def test_labfolder_data_schema(labfolder_server):
+    server = labfolder_server
+    server.entries = generate_entries(3, 4, element_types=('DATA',))
+    test_archive = EntryArchive(metadata=EntryMetadata())
+    labfolder_instance = LabfolderProject(project_url=server.project_url)
+    test_archive.data = labfolder_instance
+    _resync(labfolder_instance, test_archive)
+
+    elements = [
+        element for entry in labfolder_instance.entries for element in entry.elements
+    ]
+    for element in elements:
+        element.nomad_data_schema = _DataSample.m_def
+    elements[0].labfolder_data['group']['unknown'] = dict(
+        value='1', unit=None, description=None
+    )
+    elements[1].labfolder_data['group']['volume']['value'] = 'a few'
+
+    logger = MagicMock()
+    labfolder_instance.normalize(test_archive, logger)
+    for element in elements:
+        assert isinstance(element.nomad_data, _DataSample)
+        assert element.nomad_data.group.note == element.id
+        if element is not elements[1]:
+            volume = element.nomad_data.group.volume
+            assert volume.to('mL').magnitude == pytest.approx(1)
+    assert elements[1].nomad_data.group.volume is None
+    # the unmapped and the invalid data are reported once for all elements of a
+    # schema
+    assert [call.kwargs['data']['paths'] for call in logger.warning.call_args_list] == [
+        ['/group/unknown'],
+        ['/group/volume'],
+    ]
+    logger.error.assert_not_called()
+
+
+def test_labfolder_mapping_cache(monkeypatch):
+    monkeypatch.setattr(labfolder_data_schema, 'MAPPING_CACHE_SIZE', 1)
+    monkeypatch.setattr(labfolder_data_schema, '_mappings', OrderedDict())
+
+    mapping = labfolder_data_schema.compile_mapping(_DataSample.m_def)
+    assert labfolder_data_schema.compile_mapping(_DataSample.m_def) is mapping
+    labfolder_data_schema.compile_mapping(_DataGroup.m_def)
+    assert list(labfolder_data_schema._mappings) == [_DataGroup.m_def.definition_id]
+    assert labfolder_data_schema.compile_mapping(_DataSample.m_def) is not mapping
+
+
+def test_labfolder_table_columns(labfolder_server, tmp_path):
+    server = labfolder_server
+    server.entries = generate_entries(2, 2, element_types=('TABLE',))
+    test_archive = EntryArchive(
+        m_context=ClientContext(local_dir=str(tmp_path)),
+        metadata=EntryMetadata(mainfile='project.archive.json'),
+    )
+    labfolder_instance = LabfolderProject(project_url=server.project_url)
+    test_archive.data = labfolder_instance
+    _resync(labfolder_instance, test_archive)
+
+    for entry in labfolder_instance.entries:
+        for element in entry.elements:
+            sheet = element.sheets[0]
+            assert (sheet.name, sheet.row_count, sheet.column_count) == ('Sheet1', 2, 2)
+            assert not sheet.header
+            names, amounts = sheet.columns
+            assert names.value_type == 'STRING'
+            assert names.values() == ['volume', 'mass']
+            assert amounts.value_type == 'NUMERIC'
+            assert amounts.values().tolist() == [1.5, 2.5]
+
+            # the raw content is only read from the upload when it is needed
+            assert element.content is None
+            assert (tmp_path / element.content_file).exists()
+            assert list(element.raw_content()['sheets']) == ['Sheet1']
+
+
+def test_decode_sheets():
+    cells = {
+        '2': {'1': {'value': 'time'}, '2': {'value': 'mass'}, '3': {'value': 'note'}},
+        '3': {
+            '1': {'value': '/OADate(45000.5)/'},
+            '2': {'value': '1,5'},
+            '3': {'value': 'ok'},
+            '4': {'value': '1,000.5'},
+        },
+        '5': {
+            '1': {'value': '/OADate(45001)/'},
+            '2': {'value': 2},
+            '4': {'value': 3},
+        },
+    }
+    (sheet,) = decode_sheets({'sheets': {'S': {'data': {'dataTable': cells}}}})
+
+    assert sheet['name'] == 'S'
+    assert (sheet['first_row'], sheet['first_column']) == (2, 1)
+    assert (sheet['row_count'], sheet['column_count']) == (4, 4)
+    assert sheet['header']
+    time, mass, note, amount = sheet['columns']
+    assert (time['name'], time['value_type']) == ('time', 'DATETIME')
+    assert np.isnan(time['values'][1])
+    assert time['values'][[0, 2]].tolist() == [1678881600.0, 1678924800.0]
+    # decimal commas are not numbers
+    assert (mass['name'], mass['value_type']) == ('mass', 'STRING')
+    assert mass['values'].tolist() == ['1,5', '', '2']
+    assert note['values'].tolist() == ['ok', '', '']
+    # commas that separate thousands are
+    assert amount['value_type'] == 'NUMERIC'
+    np.testing.assert_array_equal(amount['values'], [1000.5, np.nan, 3.0])